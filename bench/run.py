@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+端到端基准（离线）：src.synth 合成市场 + FakePro，临时数据目录，不碰 data/ 与真实仓位
+阶段：synth → sync → build_today_universe → score → backtest → tune_fast → gen_orders
+每阶段记录耗时与 tracemalloc 峰值（MB），结果写 bench/results/<preset>_<时间>.json
+    python bench/run.py --preset small                    # 300 只 × 2 年，约十几秒
+    python bench/run.py --preset full                     # 5000 只 × 8 年
+    python bench/run.py --baseline bench/results/x.json   # 任一阶段慢于基线 × tolerance → 退出码 1
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULT_DIR = ROOT / "bench" / "results"
+
+PRESETS = {
+    "small": dict(n_stocks=300, years=2),
+    "medium": dict(n_stocks=1500, years=4),
+    "full": dict(n_stocks=5000, years=8),
+}
+
+
+class Recorder:
+    def __init__(self, trace: bool):
+        self.trace = trace
+        self.stages: dict[str, dict] = {}
+
+    def __call__(self, name: str, fn, *args, repeat: int = 1, **kwargs):
+        if self.trace:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            out = fn(*args, **kwargs)
+        sec = (time.perf_counter() - t0) / repeat
+        row = {"seconds": round(sec, 4)}
+        if self.trace:
+            row["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            tracemalloc.stop()
+        self.stages[name] = row
+        print(f"{name:<22} {sec:8.3f}s" + (f"  peak {row['peak_mb']:8.1f} MB" if self.trace else ""),
+              flush=True)
+        return out
+
+
+def _git_rev() -> str | None:
+    r = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                       capture_output=True, text=True)
+    return r.stdout.strip() or None
+
+
+def run(preset: dict, workers: int, trace: bool, data_dir: Path) -> dict:
+    # 数据目录必须在 import src.* 之前指定（DATA_DIR 在 import 时确定）
+    os.environ["MA_DATA_DIR"] = str(data_dir)
+    sys.path.insert(0, str(ROOT))
+    import numpy as np
+    from src import utils, gen_orders, backtest
+    from src.synth import FakePro
+    from src.store import get_store
+    from src.fetcher import FetchExecutor
+    from src.config import load_cfg
+    from src.factor_model import score, factor_tensor
+    from src.panel import build_panel
+    from src.grid import grid_search
+    from src.tune_fast import GRID, TOP_N
+    from src import metrics
+
+    metrics.LOG_DIR = data_dir / "logs"                              # 运行报告也写临时目录
+
+    rec = Recorder(trace)
+    pro = rec("synth", FakePro, **preset)
+    utils.set_pro(pro)
+    days = pro.market.days
+
+    ex = FetchExecutor(workers=4, limits={"default": 1e12})          # 合成数据不限速
+    rec("sync", get_store().sync, pro, start=days[0], end=days[-1], executor=ex)
+
+    td = utils.latest_trade_date()
+    df = rec("build_today_universe", utils.build_today_universe, td)
+    rec("score", score, df, repeat=20)
+
+    cfg = load_cfg()
+    start = days[min(len(days) - 1, 25)]                            # 留出 20 日滚动预热
+    rep = rec("backtest", backtest.run, cfg, start=start, end=td)
+
+    panel = build_panel([td])
+    F = factor_tensor(panel)[0][panel.valid[0]]
+    rec("tune_fast", grid_search, F, GRID, top_n=TOP_N, workers=workers)
+
+    gen_orders.CSV_DIR = data_dir / "orders"
+    gen_orders.STATE_FP = data_dir / "state_portfolio.json"
+    argv, sys.argv = sys.argv, ["gen_orders", "--date", td]
+    try:
+        rec("gen_orders", gen_orders.main)
+    finally:
+        sys.argv = argv
+
+    return {
+        "meta": {
+            "preset": preset, "trade_days": len(days), "stocks_today": len(df),
+            "final_equity": round(float(rep["equity"].iat[-1]), 6),
+            "workers": workers, "tracemalloc": trace,
+            "python": platform.python_version(), "numpy": np.__version__,
+            "machine": platform.machine(), "cpus": os.cpu_count(), "git": _git_rev(),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        "stages": rec.stages,
+        "apis": metrics.get_metrics().summary("bench")["apis"],
+    }
+
+
+def compare(res: dict, baseline: Path, tolerance: float) -> list[str]:
+    base = json.loads(baseline.read_text())["stages"]
+    slow = []
+    for name, row in res["stages"].items():
+        ref = base.get(name, {}).get("seconds")
+        if ref and row["seconds"] > ref * tolerance and row["seconds"] - ref > 0.05:
+            slow.append(f"{name}: {ref:.3f}s → {row['seconds']:.3f}s")
+    return slow
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="离线端到端基准")
+    ap.add_argument("--preset", choices=PRESETS, default="small")
+    ap.add_argument("--stocks", type=int, default=None, help="覆盖预设的股票数")
+    ap.add_argument("--years", type=int, default=None, help="覆盖预设的年数")
+    ap.add_argument("--workers", type=int, default=1, help="tune_fast 进程数")
+    ap.add_argument("--no-trace", action="store_true", help="不开 tracemalloc（耗时更准，无内存峰值）")
+    ap.add_argument("--out", default=None, help="结果 JSON 路径")
+    ap.add_argument("--baseline", default=None, help="对比的基线 JSON")
+    ap.add_argument("--tolerance", type=float, default=1.5)
+    args = ap.parse_args()
+
+    preset = dict(PRESETS[args.preset])
+    if args.stocks:
+        preset["n_stocks"] = args.stocks
+    if args.years:
+        preset["years"] = args.years
+
+    with tempfile.TemporaryDirectory(prefix="mini_alpha_bench_") as tmp:
+        res = run(preset, args.workers, not args.no_trace, Path(tmp))
+
+    out = Path(args.out) if args.out else RESULT_DIR / f"{args.preset}_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(res, indent=2, ensure_ascii=False))
+    print(f"→ {out}")
+
+    if args.baseline:
+        slow = compare(res, Path(args.baseline), args.tolerance)
+        for s in slow:
+            print("回归:", s, file=sys.stderr)
+        if slow:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
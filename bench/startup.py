@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+启动耗时基准：冷启动子进程跑 `python -m src --help` 等命令，取中位数
+    python bench/startup.py [--runs 10] [--budget-ms 200]
+`--help` 中位数超过预算时退出码为 1，可挂进 CI
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+CASES = {
+    "help":           [sys.executable, "-m", "src", "--help"],
+    "backtest_help":  [sys.executable, "-m", "src", "backtest", "--help"],
+    "import_utils":   [sys.executable, "-c", "import src.utils"],
+}
+
+
+def _time(cmd: list[str], runs: int) -> list[float]:
+    env = {k: v for k, v in os.environ.items() if k not in ("TUSHARE_TOKEN", "TS_TOKEN")}
+    env["PYTHONPATH"] = str(ROOT)
+    out = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="CLI 启动耗时基准")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--budget-ms", type=float, default=200)
+    args = ap.parse_args()
+
+    res = {}
+    for name, cmd in CASES.items():
+        ms = _time(cmd, args.runs)
+        res[name] = {"median_ms": round(statistics.median(ms), 1), "min_ms": round(min(ms), 1)}
+    print(json.dumps(res, indent=2))
+    if res["help"]["median_ms"] > args.budget_ms:
+        print(f"--help 中位数超过 {args.budget_ms:.0f} ms 预算", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,7 @@
 #!/usr/bin/env bash
+# 拉起常驻调度进程（src/scheduler.py）：夜间预取截面 + 开市日定时下单
+# 进程持文件锁，cron 每隔几分钟重复执行也只保留一个实例；挂掉后下一次 cron 自动拉起
 cd /mini-alpha-lite
 source venv311/bin/activate
-# 仅在最近交易日执行
-python - <<'PY'
-from src.utils import latest_trade_date
-import datetime, os
-if datetime.date.today().strftime('%Y%m%d') == latest_trade_date():
-    os.system("python -m src.gen_orders")
-PY
+mkdir -p logs
+exec python -m src schedule >> logs/scheduler.out 2>&1
@@ -1,53 +1,32 @@
 """
-简单把核心表（日行情 + daily_basic）同步进本地 SQLite，
-方便你后面做更复杂的因子或回测。不用也行。
+把核心表（日行情 / 复权因子 / daily_basic / ETF 日行情 / 交易日历 / 财务指标）
+增量同步进本地仓库 data/market.sqlite（见 src/store.py）。
+build_today_universe() 与回测会优先读本地，缺失才走 TuShare。
+
+    python fetch_history.py                    # 从上次同步处续拉到今天
+    python fetch_history.py --start 20180101   # 首次全量
 """
 
-import sqlite3
-import datetime as dt
-import tushare as ts
-from tqdm import tqdm
-from utils import TS_TOKEN
-
-DB = "db.sqlite"
-pro = ts.pro_api(TS_TOKEN)
-
-conn = sqlite3.connect(DB)
-c = conn.cursor()
-c.execute(
-    """CREATE TABLE IF NOT EXISTS daily (
-    ts_code TEXT, trade_date TEXT, close REAL, pct_chg REAL, amount REAL
-)"""
-)
-c.execute(
-    """CREATE TABLE IF NOT EXISTS basic (
-    ts_code TEXT, trade_date TEXT, pe_ttm REAL, pb REAL, roe REAL
-)"""
-)
-conn.commit()
-
-
-def daterange(start, end):
-    for n in range(int((end - start).days) + 1):
-        yield start + dt.timedelta(n)
-
-
-start = dt.date(2024, 1, 1)  # 可自行拉更早
-end = dt.date.today()
-
-for d in tqdm(list(daterange(start, end))):
-    trade_date = d.strftime("%Y%m%d")
-    daily = pro.daily(trade_date=trade_date)
-    if daily.empty:
-        continue
-    daily[["ts_code", "trade_date", "close", "pct_chg", "amount"]].to_sql(
-        "daily", conn, if_exists="append", index=False
-    )
-
-    basic = pro.daily_basic(
-        trade_date=trade_date, fields="ts_code,trade_date,pe_ttm,pb,roe"
-    )
-    basic.to_sql("basic", conn, if_exists="append", index=False)
-
-conn.close()
-print("历史同步完成")
+import argparse
+
+from src.store import TABLES, FIRST_DATE, get_store
+from src.utils import pro
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="增量同步 TuShare 历史数据到本地仓库")
+    ap.add_argument("--start", default=FIRST_DATE, help="最早日期 YYYYMMDD")
+    ap.add_argument("--end", default=None, help="截止日期 YYYYMMDD，默认今天")
+    ap.add_argument("--tables", default=",".join(TABLES),
+                    help="逗号分隔的表名，默认全部")
+    args = ap.parse_args()
+
+    written = get_store().sync(pro, start=args.start, end=args.end,
+                               tables=args.tables.split(","))
+    for table, n in written.items():
+        print(f"{table:<15} +{n:,} 行")
+    print("历史同步完成")
+
+
+if __name__ == "__main__":
+    main()
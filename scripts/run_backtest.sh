@@ -1,3 +1,3 @@
 #!/usr/bin/env bash
 source /mini-alpha-lite/venv311/bin/activate
-python -m src.backtest
\ No newline at end of file
+python -m src backtest
\ No newline at end of file
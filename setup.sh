@@ -2,5 +2,5 @@ python3 -m venv venv
 source venv/bin/activate
 pip install --upgrade pip
 pip install -r requirements.txt
-touch db.sqlite
+mkdir -p data
 echo "初始化完成 ✅"
\ No newline at end of file
@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""python -m src <子命令> …（见 src/cli.py）"""
+from src.cli import main
+
+main()
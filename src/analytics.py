@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+因子 IC / Rank-IC 分析（跨日期批量矩阵运算，无逐日 pandas 循环）
+* 前瞻收益：后复权价 P[t+h] / P[t] - 1，h = 1 / 5 / 20
+* 每日 IC、Rank-IC 及其均值 / IR；IC 衰减 = 因子与滞后 k 天的 1 日收益的 Rank-IC
+* 分位组合：按因子分 5 组，每日等权平均 1 日前瞻收益；头部分位逐日换手率
+* python -m src.analytics [--start YYYYMMDD] → reports/factor_ic.csv & factor_ic_daily.csv
+"""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.factor_model import F_LIST, factor_tensor
+
+HORIZONS = (1, 5, 20)
+DECAY_LAGS = (0, 1, 2, 5, 10, 20)
+QUANTILES = 5
+
+REPORT_DIR = Path(__file__).resolve().parent.parent / "reports"
+
+
+# ========== 基础批量算子（输入均为 日期 × 标的） ==========
+def forward_returns(P: np.ndarray, h: int) -> np.ndarray:
+    """t 日买入持有 h 天的收益；尾部 h 天为 NaN"""
+    out = np.full(P.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[:-h] = np.where(P[:-h] > 0, P[h:] / P[:-h] - 1.0, np.nan)
+    return out
+
+
+def rank_rows(x: np.ndarray) -> np.ndarray:
+    """逐行排名（0 起，并列取平均名次，NaN 保持 NaN）"""
+    order = np.argsort(x, axis=1, kind="stable")             # NaN 排在最后
+    s = np.take_along_axis(x, order, axis=1)
+    pos = np.broadcast_to(np.arange(x.shape[1]), x.shape)
+    new = np.ones(x.shape, dtype=bool)                       # 每段相同取值的起点
+    new[:, 1:] = s[:, 1:] != s[:, :-1]
+    start = np.maximum.accumulate(np.where(new, pos, 0), axis=1)
+    last = np.ones(x.shape, dtype=bool)                      # 每段的终点
+    last[:, :-1] = new[:, 1:]
+    end = np.minimum.accumulate(np.where(last, pos, x.shape[1])[:, ::-1], axis=1)[:, ::-1]
+    ranks = np.empty(x.shape)
+    np.put_along_axis(ranks, order, (start + end) / 2.0, axis=1)
+    ranks[np.isnan(x)] = np.nan
+    return ranks
+
+
+def rank_pct(ranks: np.ndarray) -> np.ndarray:
+    """rank_rows 的结果 → 逐行分位 [0, 1)"""
+    n = (~np.isnan(ranks)).sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return ranks / n
+
+
+def corr_rows(a: np.ndarray, b: np.ndarray, min_n: int = 3) -> np.ndarray:
+    """逐行 Pearson 相关，只用两者都非 NaN 的格子；样本不足 min_n 或任一方无波动为 NaN"""
+    m = ~np.isnan(a) & ~np.isnan(b)
+    n = m.sum(axis=1)
+    a0, b0 = np.where(m, a, 0.0), np.where(m, b, 0.0)
+    dot = lambda x, y: np.einsum("ij,ij->i", x, y)           # noqa: E731
+    with np.errstate(divide="ignore", invalid="ignore"):
+        am, bm = a0.sum(axis=1) / n, b0.sum(axis=1) / n
+        cov = dot(a0, b0) / n - am * bm
+        va = dot(a0, a0) / n - am * am
+        vb = dot(b0, b0) / n - bm * bm
+        ic = cov / np.sqrt(va * vb)
+        flat = (va <= 1e-12 * dot(a0, a0) / n) | (vb <= 1e-12 * dot(b0, b0) / n)   # 常数行（舍入残差）
+    return np.where((n >= min_n) & ~flat, ic, np.nan)
+
+
+def quantile_returns(pct: np.ndarray, r: np.ndarray, q: int = QUANTILES) -> np.ndarray:
+    """日期 × q：按因子分位 pct 分 q 组的组内平均收益（bincount 一次算完所有日期）"""
+    D = pct.shape[0]
+    m = ~np.isnan(pct) & ~np.isnan(r)
+    bucket = np.minimum((np.nan_to_num(pct) * q).astype(np.int64), q - 1)
+    idx = (np.arange(D)[:, None] * q + bucket)[m]
+    sums = np.bincount(idx, weights=r[m], minlength=D * q)
+    cnt = np.bincount(idx, minlength=D * q)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (sums / cnt).reshape(D, q)
+
+
+def top_turnover(pct: np.ndarray, q: int = QUANTILES) -> np.ndarray:
+    """头部分位成分逐日换手率 = 1 - 今日头部中昨日也在头部的比例"""
+    with np.errstate(invalid="ignore"):
+        top = pct >= (q - 1) / q
+    keep = (top[1:] & top[:-1]).sum(axis=1)
+    size = top[1:].sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.r_[np.nan, 1.0 - keep / size]
+
+
+# ========== 汇总 ==========
+def analyze(Z: np.ndarray, P: np.ndarray, days: list[str],
+            f_list: list[str] | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Z: 日期 × 标的 × 因子 标准化因子（factor_tensor 输出），P: 对齐的后复权价
+    返回 (每个因子一行的汇总表, 逐日 IC 长表)
+    """
+    f_list = f_list or F_LIST
+    fwd = {h: forward_returns(P, h) for h in HORIZONS}
+    fwd_rank = {h: rank_rows(r) for h, r in fwd.items()}
+    rows, daily = [], {}
+    for k, f in enumerate(f_list):
+        z = Z[:, :, k].astype(np.float64)
+        zr = rank_rows(z)                                    # 每个因子只排序一次
+        pct = rank_pct(zr)
+        row = {"factor": f}
+        for h in HORIZONS:
+            ic = corr_rows(z, fwd[h])
+            ric = corr_rows(zr, fwd_rank[h])
+            daily[(f, f"ic_{h}d")], daily[(f, f"rank_ic_{h}d")] = ic, ric
+            for name, s in (("ic", ic), ("rank_ic", ric)):
+                mu, sd = np.nanmean(s), np.nanstd(s)
+                row[f"{name}_{h}d"] = mu
+                row[f"{name}_ir_{h}d"] = mu / sd if sd > 0 else np.nan
+        for lag in DECAY_LAGS:
+            lagged = fwd_rank[1][lag:]
+            row[f"decay_lag{lag}"] = np.nanmean(corr_rows(zr[:len(lagged)], lagged))
+        qr = np.nanmean(quantile_returns(pct, fwd[1]), axis=0)
+        row.update({f"q{i + 1}": v for i, v in enumerate(qr)})
+        row["long_short"] = qr[-1] - qr[0]
+        row["turnover"] = np.nanmean(top_turnover(pct))
+        rows.append(row)
+    daily_df = pd.DataFrame(daily, index=pd.Index(days, name="trade_date"))
+    daily_df = daily_df.stack(level=0, future_stack=True).rename_axis(["trade_date", "factor"])
+    return pd.DataFrame(rows).set_index("factor"), daily_df.reset_index()
+
+
+def main() -> None:
+    from src.utils import latest_trade_date
+    from src.trade_calendar import get_calendar
+    from src.panelfile import factor_panel, stock_panel
+
+    ap = argparse.ArgumentParser(description="因子 IC / 分位收益分析")
+    ap.add_argument("--start", default="20180102")
+    ap.add_argument("--end", default=None)
+    args = ap.parse_args()
+
+    days = get_calendar().range(args.start, args.end or latest_trade_date())
+    panel = factor_panel(days)
+    Z = factor_tensor(panel)
+    prices = stock_panel(days)
+    j = pd.Index(prices.codes).get_indexer(panel.codes)          # 对齐到因子面板的列
+    P = np.where(j >= 0, prices.adj_close[:, j], np.nan)
+    summary, daily = analyze(Z, P, days)
+
+    REPORT_DIR.mkdir(exist_ok=True)
+    summary.to_csv(REPORT_DIR / "factor_ic.csv", float_format="%.6f")
+    daily.to_csv(REPORT_DIR / "factor_ic_daily.csv", index=False, float_format="%.6f")
+    logger.success("因子分析完成 → reports/factor_ic.csv & factor_ic_daily.csv")
+    print(summary[[f"rank_ic_{h}d" for h in HORIZONS] + ["long_short", "turnover"]].round(4))
+
+
+if __name__ == "__main__":
+    main()
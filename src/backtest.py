@@ -1,137 +1,133 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 """
-向量化回测（每月调仓，ETF + α 组合）
-* 用上一交易日因子打分选股，避免未来函数
-* 一次性拉所有价格，提高速度
+面板回测（ETF + α 组合，调仓频率见 config.yaml 的 rebalance: D / W / M）
+* 用上一交易日因子打分选股，避免未来函数；全区间因子面板只构建一次（src.panel）
+* 选股结果写成 日期 × 标的 目标权重矩阵，连同复权价矩阵交给 src.engine 逐日盯市
+* 价格按交易日整截面加载（src.loader），优先读本地仓库，缺失才逐日走 TuShare；
+  本地不全时按日期块流水线预取（src.prefetch），回源等待与矩阵编码重叠
+* 因子 / 股价面板落盘为 memmap（src.panelfile），本地仓库无新数据时重复回测直接秒开
+* config.yaml 风控四项（止损 / 止盈 / 回撤 / 均线）由 src.risk 在价格面板上整体叠加，只约束 α 仓
 """
 from __future__ import annotations
 
-import datetime as dt
+import argparse
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from tqdm import tqdm
 from loguru import logger
 
 from src.config import load_cfg
-from src.utils import build_today_universe, latest_trade_date, prev_trade_date, safe_query, pro
-from src.factor_model import score
+from src.utils import latest_trade_date
+from src.trade_calendar import get_calendar
+from src.factor_model import ScoreModel
+from src.engine import rebalance_mask, run_panel, summary
+from src.risk import rules
+from src.loader import PricePanel, load_fund_panel
+from src.panel import FactorPanel
+from src.panelfile import factor_panel, stock_panel
+from src.metrics import get_metrics, stage
+
+START = "20180102"  # 第一调仓日
 
-plt.switch_backend("Agg")  # 无显示环境也能画图
+REPORT_DIR = Path(__file__).resolve().parent.parent / "reports"
 
-CFG = load_cfg()
-START = "20180102"  # 第一调仓日前一天
-END = latest_trade_date()       # 最新一个可用价
 
-REPORT_DIR = Path(__file__).resolve().parent.parent / "reports"
-REPORT_DIR.mkdir(exist_ok=True)
-
-
-# ─────────────────── 交易日 & 调仓日 ───────────────────
-trade_days = safe_query(
-    pro.trade_cal, exchange="SSE", start_date=START, end_date=END
-)
-trade_days = pd.to_datetime(trade_days[trade_days.is_open == 1]["cal_date"])
-rebal_dates = trade_days.groupby([trade_days.dt.year, trade_days.dt.month]).first().tolist()
-
-# ─────────────────── 一次性取价格 ────────────────────
-logger.info("下载 ETF 价格 …")
-etf_px = safe_query(
-    pro.fund_daily, ts_code=",".join([CFG["core_etf"], CFG["bond_etf"]]),
-    start_date=START, end_date=END, fields="ts_code,trade_date,close"
-).pivot(index="trade_date", columns="ts_code", values="close")
-
-logger.info("回测 …")
-equity = [1.0]
-dates = []
-
-all_stock_px: dict[str, pd.Series] = {}  # 动态累加已用股票价格
-
-for i in tqdm(range(len(rebal_dates) - 1)):
-    d0 = rebal_dates[i]          # 调仓日（当月首个交易日）
-    d1 = rebal_dates[i + 1]      # 下一个调仓日
-    prev_d0 = prev_trade_date(d0.strftime("%Y%m%d"))
-
-    # 1) 上月末数据 → 选股
-    uni = build_today_universe(prev_d0)
-    if uni.empty:
-        logger.warning(f"未能为 {prev_d0} 构建股票池，将使用空的股票列表进行下一步")
-        alpha_codes = []
-    else:
-        alpha_codes = score(uni).head(CFG["num_alpha"])["ts_code"].tolist()
-
-    # 2) 补全股票价格
-    need = [c for c in alpha_codes if c not in all_stock_px]
-    if need:
-        for c in tqdm(need, desc="Fetch Stock", leave=False):
-            px = safe_query(
-                pro.daily,
-                ts_code=c,
-                start_date=d0.strftime("%Y%m%d"),
-                end_date=d1.strftime("%Y%m%d"),
-                fields="trade_date,close",
-            ).set_index("trade_date")["close"]
-            all_stock_px[c] = px
-            
-    # 3) 当期收益
-    date0_str = d0.strftime("%Y%m%d")
-    date1_str = d1.strftime("%Y%m%d")
-
-    # --- 计算 ETF 收益（增加健壮性检查）---
-    r_etf = 0.0
-    if CFG["core_etf"] in etf_px.columns and date0_str in etf_px.index and date1_str in etf_px.index:
-        px0 = etf_px.loc[date0_str, CFG["core_etf"]]
-        px1 = etf_px.loc[date1_str, CFG["core_etf"]]
-        if pd.notna(px0) and pd.notna(px1) and px0 > 0:
-            r_etf = (px1 / px0) - 1
-    else:
-        logger.warning(f"核心ETF {CFG['core_etf']} 在 {date0_str} 或 {date1_str} 缺少价格，当期收益计为 0")
-
-    r_bond = 0.0
-    if CFG["bond_etf"] in etf_px.columns and date0_str in etf_px.index and date1_str in etf_px.index:
-        px0 = etf_px.loc[date0_str, CFG["bond_etf"]]
-        px1 = etf_px.loc[date1_str, CFG["bond_etf"]]
-        if pd.notna(px0) and pd.notna(px1) and px0 > 0:
-            r_bond = (px1 / px0) - 1
-    else:
-        logger.warning(f"债券ETF {CFG['bond_etf']} 在 {date0_str} 或 {date1_str} 缺少价格，当期收益计为 0")
-
-    # --- 计算 Alpha 股票收益（增加健壮性检查）---
-    r_alpha = []
-    for c in alpha_codes:
-        px_series = all_stock_px.get(c)
-        if px_series is not None and date0_str in px_series.index and date1_str in px_series.index:
-            px0 = px_series.loc[date0_str]
-            px1 = px_series.loc[date1_str]
-            if pd.notna(px0) and pd.notna(px1) and px0 > 0:
-                r_alpha.append(px1 / px0 - 1)
-        else:
-            logger.warning(f"Alpha股票 {c} 在 {date0_str} 或 {date1_str} 缺少价格，该股当期收益不计入")
-    
-    r_alpha_mean = np.mean(r_alpha) if r_alpha else 0
-
-    # --- 合并计算总收益 ---
-    ret = (CFG["core_ratio"] * r_etf +
-           CFG["bond_ratio"] * r_bond +
-           CFG["alpha_ratio"] * r_alpha_mean)
-
-    equity.append(equity[-1] * (1 + ret))
-    dates.append(d1)
+# ─────────────────── 选股（调仓日前一交易日截面） ───────────────────
+def select_alpha(panel: FactorPanel, rebal_days: list[str], num_alpha: int,
+                 neutral: bool = False) -> dict[str, list[str]]:
+    """
+    所有调仓日一次批量打分（缺失按 0 计，与 cross_section + score 口径一致）
+    neutral=True 时行业 + 市值中性化（factor_model.neutralize）
+    """
+    cal = get_calendar()
+    prev = {d0: cal.prev(d0) for d0 in rebal_days}
+    have = [d0 for d0 in rebal_days if prev[d0] in panel and panel.valid[panel.row(prev[d0])].any()]
+    picks: dict[str, list[str]] = {d0: [] for d0 in rebal_days}
+    if have:
+        model = ScoreModel.from_panel(panel.subset([prev[d0] for d0 in have]), fillna=0,
+                                      neutral=neutral)
+        idx, s = model.top(k=num_alpha)
+        for d0, i, ok in zip(have, idx, np.isfinite(s)):
+            picks[d0] = model.codes[i[ok]].tolist()
+    for d0 in rebal_days:
+        if not picks[d0]:
+            logger.warning(f"未能为 {prev[d0]} 构建股票池，{d0} 只持有 ETF")
+    return picks
+
+
+# ─────────────────── 目标权重矩阵 ───────────────────
+def target_weights(panel: PricePanel, picks: dict[str, list[str]], cfg: dict) -> np.ndarray:
+    """调仓日那一行写目标权重：核心 / 债券 ETF 固定比例，α 仓等权"""
+    W = np.zeros(panel.close.shape)
+    core, bond = panel.col(cfg["core_etf"]), panel.col(cfg["bond_etf"])
+    for d0, codes in picks.items():
+        i = panel.row(d0)
+        W[i, core] = cfg["core_ratio"]
+        W[i, bond] = cfg["bond_ratio"]
+        codes = [c for c in codes if c in panel]
+        if codes:
+            W[i, panel.col(codes)] = cfg["alpha_ratio"] / len(codes)
+    return W
+
+
+def run(cfg: dict | None = None, start: str = START, end: str | None = None) -> pd.DataFrame:
+    cfg = cfg or load_cfg()
+    end = end or latest_trade_date()
+    cal = get_calendar()
+    days = cal.range(start, end)
+    mask = rebalance_mask(days, cfg.get("rebalance", "M"))
+    rebal_days = [d for d, m in zip(days, mask) if m]
+
+    logger.info("构建因子面板 …")
+    with stage("factor_panel"):
+        factors = factor_panel(cal.range(cal.prev(start) or start, end))
+    with stage("scoring"):
+        picks = select_alpha(factors, rebal_days, cfg["num_alpha"], cfg.get("neutralize", False))
+
+    logger.info("加载价格 …")
+    with stage("load_prices"):
+        panel = PricePanel.hstack([load_fund_panel(days, [cfg["core_etf"], cfg["bond_etf"]]),
+                                   stock_panel(days)])
+    W = target_weights(panel, picks, cfg)
+    alpha = np.ones(len(panel.codes), dtype=bool)
+    alpha[[panel.col(cfg["core_etf"]), panel.col(cfg["bond_etf"])]] = False
+
+    logger.info("回测 …")
+    with stage("backtest_loop"):
+        res = run_panel(panel.adj_close, W, mask,
+                        fee=cfg.get("fee", 0.0003), slippage=cfg.get("slippage", 0.001),
+                        risk=rules(cfg), risk_cols=alpha)
+    logger.info("绩效 {}", {k: round(v, 4) for k, v in summary(res).items()})
+    rep = pd.DataFrame({"date": pd.to_datetime(days), **res})
+    rep["cummax"] = rep["equity"].cummax()
+    return rep
+
 
 # ─────────────────── 结果输出 ─────────────────────────
-rep = pd.DataFrame({"date": dates, "equity": equity[1:]})
-# ★ 修改点：使用方括号访问列
-rep["cummax"] = rep["equity"].cummax()
-rep["drawdown"] = rep["equity"] / rep["cummax"] - 1
-rep["ret"] = rep["equity"].pct_change().fillna(0)
-rep.to_csv(REPORT_DIR / "backtest_report.csv", index=False)
-
-plt.figure(figsize=(9, 4))
-plt.plot(rep.date, rep.equity)
-plt.title("Equity Curve (2018-Now)")
-plt.tight_layout()
-plt.savefig(REPORT_DIR / "equity_curve.png")
-logger.success(f"回测完成 → reports/backtest_report.csv & equity_curve.png")
\ No newline at end of file
+def main() -> None:
+    import matplotlib
+    matplotlib.use("Agg")  # 无显示环境也能画图
+    import matplotlib.pyplot as plt
+
+    ap = argparse.ArgumentParser(description="面板回测（ETF + α 组合）")
+    ap.add_argument("--start", default=START, help="第一调仓日 YYYYMMDD")
+    ap.add_argument("--end", default=None, help="截止日 YYYYMMDD，默认最近交易日")
+    args = ap.parse_args()
+
+    rep = run(start=args.start, end=args.end)
+    REPORT_DIR.mkdir(exist_ok=True)
+    rep.to_csv(REPORT_DIR / "backtest_report.csv", index=False)
+
+    plt.figure(figsize=(9, 4))
+    plt.plot(rep.date, rep.equity)
+    plt.title("Equity Curve (2018-Now)")
+    plt.tight_layout()
+    plt.savefig(REPORT_DIR / "equity_curve.png")
+    logger.success(f"回测完成 → reports/backtest_report.csv & equity_curve.png")
+    get_metrics().dump("backtest")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+safe_query 的持久化读穿缓存（单个 SQLite 文件 data/query_cache.sqlite）
+* key = API 名 + 规范化 kwargs（排序后 JSON）的 sha1
+* TTL：只涉及历史日期的查询永不过期；含今天 / 未来日期的查询、
+  trade_cal 以及不带日期的查询短期过期
+* 总字节数超出预算时按最近访问时间淘汰（LRU）
+* 环境变量 MA_CACHE=off 关闭缓存，MA_CACHE=refresh 强制回源并覆盖；
+  代码里可用 set_mode() 临时切换
+"""
+from __future__ import annotations
+
+import datetime as dt
+import functools
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+from loguru import logger
+
+from src.store import DATA_DIR
+
+CACHE_PATH = DATA_DIR / "query_cache.sqlite"
+DEFAULT_MAX_BYTES = 512 * 2**20
+
+# 单位：秒；None 表示永不过期
+TTL_TODAY = 10 * 60            # 查询含今天（或未来）→ 数据可能尚未落地
+TTL_UNDATED = 24 * 3600        # 不带日期参数的查询（如 stock_basic）
+TTL_BY_API = {                 # 按 API 覆盖
+    "trade_cal": 6 * 3600,
+}
+_DATE_KEYS = ("trade_date", "start_date", "end_date", "ann_date", "cal_date", "period")
+
+MODES = ("on", "off", "refresh")
+_mode = os.getenv("MA_CACHE", "on").lower()
+
+
+def set_mode(mode: str) -> str:
+    """切换缓存模式 on / off / refresh，返回旧模式"""
+    global _mode
+    if mode not in MODES:
+        raise ValueError(f"mode 必须是 {MODES} 之一")
+    old, _mode = _mode, mode
+    return old
+
+
+def api_name(api_fn: Callable) -> str:
+    """pro.daily 是 functools.partial(query, 'daily')，取出真实 API 名"""
+    if isinstance(api_fn, functools.partial) and api_fn.args:
+        return str(api_fn.args[0])
+    return getattr(api_fn, "__name__", repr(api_fn))
+
+
+def cache_key(api: str, kwargs: dict) -> str:
+    norm = {k: v for k, v in sorted(kwargs.items()) if v is not None}
+    raw = api + "|" + json.dumps(norm, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def ttl_for(api: str, kwargs: dict, today: str | None = None) -> int | None:
+    """按 API 与查询日期决定 TTL"""
+    if api in TTL_BY_API:
+        return TTL_BY_API[api]
+    dates = [str(kwargs[k]) for k in _DATE_KEYS if kwargs.get(k)]
+    if not dates:
+        return TTL_UNDATED
+    today = today or dt.date.today().strftime("%Y%m%d")
+    return TTL_TODAY if max(dates) >= today else None
+
+
+class QueryCache:
+    """SQLite 表存 pickle 后的 DataFrame，记录大小 / 过期时间 / 最近访问时间"""
+
+    def __init__(self, path: Path | str = CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, api TEXT, data BLOB, nbytes INTEGER,"
+                " created REAL, expires REAL, accessed REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_accessed ON cache (accessed)")
+
+    # ========== 底层 get / put ==========
+    def get(self, key: str) -> pd.DataFrame | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, expires FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            data, expires = row
+            with self._conn:
+                if expires is not None and expires < now:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    return None
+                self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return pickle.loads(data)
+
+    def put(self, key: str, api: str, df: pd.DataFrame, ttl: int | None) -> None:
+        data = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        expires = None if ttl is None else now + ttl
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, api, data, len(data), now, expires, now),
+            )
+        self.evict()
+
+    def evict(self) -> int:
+        """删除过期项；总大小仍超预算时按 accessed 升序淘汰，返回删除条数"""
+        with self._lock, self._conn:
+            n = self._conn.execute(
+                "DELETE FROM cache WHERE expires IS NOT NULL AND expires < ?", (time.time(),)
+            ).rowcount
+            total = self.total_bytes()
+            if total <= self.max_bytes:
+                return n
+            victims = []
+            for key, nbytes in self._conn.execute(
+                "SELECT key, nbytes FROM cache ORDER BY accessed"
+            ):
+                if total <= self.max_bytes:
+                    break
+                victims.append((key,))
+                total -= nbytes
+            self._conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+        return n + len(victims)
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM cache").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+
+    # ========== safe_query 用的高层接口 ==========
+    def lookup(self, api_fn: Callable, kwargs: dict) -> pd.DataFrame | None:
+        if _mode != "on":
+            return None
+        return self.get(cache_key(api_name(api_fn), kwargs))
+
+    def save(self, api_fn: Callable, kwargs: dict, df: pd.DataFrame) -> None:
+        """空结果不缓存（可能是失败或数据未落地）"""
+        if _mode == "off" or df is None or df.empty:
+            return
+        api = api_name(api_fn)
+        try:
+            self.put(cache_key(api, kwargs), api, df, ttl_for(api, kwargs))
+        except sqlite3.Error as e:
+            logger.warning("查询缓存写入失败：{}", e)
+
+
+@functools.lru_cache(maxsize=None)
+def get_cache() -> QueryCache:
+    """进程内单例；字节预算取 config.yaml 的 cache_max_mb"""
+    from src.config import load_cfg
+    mb = load_cfg().get("cache_max_mb")
+    return QueryCache(max_bytes=int(mb * 2**20) if mb else DEFAULT_MAX_BYTES)
+
+
+__all__ = ["QueryCache", "get_cache", "set_mode", "api_name", "cache_key", "ttl_for"]
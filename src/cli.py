@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+统一命令行入口：mini-alpha <子命令> [参数]   （等价于 python -m src <子命令>）
+* 本模块只 import 标准库；子命令解析完才导入对应模块，--help 不碰 pandas / tushare / 网络
+* 子命令后的参数原样交给该模块自己的 main()（各自的 argparse），`mini-alpha backtest -h` 看详细参数
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import sys
+
+# 子命令 → (模块, 说明)；模块须提供 main()
+COMMANDS = {
+    "orders":    ("src.gen_orders", "生成今日调仓订单 CSV 并记入组合账本"),
+    "backtest":  ("src.backtest",   "面板回测 → reports/backtest_report.csv"),
+    "tune":      ("src.tune_fast",  "因子权重网格搜索"),
+    "sync":      ("fetch_history",  "增量同步 TuShare 历史数据到本地仓库"),
+    "sweep":     ("src.sweep",      "策略参数并行扫描 → reports/sweep.csv"),
+    "analytics": ("src.analytics",  "因子 IC / 分位收益分析 → reports/factor_ic.csv"),
+    "stream":    ("src.stream",     "盘中流式调仓：行情回放 / 推送 → 订单差异"),
+    "schedule":  ("src.scheduler",  "常驻调度：夜间预取截面 + 开市日定时下单"),
+    "ledger":    ("src.ledger",     "组合账本：当前持仓 + 区间净值 / 盈亏 / 换手"),
+}
+
+
+def main(argv: list[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(prog="mini-alpha", description="mini-alpha-lite 命令行")
+    sub = ap.add_subparsers(dest="cmd", required=True, metavar="<command>")
+    for name, (_, help_) in COMMANDS.items():
+        sub.add_parser(name, help=help_, add_help=False)
+    args, rest = ap.parse_known_args(argv)
+
+    module = importlib.import_module(COMMANDS[args.cmd][0])
+    sys.argv = [f"mini-alpha {args.cmd}", *rest]
+    module.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,12 +11,21 @@ _CFG_PATH = Path(__file__).resolve().parent.parent / "config.yaml"
 _NUMERIC_KEYS = {
     "cash": float,
     "core_ratio": float,
+    "bond_ratio": float,
     "alpha_ratio": float,
     "num_alpha": int,
     "stop_loss": float,
     "max_drawdown": float,
     "min_amount": float,
     "lot": int,
+    "fee": float,
+    "slippage": float,
+    "cache_max_mb": float,
+    "fetch_workers": int,
+    "prefetch_depth": int,
+    "prefetch_workers": int,
+    "snapshot_max_mb": float,
+    "snapshot_max_age_days": float,
 }
 
 def load_cfg() -> dict:
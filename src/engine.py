@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+面板回测引擎（纯 NumPy，无逐日 / 逐股 Python 循环）
+输入：
+    close    日期 × 标的 收盘价矩阵（NaN = 未上市 / 停牌，停牌按前值计）
+    weights  日期 × 标的 目标权重矩阵（只读取调仓日那几行，行和 ≤ 1，余额为现金）；
+             也可只传调仓日那几行（调仓日数 × 标的），参数扫描时省去整张 T × N 矩阵
+    rebal    调仓日布尔掩码，可用 rebalance_mask(dates, "D"/"W"/"M") 生成
+输出：逐日 equity / ret / turnover / cost / drawdown
+
+调仓日按当日收盘价成交，两次调仓之间持股数不变、权重随价格漂移。
+设第 k 段起点为 r_k，段内任一天 t 的组合相对段起点的净值倍数
+    g_t = Σ_i w_{k,i} · P_{t,i} / P_{r_k,i} + cash_k
+调仓前净值 = 上一段起点净值 × g，调仓成本 = 换手 × (fee + slippage)，
+各段起点净值用 cumprod 一次算出，再广播回每一天。
+
+风控（risk=src.risk.rules(cfg)）：overlay 给出持有点的逐日持有比例 h，段内卖出部分按当日价
+变现（扣 fee + slippage）累计为 c，单位持股价值 P → h·P + c；只有持有点与 P 不同，
+g_t 与调仓前漂移按这些点的差额 bincount 修正，公式其余部分不变。
+"""
+from __future__ import annotations
+
+import numpy as np
+
+from src.risk import active, overlay
+
+FREQS = ("D", "W", "M")
+
+
+def rebalance_mask(dates, freq: str = "M") -> np.ndarray:
+    """dates 为 YYYYMMDD 整数（或可转整数的字符串）；每个周期的首个交易日为 True"""
+    d = np.asarray(dates, dtype=np.int64)
+    if d.size == 0:
+        return np.zeros(0, dtype=bool)
+    if freq == "D":
+        return np.ones(d.size, dtype=bool)
+    if freq == "W":
+        ym = (d // 10000 - 1970) * 12 + d // 100 % 100 - 1
+        days = ym.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + d % 100 - 1
+        key = (days + 3) // 7                      # 1970-01-01 是周四，+3 对齐到周一
+    elif freq == "M":
+        key = d // 100
+    else:
+        raise ValueError(f"freq 必须是 {FREQS} 之一")
+    return np.r_[True, key[1:] != key[:-1]]
+
+
+def ffill(a: np.ndarray) -> np.ndarray:
+    """沿时间轴（axis=0）前向填充 NaN"""
+    nan = np.isnan(a)
+    bad = np.flatnonzero(nan.any(axis=0))            # 只处理有缺失的列
+    if bad.size == 0:
+        return a
+    out = a.copy()
+    idx = np.where(nan[:, bad], 0, np.arange(a.shape[0])[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    out[:, bad] = np.take_along_axis(a[:, bad], idx, axis=0)
+    return out
+
+
+def run_panel(
+    close: np.ndarray,
+    weights: np.ndarray,
+    rebal: np.ndarray,
+    fee: float = 0.0003,
+    slippage: float = 0.001,
+    risk: dict | None = None,
+    risk_cols: np.ndarray | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    返回 dict(equity, ret, turnover, cost, drawdown)，长度均为 T；初始净值 1
+    risk 为 src.risk.rules() 规则；risk_cols 为受风控约束的列（布尔掩码，缺省全部）
+    """
+    close = np.asarray(close, dtype=np.float64)
+    T = close.shape[0]
+    rebal = np.asarray(rebal, dtype=bool).copy()
+    rebal[0] = True                                  # 第一天必须建仓
+    rb = np.flatnonzero(rebal)
+    seg = np.cumsum(rebal) - 1                       # 每天所属的调仓段
+
+    # ---- 1. 只保留曾被持有的列；调仓日价格缺失的标的无法成交 → 0 ----
+    W = np.asarray(weights, dtype=np.float64)
+    W = np.nan_to_num(W[rb] if W.shape[0] == T else W.copy(), copy=False)
+    cols = np.flatnonzero(W.any(axis=0))
+    mask = None if risk_cols is None else np.asarray(risk_cols, dtype=bool)
+    if cols.size < W.shape[1]:
+        W, close = W[:, cols], close[:, cols]
+        mask = None if mask is None else mask[cols]
+    P = np.nan_to_num(ffill(close), copy=False)      # 未上市 → 0，下面据此剔除
+    Prb = P[rb] if rb.size < T else P
+    W[~(Prb > 0)] = 0.0
+    ev = None
+    if active(risk):
+        W, ev = overlay(P, W, rb, risk, mask)
+    cash = 1.0 - W.sum(axis=1)
+
+    # ---- 2. 调仓前的漂移净值 & 权重 ----
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Q = np.where(W > 0, W / Prb, 0.0)            # 每段持股数（按段起点净值 1 计）
+    held = Q[:-1] * Prb[1:]
+    held_cash = 0.0
+    if ev is not None:
+        t, k, j, h = ev["t"], ev["k"], ev["j"], ev["h"]
+        q, px = Q[k, j], P[t, j]
+        sold = np.r_[0.0, np.clip(h[:-1] - h[1:], 0.0, None)] * px   # 单位持股当日变现额
+        sold[ev["first"]] = 0.0
+        c = np.cumsum(sold * (1.0 - fee - slippage))
+        c -= c[ev["first"]][ev["g"]]                                 # 每个持有对内累计
+        last = ev["last"][k[ev["last"]] < rb.size - 1]                # 段末（有下一次调仓）
+        held[k[last], j[last]] *= h[last]
+        held_cash = np.bincount(k[last], q[last] * c[last], minlength=rb.size)[:-1]
+    g_pre = held.sum(axis=1) + held_cash + cash[:-1]
+    drift = np.vstack([np.zeros((1, W.shape[1])), held / g_pre[:, None]])
+    turnover = np.abs(W - drift).sum(axis=1)
+    cost = turnover * (fee + slippage)
+    V = np.cumprod(np.r_[1.0, g_pre] * (1.0 - cost))  # 各段起点（调仓后）净值
+
+    # ---- 3. 段内逐日净值：g_t = P_t · Q_seg(t) + cash ----
+    g = np.einsum("tn,tn->t", P, Q[seg] if rb.size < T else Q) + cash[seg]
+    if ev is not None:
+        g += np.bincount(t, q * ((h - 1.0) * px + c), minlength=T)
+    equity = V[seg] * g
+
+    ret = np.r_[0.0, equity[1:] / equity[:-1] - 1.0]
+    drawdown = equity / np.maximum.accumulate(equity) - 1.0
+    to_daily = np.zeros(T)
+    to_daily[rb] = turnover
+    cost_daily = np.zeros(T)
+    cost_daily[rb] = cost
+    if ev is not None:                               # 风控卖出计入当日换手 / 成本
+        exit_to = V[seg] * np.bincount(t, q * sold, minlength=T) / equity
+        to_daily += exit_to
+        cost_daily += exit_to * (fee + slippage)
+    return dict(equity=equity, ret=ret, turnover=to_daily, cost=cost_daily,
+                drawdown=drawdown)
+
+
+def summary(res: dict[str, np.ndarray], periods: int = 252) -> dict[str, float]:
+    """年化收益 / 最大回撤 / 夏普 / 年化换手"""
+    eq, ret = res["equity"], res["ret"][1:]
+    years = max(len(eq) - 1, 1) / periods
+    std = ret.std()
+    return dict(
+        cagr=float(eq[-1] ** (1 / years) - 1),
+        max_drawdown=float(res["drawdown"].min()),
+        sharpe=float(ret.mean() / std * np.sqrt(periods)) if std > 0 else 0.0,
+        turnover=float(res["turnover"].sum() / years),
+    )
+
+
+__all__ = ["run_panel", "rebalance_mask", "ffill", "summary", "FREQS"]
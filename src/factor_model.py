@@ -2,8 +2,14 @@
 # -*- coding: utf-8 -*-
 """
 打分函数：给入 dataframe（由 utils.build_today_universe() 生成），返回因子分数并排序
+批量路径：日期 × 标的 × 因子 张量一次标准化（ScoreModel 缓存），一组或多组权重只做矩阵乘，
+top_k 用 argpartition 取前 k 名；score(df) 是它的单日包装
+可选中性化（config.yaml neutralize: true）：标准化后逐日对 行业哑变量 + 对数市值 回归取残差，
+全部日期 / 因子一次分组最小二乘完成，再做一遍 Z-Score
 """
 from __future__ import annotations
+import warnings
+
 import numpy as np
 import pandas as pd
 
@@ -19,34 +25,204 @@ WEIGHTS = dict(
 )
 F_LIST = list(WEIGHTS.keys())
 
+# 因子定义：F_xxx → (原始列, 方向, 变换)，score() 与 factor_tensor() 共用
+F_DEFS = dict(
+    F_pe=("pe_ttm", -1, None),
+    F_pb=("pb", -1, None),
+    F_mom=("pct_chg_20d", 1, None),
+    F_roa=("roa", 1, None),
+    F_turn=("turnover_rate_f", -1, None),
+    F_vol=("vol_20d", -1, None),
+    F_size=("total_mv", -1, np.log1p),
+)
+
+
+# ========== NumPy 批量打分（日期 × 标的 × 因子） ==========
+def standardize(X: np.ndarray, valid: np.ndarray | None = None) -> np.ndarray:
+    """
+    X: 日期 × 标的 × 因子 原始值（已乘方向 / 变换），valid: 日期 × 标的 截面掩码
+    逐日、所有因子一次完成：中位数填缺失（整列缺失 → 0）→ Z-Score（ddof=0，std≈0 → 0）
+    截面外为 NaN，返回 float32
+    """
+    x = np.asarray(X, dtype=np.float64)
+    v = (np.ones(x.shape[:2], dtype=bool) if valid is None else np.asarray(valid, dtype=bool))[..., None]
+    x = np.where(v, x, np.nan)
+    with warnings.catch_warnings(), np.errstate(all="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        med = np.nanmedian(x, axis=1, keepdims=True)
+        x = np.where(v & np.isnan(x), np.nan_to_num(med), x)
+        std = np.nanstd(x, axis=1, keepdims=True)
+        z = (x - np.nanmean(x, axis=1, keepdims=True)) / std
+    z = np.where(np.isnan(std) | (std < 1e-9), 0.0, z)
+    return np.where(v, z, np.nan).astype(np.float32)
+
+
+def neutralize(Z: np.ndarray, groups: np.ndarray, size: np.ndarray | None = None,
+               valid: np.ndarray | None = None, size_free: np.ndarray | None = None) -> np.ndarray:
+    """
+    Z: 日期 × 标的 × 因子；groups: 行业编码（标的 或 日期 × 标的，-1 为无行业，单独成组）；
+    size: 日期 × 标的 对数市值；size_free[k] 为 True 的因子只对行业回归（市值因子本身）
+    逐日截面 OLS  z ~ 行业哑变量 + size 的残差，按 Frisch–Waugh 拆成：
+        1. bincount 求 日期 × 行业 组均值，组内去均值（等价于行业哑变量）
+        2. 去均值后的 size 对 z 做一元回归：β[d, k] = Σx̃z̃ / Σx̃²（按日 bincount）
+    无逐日循环；残差再逐日 Z-Score，截面外为 NaN，返回 float32
+    """
+    D, N, F = Z.shape
+    v = ~np.isnan(Z[..., 0]) if valid is None else np.asarray(valid, dtype=bool)
+    g = np.broadcast_to(np.asarray(groups), (D, N))
+    G = int(g.max()) + 2
+    g = np.where(g < 0, G - 1, g)
+    day = np.nonzero(v)[0]
+    key = day * G + g[v]
+    cnt = np.bincount(key, minlength=D * G)
+
+    def demean(x: np.ndarray, ok: np.ndarray | None = None) -> np.ndarray:
+        """组内去均值；给出 ok 时只用 ok 的格子求均值，其余置 0"""
+        if ok is None:
+            return x - (np.bincount(key, weights=x, minlength=D * G) / np.maximum(cnt, 1))[key]
+        c = np.bincount(key, weights=ok, minlength=D * G)
+        mean = np.bincount(key, weights=np.where(ok, x, 0.0), minlength=D * G) / np.maximum(c, 1)
+        return np.where(ok, x - mean[key], 0.0)
+
+    res = np.ascontiguousarray(np.asarray(Z, dtype=np.float64)[v].T)   # F × M（截面内的格子）
+    for k in range(F):
+        res[k] = demean(res[k])
+    n = np.maximum(np.bincount(day, minlength=D), 1)
+    if size is not None:
+        x = np.asarray(size, dtype=np.float64)[v]
+        x = demean(x, ~np.isnan(x))                     # 市值缺失的不参与组均值与回归
+        sxx = np.bincount(day, weights=x * x, minlength=D)
+        free = np.zeros(F, dtype=bool) if size_free is None else np.asarray(size_free, dtype=bool)
+        for k in np.flatnonzero(~free):
+            sxy = np.bincount(day, weights=x * res[k], minlength=D)
+            beta = np.divide(sxy, sxx, out=np.zeros(D), where=sxx > 1e-12)
+            res[k] -= beta[day] * x
+    # 逐日 Z-Score（同 standardize：ddof=0，std≈0 → 0），同样按日 bincount
+    for k in range(F):
+        res[k] -= (np.bincount(day, weights=res[k], minlength=D) / n)[day]
+        sd = np.sqrt(np.bincount(day, weights=res[k] * res[k], minlength=D) / n)[day]
+        res[k] = np.divide(res[k], sd, out=np.zeros(len(day)), where=sd >= 1e-9)
+    out = np.full(Z.shape, np.nan, dtype=np.float32)
+    out[v] = res.T
+    return out
+
+
+def weight_matrix(w, f_list: list[str] | None = None) -> np.ndarray:
+    """dict / dict 列表 / 数组 → (F,) 或 (K, F) 权重"""
+    f_list = f_list or F_LIST
+    if isinstance(w, dict):
+        return np.array([w.get(f, 0) for f in f_list], dtype=np.float32)
+    if len(w) and isinstance(w[0], dict):
+        return np.array([[d.get(f, 0) for f in f_list] for d in w], dtype=np.float32)
+    return np.asarray(w, dtype=np.float32)
+
+
+def score_batch(Z: np.ndarray, W: np.ndarray) -> np.ndarray:
+    """Z: 日期 × 标的 × 因子；W: (F,) → 日期 × 标的，(K, F) → K × 日期 × 标的"""
+    if W.ndim == 1:
+        return Z @ W
+    return np.einsum("dnf,kf->kdn", Z, W)
+
 
-def _safe(df: pd.DataFrame, col: str) -> pd.Series:
-    """缺失值 → 全市场中位数；若整列缺失则 0"""
-    if col not in df or df[col].isna().all():
-        return pd.Series(0, index=df.index)
-    med = df[col].median()
-    return df[col].fillna(med)
+def top_k(S: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    沿最后一维（标的）取得分最高的 k 个：argpartition + 只对这 k 个排序
+    返回 (下标, 得分)，均按得分降序；NaN（截面外）视为 -inf，调用方按 isfinite 过滤
+    """
+    S = np.where(np.isnan(S), -np.inf, S)
+    k = min(k, S.shape[-1])
+    idx = np.argpartition(-S, k - 1, axis=-1)[..., :k]
+    top = np.take_along_axis(S, idx, axis=-1)
+    order = np.argsort(-top, axis=-1, kind="stable")
+    return np.take_along_axis(idx, order, axis=-1), np.take_along_axis(top, order, axis=-1)
 
 
-def _z(s: pd.Series) -> pd.Series:
-    """Z-Score 标准化，避免 std≈0"""
-    std = s.std(ddof=0)
-    if std < 1e-9 or np.isnan(std):
-        return pd.Series(0, index=s.index)
-    return (s - s.mean()) / std
+def raw_tensor(panel, f_list: list[str] | None = None, fillna: float | None = None) -> np.ndarray:
+    """
+    FactorPanel → 日期 × 标的 × 因子 原始值（已乘方向 / 变换）
+    fillna 不为 None 时先把截面内缺失填成该值（与 panel.cross_section 的 fillna(0) 一致）
+    """
+    f_list = f_list or F_LIST
+    out = np.empty(panel.valid.shape + (len(f_list),), dtype=np.float64)
+    for k, f in enumerate(f_list):
+        col, sign, fn = F_DEFS[f]
+        x = panel.field(col).astype(np.float64)
+        if fillna is not None:
+            x = np.where(np.isnan(x), fillna, x)
+        out[:, :, k] = sign * (fn(x) if fn is not None else x)
+    return out
 
 
-def score(df: pd.DataFrame, w: dict[str, float] | None = None) -> pd.DataFrame:
+def factor_tensor(panel, f_list: list[str] | None = None, fillna: float | None = None) -> np.ndarray:
+    """
+    多日因子面板（src.panel.FactorPanel）→ 标准化因子张量 日期 × 标的 × 因子（float32）
+    口径同 score()：逐日中位数填缺失、Z-Score、乘方向；截面外（panel.valid 为 False）为 NaN
+    """
+    return standardize(raw_tensor(panel, f_list, fillna), panel.valid)
+
+
+def _neutralize_panel(Z: np.ndarray, panel, f_list: list[str]) -> np.ndarray:
+    from src.factors.industry import industry_codes     # 延迟导入避免循环引用
+    mv = panel.field("total_mv").astype(np.float64)
+    size = np.log(np.where(mv > 0, mv, np.nan))
+    free = np.array([F_DEFS[f][0] == "total_mv" for f in f_list])
+    return neutralize(Z, industry_codes(panel.codes), size, panel.valid, free)
+
+
+class ScoreModel:
+    """缓存标准化因子张量 Z；换一组 / 多组权重重新打分只是一次矩阵乘"""
+
+    def __init__(self, Z: np.ndarray, codes, f_list: list[str] | None = None):
+        self.Z = Z
+        self.codes = np.asarray(codes)
+        self.f_list = list(f_list or F_LIST)
+
+    @classmethod
+    def from_panel(cls, panel, f_list: list[str] | None = None,
+                   fillna: float | None = None, neutral: bool = False) -> "ScoreModel":
+        f_list = f_list or F_LIST
+        Z = factor_tensor(panel, f_list, fillna)
+        if neutral:
+            Z = _neutralize_panel(Z, panel, f_list)
+        return cls(Z, panel.codes, f_list)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, f_list: list[str] | None = None,
+                   neutral: bool = False) -> "ScoreModel":
+        """单日截面 df（build_today_universe 的列）→ 1 × N × F；中性化用 df['industry']"""
+        f_list = f_list or F_LIST
+        X = np.empty((1, len(df), len(f_list)))
+        for k, f in enumerate(f_list):
+            col, sign, fn = F_DEFS[f]
+            x = df[col].to_numpy(np.float64) if col in df else np.full(len(df), np.nan)
+            X[0, :, k] = sign * (fn(x) if fn is not None else x)
+        Z = standardize(X)
+        if neutral:
+            groups = pd.factorize(df["industry"])[0] if "industry" in df else np.full(len(df), -1)
+            mv = df["total_mv"].to_numpy(np.float64) if "total_mv" in df else np.full(len(df), np.nan)
+            size = np.log(np.where(mv > 0, mv, np.nan))[None]
+            free = np.array([F_DEFS[f][0] == "total_mv" for f in f_list])
+            Z = neutralize(Z, groups, size, size_free=free)
+        return cls(Z, df["ts_code"] if "ts_code" in df else df.index, f_list)
+
+    def scores(self, w=None) -> np.ndarray:
+        return score_batch(self.Z, weight_matrix(WEIGHTS if w is None else w, self.f_list))
+
+    def top(self, w=None, k: int = 10) -> tuple[np.ndarray, np.ndarray]:
+        return top_k(self.scores(w), k)
+
+
+def score(df: pd.DataFrame, w: dict[str, float] | None = None,
+          neutral: bool = False) -> pd.DataFrame:
+    """单日截面打分并按 score 降序（ScoreModel 的 DataFrame 包装）"""
     w = w or WEIGHTS
-    df = df.copy()
-
-    df["F_pe"] = -_z(_safe(df, "pe_ttm"))
-    df["F_pb"] = -_z(_safe(df, "pb"))
-    df["F_mom"] = _z(_safe(df, "pct_chg_20d"))
-    df["F_roa"] = _z(_safe(df, "roa"))
-    df["F_turn"] = -_z(_safe(df, "turnover_rate_f"))
-    df["F_vol"] = -_z(_safe(df, "vol_20d"))
-    df["F_size"] = -_z(_safe(df, "total_mv").apply(np.log1p))
-
-    df["score"] = sum(df[f] * w.get(f, 0) for f in F_LIST)
-    return df.sort_values("score", ascending=False)
+    model = ScoreModel.from_frame(df, neutral=neutral)
+    s = model.scores(w)[0]
+    out = df.copy()
+    out[F_LIST] = model.Z[0].astype(np.float64)
+    out["score"] = s.astype(np.float64)
+    return out.iloc[np.argsort(-s, kind="stable")]
+
+
+__all__ = ["WEIGHTS", "F_LIST", "F_DEFS", "score", "ScoreModel", "standardize",
+           "score_batch", "top_k", "weight_matrix", "raw_tensor", "factor_tensor", "neutralize"]
@@ -1,3 +1,4 @@
 from .industry import industry_momentum
 from .industry import size_factor  # 仍在同文件中实现
-__all__ = ["industry_momentum", "size_factor"]
+from .industry import industry_map, industry_codes
+__all__ = ["industry_momentum", "size_factor", "industry_map", "industry_codes"]
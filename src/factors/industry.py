@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-"""行业动量 & 市值因子"""
+"""行业动量 & 市值因子；行业标签（证券主表 src.secmaster）供 factor_model.neutralize 使用"""
 from __future__ import annotations
 import pandas as pd
 import numpy as np
@@ -28,3 +28,16 @@ def size_factor(df: pd.DataFrame) -> pd.Series:
     mv = df["total_mv"].replace(0, np.nan)
     mv = mv.fillna(mv.median())
     return -_z(np.log(mv))
+
+# ========== 行业标签 ==========
+def industry_map() -> pd.Series:
+    """ts_code → 行业名（证券主表里的股票，含退市 / 暂停上市）"""
+    from src.secmaster import get_secmaster        # 延迟导入避免循环引用
+    fr = get_secmaster().frame
+    return fr.loc[fr["asset"] == "stock", "industry"]
+
+
+def industry_codes(codes) -> np.ndarray:
+    """标的 → 行业整数编码（int32），无标签为 -1"""
+    ind = industry_map().reindex(pd.Index(codes))
+    return pd.factorize(ind)[0].astype(np.int32)
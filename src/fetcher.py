@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+并发 + 限速的 TuShare 批量取数
+* 线程池并发执行一批 (api_fn, kwargs) 任务，结果按完成顺序流式返回
+* 每个 API 一个令牌桶（次/分钟，见 config.yaml 的 rate_limits），跑满配额但不超限
+* 失败指数退避 + 随机抖动重试；最终失败返回空 df（与 safe_query 一致）
+* 可挂 src.cache 读穿缓存，命中的任务不占配额
+"""
+from __future__ import annotations
+
+import functools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterable, Iterator
+
+import pandas as pd
+from loguru import logger
+
+from src.cache import QueryCache, api_name
+from src.metrics import get_metrics
+
+DEFAULT_RATE = 200            # 次/分钟，未单独配置的 API 用它
+Job = tuple[Callable, dict]
+
+
+class TokenBucket:
+    """rate 次/分钟，桶容量 burst；acquire() 阻塞到拿到令牌"""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = rate / 60.0
+        self.capacity = float(burst or max(1, int(self.rate)))
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class FetchExecutor:
+    """run(jobs) → 迭代 ((api_fn, kwargs), df)，按完成顺序"""
+
+    def __init__(
+        self,
+        workers: int = 8,
+        limits: dict[str, float] | None = None,
+        retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        cache: QueryCache | None = None,
+    ):
+        self.workers = workers
+        self.limits = dict(limits or {})
+        self.retries = max(1, int(retries))           # 总尝试次数；0 也至少调一次
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.cache = cache
+        self._buckets: dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, api: str) -> TokenBucket:
+        with self._lock:
+            if api not in self._buckets:
+                rate = self.limits.get(api, self.limits.get("default", DEFAULT_RATE))
+                self._buckets[api] = TokenBucket(rate)
+            return self._buckets[api]
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def call(self, api_fn: Callable, *, strict: bool = False, **kwargs) -> pd.DataFrame | None:
+        """单次调用：缓存 → 限速 → 重试；重试用尽返回空表，strict=True 时返回 None（与"当天无数据"区分）"""
+        api, metrics = api_name(api_fn), get_metrics()
+        if self.cache is not None:
+            hit = self.cache.lookup(api_fn, kwargs)
+            metrics.record_cache(api, hit is not None)
+            if hit is not None:
+                return hit
+        bucket = self._bucket(api)
+        t0 = time.perf_counter()
+        for attempt in range(self.retries):
+            bucket.acquire()
+            try:
+                df = api_fn(**kwargs)
+                break
+            except Exception as e:                   # noqa: BLE001
+                if attempt == self.retries - 1:
+                    metrics.record_call(api, time.perf_counter() - t0, retries=attempt, error=True)
+                    logger.error("tushare 查询失败：{} {} {}", api, kwargs, e)
+                    return None if strict else pd.DataFrame()
+                time.sleep(self._backoff(attempt))
+        metrics.record_call(api, time.perf_counter() - t0, df, retries=attempt)
+        if self.cache is not None:
+            self.cache.save(api_fn, kwargs, df)
+        return df
+
+    def run(self, jobs: Iterable[Job], strict: bool = False) -> Iterator[tuple[Job, pd.DataFrame | None]]:
+        """strict 见 call()"""
+        jobs = list(jobs)
+        if not jobs:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs))) as pool:
+            futs = {pool.submit(self.call, fn, strict=strict, **kw): (fn, kw) for fn, kw in jobs}
+            for fut in as_completed(futs):
+                yield futs[fut], fut.result()
+
+
+@functools.lru_cache(maxsize=None)
+def get_executor() -> FetchExecutor:
+    """进程内单例：config.yaml 的 fetch_workers / rate_limits + 磁盘缓存"""
+    from src.config import load_cfg
+    from src.cache import get_cache
+    cfg = load_cfg()
+    return FetchExecutor(workers=int(cfg.get("fetch_workers", 8)),
+                         limits=cfg.get("rate_limits"), cache=get_cache())
+
+
+__all__ = ["TokenBucket", "FetchExecutor", "get_executor"]
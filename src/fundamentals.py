@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+时点（point-in-time）财务指标：本地 fina_indicator 全历史（按公告日），一次读入内存
+* 每条记录在公告日之后的第一个交易日起可见（公告多在盘后），杜绝未来函数
+* 同一股票后公告的旧报告期（如年报晚于一季报披露）不覆盖已知的新报告期；
+  同一报告期的更正公告按新值覆盖
+* asof(days, codes)：任意 日期 × 标的 网格一次 searchsorted + 前向填充，
+  2000 天的面板也只读一遍仓库、不调 API
+* frame(td)：单日截面（build_today_universe 用），与 asof([td]) 一致
+"""
+from __future__ import annotations
+
+import datetime as dt
+import functools
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.store import TABLES, get_store
+
+KEYS = ("ts_code", "ann_date", "end_date")
+FIELDS = tuple(c for c in TABLES["fina_indicator"]["cols"] if c not in KEYS)   # roa, roe …
+LOOKBACK_DAYS = 400              # 本地无数据时在线回补的公告区间（覆盖最近一期年报）
+
+
+class Fundamentals:
+    """records 按 (ts_code, ann_date, end_date) 升序，已剔除“旧报告期晚公告”的记录"""
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.dropna(subset=list(KEYS)).copy()
+        df["ann"] = df["ann_date"].astype(np.int64)
+        df["end"] = df["end_date"].astype(np.int64)
+        df = df.sort_values(["ts_code", "ann", "end"], kind="stable", ignore_index=True)
+        newest = df.groupby("ts_code", sort=False)["end"].cummax()
+        self.records = df[df["end"] >= newest].reset_index(drop=True)
+        self.fields = [f for f in FIELDS if f in df.columns]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    # ---------- 构造 ----------
+    @classmethod
+    def from_store(cls) -> "Fundamentals":
+        return cls(get_store().read("fina_indicator"))
+
+    @classmethod
+    def fetch(cls, start: str, end: str) -> "Fundamentals":
+        """在线按公告日区间一次拉取（走 safe_query 磁盘缓存）"""
+        from src.utils import pro, safe_query                 # 延迟导入避免循环引用
+        df = safe_query(pro.fina_indicator, start_date=start, end_date=end,
+                        fields=",".join(TABLES["fina_indicator"]["cols"]))
+        return cls(df if not df.empty else pd.DataFrame(columns=list(KEYS)))
+
+    # ---------- as-of ----------
+    def asof(self, days: list[str], codes: list[str],
+             fields: list[str] | None = None) -> dict[str, np.ndarray]:
+        """字段 → 日期 × 标的 矩阵（float64，未披露为 NaN）；days 升序"""
+        fields = list(fields or self.fields)
+        out = {f: np.full((len(days), len(codes)), np.nan) for f in fields}
+        rec = self.records
+        if rec.empty or not days:
+            return out
+        day_int = np.asarray(days, dtype=np.int64)
+        r = np.searchsorted(day_int, rec["ann"].to_numpy(), "right")   # 公告次个交易日生效
+        c = pd.Index(codes).get_indexer(rec["ts_code"])
+        ok = (r < len(days)) & (c >= 0)
+        for f in fields:
+            v = rec[f].to_numpy(dtype=np.float64)
+            k = np.flatnonzero(ok & ~np.isnan(v))                     # 未披露的字段沿用上次值
+            # 同一格子多条时按 records 顺序最后一条生效（最新公告 / 最新报告期）
+            k = k[~pd.DataFrame({"r": r[k], "c": c[k]}).duplicated(keep="last").to_numpy()]
+            out[f][r[k], c[k]] = v[k]
+            out[f] = pd.DataFrame(out[f]).ffill().to_numpy()
+        return out
+
+    def frame(self, td: str, fields: list[str] | None = None) -> pd.DataFrame:
+        """td 当日可见的最新值：ts_code + 字段（逐字段取最后一个非空值，与 asof 一致）"""
+        fields = list(fields or self.fields)
+        rec = self.records
+        seen = rec[rec["ann"] < int(td)]
+        return seen.groupby("ts_code", sort=True)[fields].last().reset_index()
+
+
+# ========== 进程内缓存：本地仓库有新公告（最后日期变化）才重读 ==========
+@functools.lru_cache(maxsize=1)
+def _from_store(last: str) -> Fundamentals:
+    pit = Fundamentals.from_store()
+    logger.debug("时点财务指标 → {:,} 条（截至 {}）", len(pit), last)
+    return pit
+
+
+def get_fundamentals(td: str | None = None) -> Fundamentals:
+    """优先本地仓库；仓库为空时按 td 向前 LOOKBACK_DAYS 天在线拉一次"""
+    last = get_store().last_date("fina_indicator")
+    if last is not None:
+        return _from_store(last)
+    end = td or dt.date.today().strftime("%Y%m%d")
+    start = (dt.datetime.strptime(end, "%Y%m%d") - dt.timedelta(days=LOOKBACK_DAYS)).strftime("%Y%m%d")
+    logger.warning("本地无 fina_indicator（先运行 fetch_history.py），在线拉取 {}~{}", start, end)
+    return Fundamentals.fetch(start, end)
+
+
+__all__ = ["Fundamentals", "get_fundamentals", "FIELDS", "LOOKBACK_DAYS"]
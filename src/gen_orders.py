@@ -1,21 +1,26 @@
 # -*- coding: utf-8 -*-
 """
-生成今日（或最近一个交易日）的再平衡下单 CSV，同时维护 state_portfolio.json
+生成今日（或最近一个交易日）的再平衡下单 CSV，同时把委托 / 成交追加进组合账本（src.ledger）
+代码 / 交易所 / 每手数量查证券主表（src.secmaster），价格一次整截面取齐后按代码查表
+config.yaml 风控四项（src.risk）：账本里的 α 持仓触发止损 / 回撤 / 均线 → 清仓，止盈 → 卖一半；
+跌破均线的候选股当天不买
 """
 from __future__ import annotations
 
-import json
+import argparse
 from pathlib import Path
 from datetime import datetime as dt
 from loguru import logger
+import numpy as np
 import pandas as pd
 
-from src.utils import (
-    build_today_universe,
-    latest_trade_date,
-    safe_query,  # ⬅ 用于临时拉取行情
-    pro,         # ⬅ tushare.pro client
-)
+from src.utils import latest_trade_date
+from src.snapshot import universe
+from src.secmaster import SecMaster, get_secmaster
+from src.loader import PricePanel, to_matrix
+from src.ledger import Ledger, get_ledger
+from src.risk import active, position_signals, rules, trend_ok
+from src.metrics import get_metrics, stage
 
 # -----------------------------------------------------------------------------
 # ★ 策略 / 资金参数 —— 如需改动，只动这里 --------------------------------------
@@ -28,8 +33,7 @@ CFG = {
     "bond_ratio": 0.1,
     # α 算法参数
     "num_alpha": 10,      # 每次买入 α 股数量
-    "stop_loss": 0.12,    # 亏损超过 12% 清仓
-    "take_profit": 0.25,  # 盈利超过 25% 卖一半
+    # 止损 / 止盈 / 回撤 / 均线 见 config.yaml（src.risk 与回测共用一套规则）
     # ETF 代码（不用写交易所后缀）
     "core_etf":  "510300",
     "bond_etf":  "511010",
@@ -38,123 +42,186 @@ CFG = {
 
 # 常量
 CSV_DIR   = Path(__file__).resolve().parent.parent / "orders"
-STATE_FP  = Path(__file__).resolve().parent.parent / "state_portfolio.json"
-LOT_STK   = 100   # 股票 100 股/手
-LOT_FUND  = 10    # ETF   10 份/手
+STATE_FP  = Path(__file__).resolve().parent.parent / "state_portfolio.json"   # 旧仓位快照，仅首次迁移读
+RISK_LOOKBACK = 250   # 风控取价窗口上限（交易日）：建仓以来最高价 / 均线
 
-CSV_DIR.mkdir(exist_ok=True)
-TD = latest_trade_date()           # 例如 20250627
-DF = build_today_universe(TD)      # 今日截面，已做完整因子 & 基础字段拼接
-
-
-# -----------------------------------------------------------------------------#
-# 辅助：安全取某只标的当日 close 价格
-def _px_of(code: str, trade_date: str) -> float | None:
-    """
-    先从 `DF` 里找；找不到再去 tushare 拉一次（股票: daily / ETF: fund_daily）
-    返回 None 表示依旧取不到
-    """
-    # 1) DF 里（含 .SH / .SZ 后缀）
-    row = DF.loc[DF["ts_code"].str.startswith(code), "close"]
-    if not row.empty and pd.notna(row.iat[0]) and row.iat[0] > 0:
-        return float(row.iat[0])
-
-    # 2) tushare API
-    is_fund = code.startswith(("5", "1"))  # 5/1 开头视作 ETF
-    api_fn  = pro.fund_daily if is_fund else pro.daily
-    df_api  = safe_query(api_fn, ts_code=f"{code}.SH", trade_date=trade_date,
-                         fields="close")
-    if df_api.empty:
-        df_api = safe_query(api_fn, ts_code=f"{code}.SZ", trade_date=trade_date,
-                            fields="close")
-    if not df_api.empty and pd.notna(df_api["close"].iat[0]):
-        return float(df_api["close"].iat[0])
-
-    return None
-# -----------------------------------------------------------------------------#
-
-
-orders: list[list] = []  # [代码, B/S, 价格, 数量]
 
 # === 1. α 股池（已按因子打分排序 ↓）
-alpha_df = DF.sort_values("score", ascending=False).head(CFG["num_alpha"])
-
-def _add_stock(row):
+def _add_stock(row, lot: int, orders: list[list]) -> None:
     price = float(row["close"])
     if price <= 0:
         logger.error(f"{row.ts_code} 当日价格非法，跳过该股")
         return
 
     cash_each = CFG["cash"] * CFG["alpha_ratio"] / CFG["num_alpha"]
-    qty = int(cash_each // price // LOT_STK) * LOT_STK
-    if qty < LOT_STK:
+    qty = int(cash_each // price // lot) * lot
+    if qty < lot:
         logger.warning(f"{row.ts_code} 价格 {price:.2f} 太高，买入不足一手，跳过")
         return
 
-    orders.append([row.ts_code.split(".")[0], "B", round(price * 1.01, 2), qty])
-
-alpha_df.apply(_add_stock, axis=1)
+    orders.append([row.ts_code, "B", round(price * 1.01, 2), qty])
 
 
 # === 2. ETF（核心 & 债券）
-def _add_etf(code: str, ratio: float):
-    px = _px_of(code, TD)
-    if px is None:
+def _add_etf(code: str, ratio: float, sm: SecMaster, close: pd.Series, orders: list[list]) -> None:
+    ts_code = sm.resolve(code)
+    px = float(sm.prices([code], close)[0])
+    if ts_code is None or np.isnan(px):
         logger.error(f"找不到 {code} 当日行情，跳过该 ETF")
         return
 
+    lot  = sm.lot(ts_code)
     cash = CFG["cash"] * ratio
-    qty  = int(cash // px // LOT_FUND) * LOT_FUND
-    if qty < LOT_FUND:
+    qty  = int(cash // px // lot) * lot
+    if qty < lot:
         logger.warning(f"{code} 价格 {px:.2f} 太高，买不足一手，跳过")
         return
 
-    orders.append([code, "B", 0, qty])  # ETF 市价买入
-
-_add_etf(CFG["core_etf"],  CFG["core_ratio"])
-_add_etf(CFG["bond_etf"],  CFG["bond_ratio"])
-
-
-# === 3. 写 CSV  ===============================================================
-csv_path = CSV_DIR / f"orders_{TD}.csv"
-pd.DataFrame(
-    orders, columns=["证券代码", "买卖标志", "委托价格", "委托数量"]
-).to_csv(csv_path, index=False, encoding="utf-8-sig")
-logger.success(f"CSV 生成 → {csv_path}")
-
-# === 4. 更新仓位快照 ==========================================================
-state = {"equity": CFG["cash"], "max_equity": CFG["cash"], "position": {}}
-if STATE_FP.exists():
-    state = json.loads(STATE_FP.read_text())
-
-for sec_code, bs, price, qty in orders:
-    matching_codes = DF.loc[DF["ts_code"].str.startswith(sec_code), "ts_code"]
-    if not matching_codes.empty:
-        ts_code = matching_codes.iat[0]
-    else:
-        # 如果在 DF 中未找到，很可能是ETF。手动添加后缀
-        # 简单规则：上交所ETF通常以'51'开头，深交所通常以'15'或'16'开头
-        if str(sec_code).startswith('5'):
-            ts_code = f"{sec_code}.SH"
-        elif str(sec_code).startswith('1'):
-            ts_code = f"{sec_code}.SZ"
-        else:
-            # 对于其他情况或未知的股票代码，默认后缀并记录警告
-            logger.warning(f"代码 {sec_code} 在行情截面中未找到，将默认使用 .SH 后缀更新仓位。")
-            ts_code = f"{sec_code}.SH"
-    if bs == "B":
-        info = state["position"].get(ts_code, {"cost": 0, "qty": 0})
-        total_cost = info["cost"] * info["qty"] + (price or _px_of(sec_code, TD)) * qty
-        total_qty  = info["qty"] + qty
-        state["position"][ts_code] = {
-            "cost": total_cost / total_qty,
-            "qty":  total_qty
-        }
-    else:  # S 卖出
-        if ts_code in state["position"]:
-            state["position"][ts_code]["qty"] -= qty
-            if state["position"][ts_code]["qty"] <= 0:
-                state["position"].pop(ts_code)
-
-STATE_FP.write_text(json.dumps(state, ensure_ascii=False, indent=2))
-logger.success(f"仓位快照已更新 → {STATE_FP}")
+    orders.append([ts_code, "B", 0, qty])  # ETF 市价买入
+
+
+# === 3. 风控卖出 ===============================================================
+def _store_panel(store, days: list[str], codes: list[str]) -> PricePanel:
+    """本地仓库的 close + 复权因子（不回源）"""
+    px = store.read("daily", start=days[0], end=days[-1], ts_code=codes,
+                    fields="ts_code,trade_date,close")
+    fac = store.read("adj_factor", start=days[0], end=days[-1], ts_code=codes,
+                     fields="ts_code,trade_date,adj_factor")
+    factor = pd.DataFrame(to_matrix(fac, days, codes, "adj_factor")).ffill().fillna(1.0).to_numpy()
+    return PricePanel(days, codes, to_matrix(px, days, codes, "close"), factor)
+
+
+def _risk_orders(td: str, sm: SecMaster, close: pd.Series, picks: list[str]) -> tuple[list[list], set]:
+    """
+    账本中 α 持仓（ETF 底仓不管）按 config.yaml 风控规则生成卖单；
+    返回 (卖单, 当天不买的候选)：跌破均线的候选与正在清仓的代码
+    价格只读本地仓库，不在下单时刻回源；本地历史不够的均线 / 回撤规则当天跳过并告警
+    """
+    from src.config import load_cfg                   # 延迟导入避免循环引用
+    from src.engine import ffill
+    from src.store import get_store
+    from src.trade_calendar import get_calendar
+
+    r = rules(load_cfg())
+    if not active(r):
+        return [], set()
+    pos = _ledger().positions()
+    pos = pos[~pos["ts_code"].map(sm.is_etf).astype(bool)].reset_index(drop=True)
+    codes = sorted(set(pos["ts_code"]) | set(picks))
+    if not codes:
+        return [], set()
+
+    cal = get_calendar()
+    need = max([r["trend_ma"], 1] + [len(cal.range(o, td)) for o in pos["opened"].dropna()])
+    days = cal.range(cal.prev(td, min(need, RISK_LOOKBACK) - 1) or td, td)
+    # 下单时刻只读本地仓库（不整窗回源）：取本地连续覆盖到 td 的尾段，缺历史的规则当天跳过
+    store = get_store()
+    have = store.dates("daily", days[0], td) & store.dates("adj_factor", days[0], td)
+    k = len(days)
+    while k and days[k - 1] in have:
+        k -= 1
+    if k:
+        local = days[k:]
+        r = dict(r)
+        if r["trend_ma"] and len(local) < r["trend_ma"]:
+            logger.warning(f"本地仓库仅覆盖 {len(local)} 天（< trend_ma={r['trend_ma']}），今日跳过均线规则")
+            r["trend_ma"] = 0
+        opened = pos["opened"].dropna()
+        if r["max_drawdown"] and (not local or (opened < local[0]).any()):
+            logger.warning("本地仓库未覆盖到持仓建仓日，今日跳过回撤规则")
+            r["max_drawdown"] = 0
+        days = local
+    if days:
+        panel = _store_panel(store, days, codes)
+    else:                                             # td 本身不在本地：只剩止损 / 止盈，用当日收盘
+        days = [td]
+        panel = PricePanel(days, codes, close.reindex(codes).to_numpy(np.float64)[None, :])
+    adj = np.nan_to_num(ffill(panel.adj_close))
+
+    sells, blocked = [], set()
+    if len(pos):
+        entry = np.searchsorted(days, pos["opened"].fillna("").to_numpy().astype(str))
+        px = close.reindex(pos["ts_code"]).to_numpy(np.float64)
+        exit_, halve = position_signals(adj[:, panel.col(pos["ts_code"])], px,
+                                        pos["cost"].to_numpy(), entry, pos["trimmed"].to_numpy(), r)
+        for i in np.flatnonzero(exit_ | halve):
+            code, lot = pos.at[i, "ts_code"], sm.lot(pos.at[i, "ts_code"])
+            qty = int(pos.at[i, "qty"]) if exit_[i] else int(pos.at[i, "qty"]) // 2 // lot * lot
+            if qty <= 0 or not px[i] > 0:
+                continue
+            sells.append([code, "S", round(px[i] * 0.99, 2), qty])
+            blocked.add(code)
+            logger.warning(f"{code} 触发风控{'清仓' if exit_[i] else '止盈减半'}，卖出 {qty}")
+    ok = trend_ok(adj[:, panel.col(picks)], r) if picks else []
+    blocked |= {c for c, good in zip(picks, ok) if not good}
+    return sells, blocked
+
+
+# === 4. 写 CSV  ===============================================================
+def _write_csv(orders: list[list], td: str) -> Path:
+    CSV_DIR.mkdir(exist_ok=True)
+    csv_path = CSV_DIR / f"orders_{td}.csv"
+    out = pd.DataFrame(orders, columns=["证券代码", "买卖标志", "委托价格", "委托数量"])
+    out["证券代码"] = out["证券代码"].str[:6]           # 券商导入只要 6 位代码
+    out.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    logger.success(f"CSV 生成 → {csv_path}")
+    return csv_path
+
+
+# === 5. 记账 ==================================================================
+def _ledger() -> Ledger:
+    """账本单例；新账本从旧 state_portfolio.json 迁移，没有则以 CFG 现金起始"""
+    led = get_ledger()
+    led.init(CFG["cash"], legacy=STATE_FP)
+    return led
+
+
+def _update_state(orders: list[list], close: pd.Series, td: str) -> None:
+    """orders 的代码已是 ts_code；市价单（价格 0）按当日收盘价记成交，随后按收盘价盯市"""
+    led = _ledger()
+    n = led.record(td, orders, close)
+    row = led.mark(td, close)
+    logger.success(f"账本已追加 {n} 笔成交，净值 {row['equity']:,.2f} → {led.path}")
+
+
+def run(td: str, df: pd.DataFrame | None = None) -> Path:
+    """
+    生成 td 截面对应的订单 CSV 并记账，返回 CSV 路径
+    df 为已打分的当日截面（src.scheduler 常驻进程预先算好）；缺省读截面快照，未命中现场构建
+    """
+    if df is None:
+        df = universe(td)                     # 今日截面，已做完整因子 & 基础字段拼接（src.snapshot）
+    sm = get_secmaster()
+    close = sm.close(td, df)                  # 股票取截面，ETF 一次 fund_daily 整截面
+    orders: list[list] = []                   # [ts_code, B/S, 价格, 数量]
+
+    alpha_df = df.sort_values("score", ascending=False).head(CFG["num_alpha"])
+    with stage("risk"):
+        sells, blocked = _risk_orders(td, sm, close, alpha_df["ts_code"].tolist())
+    orders.extend(sells)
+
+    with stage("order_sizing"):
+        for _, row in alpha_df.iterrows():
+            if row.ts_code in blocked:
+                logger.info(f"{row.ts_code} 风控不买入（跌破均线 / 当日清仓）")
+                continue
+            _add_stock(row, sm.lot(row.ts_code), orders)
+        _add_etf(CFG["core_etf"], CFG["core_ratio"], sm, close, orders)
+        _add_etf(CFG["bond_etf"], CFG["bond_ratio"], sm, close, orders)
+
+    path = _write_csv(orders, td)
+    _update_state(orders, close, td)
+    return path
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="生成再平衡下单 CSV 并记入组合账本")
+    ap.add_argument("--date", default=None, help="交易日 YYYYMMDD，默认最近一个交易日")
+    args = ap.parse_args()
+
+    run(args.date or latest_trade_date())     # 例如 20250627
+    get_metrics().dump("gen_orders")
+
+
+if __name__ == "__main__":
+    main()
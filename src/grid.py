@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+内存有界的多进程权重网格搜索
+* 权重组合按整数编号流式生成（混合进制展开），每次只物化一个 chunk
+* 每个 chunk：S = F @ W.T → np.partition 取每列 Top-N → 打分，只保留全局前 keep 名
+* 因子矩阵 F 放进 multiprocessing.shared_memory，各进程零拷贝读取
+* chunk 大小由内存上限 max_mem_mb / 进程数 推出，峰值内存与组合总数无关
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+_F: np.ndarray | None = None          # 子进程里挂载的共享因子矩阵
+_SHM: shared_memory.SharedMemory | None = None
+
+
+# ========== 组合编号 → 权重 ==========
+def weight_chunk(start: int, stop: int, grid: np.ndarray, n_f: int) -> np.ndarray:
+    """第 [start, stop) 个组合的归一化权重（全 0 组合为 NaN 行）"""
+    digits = np.unravel_index(np.arange(start, stop), (len(grid),) * n_f)
+    W = grid[np.stack(digits, axis=1)].astype(np.float32)
+    total = W.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, W / total, np.nan)
+
+
+def top_sharpe(F: np.ndarray, W: np.ndarray, top_n: int) -> np.ndarray:
+    """每组权重：得分 Top-N 的 均值 / 标准差（与原 tune_fast 口径一致），无效为 -9"""
+    S = F @ np.nan_to_num(W).T                              # N × C
+    top_n = min(top_n, S.shape[0])                          # 截面不足 N 只（早期 / 小样本）取全部
+    if top_n == 0:
+        return np.full(W.shape[0], -9.0)
+    top = np.partition(S, S.shape[0] - top_n, axis=0)[-top_n:]
+    mean, std = top.mean(axis=0), top.std(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(std > 0, mean / std, -9.0)
+    return np.where(np.isnan(W).any(axis=1), -9.0, out)
+
+
+def _merge(best_i, best_v, idx, val, keep: int):
+    i, v = np.r_[best_i, idx], np.r_[best_v, val]
+    if len(v) > keep:
+        sel = np.argpartition(v, len(v) - keep)[-keep:]
+        i, v = i[sel], v[sel]
+    return i, v
+
+
+def _search_range(F, start, stop, grid, chunk, top_n, keep):
+    best_i, best_v = np.empty(0, np.int64), np.empty(0, np.float32)
+    for a in range(start, stop, chunk):
+        b = min(a + chunk, stop)
+        val = top_sharpe(F, weight_chunk(a, b, grid, F.shape[1]), top_n)
+        best_i, best_v = _merge(best_i, best_v, np.arange(a, b), val, keep)
+    return best_i, best_v
+
+
+# ========== 子进程：挂载共享内存 ==========
+def _attach(name: str, shape: tuple, dtype: str) -> None:
+    global _F, _SHM
+    _SHM = shared_memory.SharedMemory(name=name)
+    _F = np.ndarray(shape, dtype=dtype, buffer=_SHM.buf)
+
+
+def _worker(args):
+    start, stop, grid, chunk, top_n, keep = args
+    return _search_range(_F, start, stop, grid, chunk, top_n, keep)
+
+
+# ========== 入口 ==========
+def grid_search(
+    F: np.ndarray,
+    grid,
+    top_n: int = 50,
+    keep: int = 10,
+    workers: int | None = None,
+    max_mem_mb: float = 256,
+) -> list[tuple[float, np.ndarray]]:
+    """
+    F: 标的 × 因子 标准化因子矩阵；grid: 每个因子的候选权重。
+    返回得分最高的 keep 组 [(score, 归一化权重)]，降序
+    """
+    F = np.ascontiguousarray(F, dtype=np.float32)
+    grid = np.asarray(grid, dtype=np.float32)
+    N, n_f = F.shape
+    total = len(grid) ** n_f
+    workers = workers or os.cpu_count() or 1
+    # 每个组合约占 S 一列 + partition 副本 + 余量：3 × N × 4 字节
+    chunk = max(1, int(max_mem_mb * 2**20 / workers / (3 * N * 4)))
+
+    if workers == 1:
+        best_i, best_v = _search_range(F, 0, total, grid, chunk, top_n, keep)
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=F.nbytes)
+        try:
+            np.ndarray(F.shape, dtype=F.dtype, buffer=shm.buf)[:] = F
+            span = max(chunk, -(-total // (workers * 4)))     # 每个任务若干 chunk，便于负载均衡
+            tasks = [(a, min(a + span, total), grid, chunk, top_n, keep)
+                     for a in range(0, total, span)]
+            best_i, best_v = np.empty(0, np.int64), np.empty(0, np.float32)
+            with ProcessPoolExecutor(workers, initializer=_attach,
+                                     initargs=(shm.name, F.shape, F.dtype.str)) as pool:
+                for i, v in pool.map(_worker, tasks):
+                    best_i, best_v = _merge(best_i, best_v, i, v, keep)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    order = np.argsort(-best_v)
+    return [(float(best_v[k]), weight_chunk(best_i[k], best_i[k] + 1, grid, n_f)[0])
+            for k in order]
+
+
+__all__ = ["grid_search", "weight_chunk", "top_sharpe"]
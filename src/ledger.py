@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""
+组合账本（SQLite，WAL）：替代每次整体重写的 state_portfolio.json
+* orders / fills：只追加，每次下单只写本次的委托与成交，一个事务内完成，中途崩溃整体回滚
+* positions：当前持仓的物化视图，随每笔成交在同一事务里更新（加权成本 / 已实现盈亏在库内算），
+  读持仓不必回放历史
+* equity / snapshots：每个交易日收盘盯市一行净值 + 一份持仓快照，
+  任意区间的净值 / 盈亏 / 换手一条带主键索引的查询取出，不再回放 orders/ 下的 CSV
+* 首次打开时可从旧 state_portfolio.json 迁移持仓与现金（只读不动原文件，
+  meta.migrated_from 记录来源，账本已初始化即不再迁移）
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import functools
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+import pandas as pd
+from loguru import logger
+
+from src.store import DATA_DIR
+
+LEDGER_PATH = DATA_DIR / "ledger.sqlite"
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, trade_date TEXT, ts_code TEXT,
+        side TEXT, price REAL, qty INTEGER, created TEXT)""",
+    """CREATE TABLE IF NOT EXISTS fills (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER REFERENCES orders(id),
+        trade_date TEXT, ts_code TEXT, side TEXT, price REAL, qty INTEGER,
+        amount REAL, realized REAL)""",
+    """CREATE TABLE IF NOT EXISTS positions (
+        ts_code TEXT PRIMARY KEY, qty INTEGER, cost REAL, last_date TEXT, opened TEXT)""",
+    """CREATE TABLE IF NOT EXISTS equity (
+        trade_date TEXT PRIMARY KEY, cash REAL, market_value REAL, equity REAL,
+        turnover REAL, realized REAL)""",
+    """CREATE TABLE IF NOT EXISTS snapshots (
+        trade_date TEXT, ts_code TEXT, qty INTEGER, cost REAL, close REAL,
+        PRIMARY KEY (trade_date, ts_code))""",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+    "CREATE INDEX IF NOT EXISTS ix_orders_trade_date ON orders (trade_date)",
+    "CREATE INDEX IF NOT EXISTS ix_fills_trade_date ON fills (trade_date)",
+    "CREATE INDEX IF NOT EXISTS ix_fills_ts_code ON fills (ts_code, side, trade_date)",
+)
+
+
+class Ledger:
+    """同一进程内共享一个连接，读写加锁（与 MarketStore 一致）"""
+
+    def __init__(self, path: Path | str = LEDGER_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._conn:
+            for sql in SCHEMA:
+                self._conn.execute(sql)
+            cols = {r[1] for r in self._conn.execute("PRAGMA table_info(positions)")}
+            if "opened" not in cols:                     # 早期账本补建仓日列
+                self._conn.execute("ALTER TABLE positions ADD COLUMN opened TEXT")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ========== 现金 / 初始化 ==========
+    def _meta(self, key: str) -> str | None:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_meta(self, key: str, value) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def cash(self) -> float | None:
+        """账户现金；尚未初始化返回 None"""
+        with self._lock:
+            v = self._meta("cash")
+        return None if v is None else float(v)
+
+    def init(self, cash: float, legacy: Path | None = None) -> None:
+        """
+        新账本：legacy（旧 state_portfolio.json）存在则迁移持仓，现金 = equity − 持仓成本；
+        算出的现金为负（快照过期 / 不一致）时告警并改用 cash 起始
+        """
+        if self.cash is not None:
+            return
+        legacy = Path(legacy) if legacy is not None and Path(legacy).exists() else None
+        pos = {}
+        if legacy is not None:
+            state = json.loads(legacy.read_text())
+            pos = {c: p for c, p in state.get("position", {}).items() if p["qty"] > 0}
+            left = float(state.get("equity", cash)) - sum(p["cost"] * p["qty"] for p in pos.values())
+            if left >= 0:
+                cash = left
+            else:
+                logger.warning("{} 的 equity 小于持仓成本（现金 {:,.2f}），改用初始现金 {:,.2f}",
+                               legacy, left, cash)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO positions (ts_code, qty, cost, last_date) VALUES (?, ?, ?, NULL)",
+                [(c, int(p["qty"]), float(p["cost"])) for c, p in pos.items()])
+            self._set_meta("cash", cash)
+            if legacy is not None:
+                self._set_meta("migrated_from", legacy)
+        if legacy is not None:
+            logger.success("已从 {} 迁移 {} 只持仓 → {}", legacy, len(pos), self.path)
+
+    # ========== 写 ==========
+    def record(self, td: str, orders: list[list], close: pd.Series | None = None) -> int:
+        """
+        追加 td 的委托 [ts_code, B/S, 价格, 数量] 并按委托价（市价单 0 → 当日收盘价）记成交；
+        持仓 / 现金在同一事务里更新，返回成交笔数。无价的委托只记委托不记成交
+        """
+        now = dt.datetime.now().isoformat(timespec="seconds")
+        n = 0
+        with self._lock, self._conn:
+            cash = float(self._meta("cash") or 0.0)
+            for code, side, price, qty in orders:
+                oid = self._conn.execute(
+                    "INSERT INTO orders (trade_date, ts_code, side, price, qty, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (td, code, side, float(price), int(qty), now)).lastrowid
+                px = float(price) or float(close.get(code, 0) if close is not None else 0)
+                if not px > 0:
+                    logger.warning("{} {} 无成交价，只记委托", td, code)
+                    continue
+                row = self._conn.execute(
+                    "SELECT qty, cost, opened FROM positions WHERE ts_code = ?", (code,)).fetchone()
+                q0, c0, opened = row or (0, 0.0, None)
+                if side == "B":
+                    q, realized = int(qty), 0.0
+                    q1, c1 = q0 + q, (q0 * c0 + px * q) / (q0 + q)
+                    cash -= px * q
+                else:
+                    q = min(int(qty), q0)
+                    if q <= 0:
+                        continue
+                    q1, c1, realized = q0 - q, c0, (px - c0) * q
+                    cash += px * q
+                if q1 > 0:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO positions (ts_code, qty, cost, last_date, opened) "
+                        "VALUES (?, ?, ?, ?, ?)", (code, q1, c1, td, opened if q0 > 0 else td))
+                else:
+                    self._conn.execute("DELETE FROM positions WHERE ts_code = ?", (code,))
+                self._conn.execute(
+                    "INSERT INTO fills (order_id, trade_date, ts_code, side, price, qty, amount, realized) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (oid, td, code, side, px, q, px * q, realized))
+                n += 1
+            self._set_meta("cash", cash)
+        return n
+
+    def mark(self, td: str, close: pd.Series) -> dict:
+        """td 收盘盯市：写一行净值 + 一份持仓快照（缺价按成本计），同日重复盯市覆盖"""
+        with self._lock, self._conn:
+            pos = self.positions()
+            px = close.reindex(pos["ts_code"]).to_numpy() if len(pos) else []
+            pos["close"] = pd.Series(px, index=pos.index, dtype=float).fillna(pos["cost"])
+            mv = float((pos["qty"] * pos["close"]).sum())
+            cash = float(self._meta("cash") or 0.0)
+            amount, realized = self._conn.execute(
+                "SELECT COALESCE(SUM(amount), 0), COALESCE(SUM(realized), 0) FROM fills "
+                "WHERE trade_date = ?", (td,)).fetchone()
+            row = dict(trade_date=td, cash=cash, market_value=mv, equity=cash + mv,
+                       turnover=amount / (cash + mv) if cash + mv else 0.0, realized=realized)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO equity (trade_date, cash, market_value, equity, turnover, realized) "
+                "VALUES (:trade_date, :cash, :market_value, :equity, :turnover, :realized)", row)
+            self._conn.execute("DELETE FROM snapshots WHERE trade_date = ?", (td,))
+            self._conn.executemany(
+                "INSERT INTO snapshots (trade_date, ts_code, qty, cost, close) VALUES (?, ?, ?, ?, ?)",
+                [(td, *r) for r in pos[["ts_code", "qty", "cost", "close"]].itertuples(index=False, name=None)])
+        return row
+
+    # ========== 读 ==========
+    def positions(self) -> pd.DataFrame:
+        """
+        当前持仓（物化视图）：ts_code / qty / cost / last_date / opened（建仓日，迁移来的为空）/
+        trimmed（建仓以来是否已有卖出，风控止盈只触发一次）
+        """
+        with self._lock:
+            return pd.read_sql_query(
+                "SELECT p.ts_code, p.qty, p.cost, p.last_date, p.opened, EXISTS (SELECT 1 FROM fills f "
+                "WHERE f.ts_code = p.ts_code AND f.side = 'S' AND f.trade_date >= p.opened) AS trimmed "
+                "FROM positions p ORDER BY p.ts_code", self._conn)
+
+    def history(self, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        """
+        [start, end] 每日净值 / 当日盈亏（较上一盯市日，含区间前一天）/ 换手 / 已实现盈亏 / 回撤，
+        一条查询按 equity 主键取区间
+        """
+        sql = ("SELECT * FROM (SELECT trade_date, cash, market_value, equity, "
+               "equity - LAG(equity) OVER (ORDER BY trade_date) AS pnl, turnover, realized, "
+               "MAX(equity) OVER (ORDER BY trade_date) AS peak FROM equity) "
+               "WHERE trade_date BETWEEN ? AND ? ORDER BY trade_date")
+        with self._lock:
+            df = pd.read_sql_query(sql, self._conn, params=(start or "", end or "99999999"))
+        df["drawdown"] = df["equity"] / df.pop("peak") - 1
+        return df
+
+    def read(self, table: str, start: str | None = None, end: str | None = None) -> pd.DataFrame:
+        """orders / fills / snapshots 按 trade_date 区间取"""
+        assert table in ("orders", "fills", "snapshots"), table
+        with self._lock:
+            return pd.read_sql_query(
+                f"SELECT * FROM {table} WHERE trade_date BETWEEN ? AND ? ORDER BY trade_date",
+                self._conn, params=(start or "", end or "99999999"))
+
+
+@functools.lru_cache(maxsize=1)
+def get_ledger() -> Ledger:
+    """进程内单例"""
+    return Ledger()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="组合账本：当前持仓 + 区间净值 / 盈亏 / 换手")
+    ap.add_argument("--start", default=None, help="起始日 YYYYMMDD")
+    ap.add_argument("--end", default=None, help="截止日 YYYYMMDD")
+    args = ap.parse_args()
+
+    led = get_ledger()
+    pos, hist = led.positions(), led.history(args.start, args.end)
+    with pd.option_context("display.width", 160, "display.max_rows", 60):
+        print(f"现金 {led.cash or 0:,.2f}，持仓 {len(pos)} 只\n{pos}\n\n{hist}")
+    if len(hist):
+        logger.info("区间盈亏 {:,.2f}，累计换手 {:.2f}，最大回撤 {:.2%}",
+                    hist["pnl"].fillna(0).sum(), hist["turnover"].sum(), hist["drawdown"].min())
+
+
+__all__ = ["Ledger", "get_ledger", "LEDGER_PATH"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+全市场横截面批量加载：按 trade_date 一天一次取全部股票，拼成对齐的价格矩阵
+* 本地仓库有的日期一次 SQL 读完，缺的日期才并发回源 TuShare（限速 + 磁盘缓存）
+* API 调用量 O(交易日数)，与选股数量 / 调仓次数无关
+* 返回 PricePanel：close / adj_factor 两个 日期 × 标的 矩阵，按位置索引
+* 长区间按日期块流水线加载（load_blocks）：src.prefetch 的 worker 提前读后面的块，
+  主线程同时把已到的块编码进 MatrixBuilder，读库 / 回源与 pandas 编码互相遮盖
+"""
+from __future__ import annotations
+
+from typing import Callable, Iterable
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from loguru import logger
+
+from src.store import get_store
+from src.fetcher import get_executor
+from src.metrics import stage
+from src.prefetch import prefetch
+
+CHUNK_DAYS = 20            # 流水线每块交易日数（约一个月）
+
+
+class PricePanel:
+    """日期 × 标的 对齐矩阵；col()/row() 把代码 / 日期换成位置"""
+
+    def __init__(self, days: list[str], codes: list[str], close: np.ndarray,
+                 adj: np.ndarray | None = None):
+        self.days = list(days)
+        self.codes = list(codes)
+        self.close = close
+        self.adj = np.ones_like(close) if adj is None else adj
+        self._col = {c: j for j, c in enumerate(self.codes)}
+        self._row = {d: i for i, d in enumerate(self.days)}
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._col
+
+    @property
+    def adj_close(self) -> np.ndarray:
+        """后复权价（close × adj_factor），算收益用它"""
+        return self.close * self.adj
+
+    def col(self, codes: str | Iterable[str]):
+        if isinstance(codes, str):
+            return self._col[codes]
+        return np.array([self._col[c] for c in codes], dtype=np.int64)
+
+    def row(self, day: str) -> int:
+        return self._row[day]
+
+    def to_frame(self, adjusted: bool = True) -> pd.DataFrame:
+        return pd.DataFrame(self.adj_close if adjusted else self.close,
+                            index=self.days, columns=self.codes)
+
+    def save(self, path) -> None:
+        """落盘为 src.panelfile 目录格式"""
+        from src.panelfile import PanelFile
+        PanelFile.from_price_panel(path, self)
+
+    @classmethod
+    def load(cls, path) -> "PricePanel":
+        """np.memmap 打开，close / adj 为只读零拷贝视图"""
+        from src.panelfile import PanelFile
+        return PanelFile.open(path).to_price_panel()
+
+    @classmethod
+    def hstack(cls, panels: list["PricePanel"]) -> "PricePanel":
+        """同一日期轴的多个面板按列拼接（如 ETF + 个股）"""
+        return cls(panels[0].days, sum((p.codes for p in panels), []),
+                   np.hstack([p.close for p in panels]),
+                   np.hstack([p.adj for p in panels]))
+
+
+def load_cross_sections(table: str, api_fn, days: list[str], fields: str,
+                        ts_code: Iterable[str] | None = None, progress: bool = True) -> pd.DataFrame:
+    """days 内每天的全市场截面（长表）；本地缺的日期并发回源（src.fetcher）"""
+    store = get_store()
+    local = store.read(table, start=days[0], end=days[-1], fields=fields)
+    have = set(local["trade_date"].unique())
+    missing = [d for d in days if d not in have]
+    frames = [local]
+    if missing:
+        (logger.info if progress else logger.debug)("{}：本地缺 {} 天，回源 TuShare", table, len(missing))
+        jobs = [(api_fn, dict(trade_date=d, fields=fields)) for d in missing]
+        for _, df in tqdm(get_executor().run(jobs), total=len(jobs), desc=table, leave=False,
+                          disable=not progress):
+            frames.append(df)
+    frames = [f for f in frames if not f.empty]
+    df = (pd.concat(frames, ignore_index=True) if frames
+          else pd.DataFrame(columns=fields.split(",")))
+    if ts_code is not None:
+        df = df[df["ts_code"].isin(set(ts_code))]
+    return df
+
+
+def to_matrix(df: pd.DataFrame, days: list[str], codes: list[str], value: str) -> np.ndarray:
+    """长表 → 日期 × 标的 矩阵（缺失为 NaN），不经过 pivot"""
+    out = np.full((len(days), len(codes)), np.nan)
+    if df.empty:
+        return out
+    r = pd.Index(days).get_indexer(df["trade_date"])
+    c = pd.Index(codes).get_indexer(df["ts_code"])
+    ok = (r >= 0) & (c >= 0)
+    out[r[ok], c[ok]] = df[value].to_numpy(dtype=np.float64)[ok]
+    return out
+
+
+class MatrixBuilder:
+    """
+    长表按块增量编码成 (行号, 代码 id, 值)，代码 id 按首次出现分配；
+    全部块到齐后 matrix(value, codes) 按最终代码顺序一次散列成 日期 × 标的 矩阵
+    """
+
+    def __init__(self, days: list[str]):
+        self.days = pd.Index(days)
+        self._ids: dict[str, int] = {}
+        self._parts: dict[str, list[tuple[np.ndarray, np.ndarray, np.ndarray]]] = {}
+
+    def add(self, df: pd.DataFrame, values: Iterable[str]) -> None:
+        if df is None or df.empty:
+            return
+        r = self.days.get_indexer(df["trade_date"])
+        inv, uniq = pd.factorize(df["ts_code"])
+        lut = np.array([self._ids.setdefault(c, len(self._ids)) for c in uniq], dtype=np.int64)
+        ok = r >= 0
+        r, c = r[ok], lut[inv[ok]]
+        for v in values:
+            self._parts.setdefault(v, []).append((r, c, df[v].to_numpy(np.float64)[ok]))
+
+    def codes(self) -> list[str]:
+        return sorted(self._ids)
+
+    def matrix(self, value: str, codes: list[str]) -> np.ndarray:
+        out = np.full((len(self.days), len(codes)), np.nan)
+        if not self._ids:
+            return out
+        pos = pd.Index(codes).get_indexer(list(self._ids))          # 代码 id → 列号
+        for r, c, v in self._parts.get(value, []):
+            cc = pos[c]
+            ok = cc >= 0
+            out[r[ok], cc[ok]] = v[ok]
+        return out
+
+
+def load_blocks(tables: dict[str, tuple[Callable, str, list[str]]],
+                ts_code: Iterable[str] | None = None, chunk: int = CHUNK_DAYS,
+                depth: int | None = None, workers: int | None = None) -> dict[str, MatrixBuilder]:
+    """
+    tables: 表名 → (api_fn, fields, 该表需要的交易日)；按日期块流水线加载，
+    返回 表名 → MatrixBuilder（日期轴为该表的交易日）。depth / workers 见 src.prefetch。
+    本地仓库已全部覆盖时不必等网络，整段一次读库、不开线程（单次 SQL 比分块快）
+    """
+    need = {t: set(d) for t, (_, _, d) in tables.items()}
+    every = sorted(set().union(*need.values()))
+    if not every:
+        return {t: MatrixBuilder(d) for t, (_, _, d) in tables.items()}
+    store = get_store()
+    local = all(need[t] <= store.dates(t, every[0], every[-1]) for t in tables)
+    if local:
+        chunk, workers = len(every), 0
+    blocks = [every[i:i + chunk] for i in range(0, len(every), chunk)]
+    builders = {t: MatrixBuilder(d) for t, (_, _, d) in tables.items()}
+
+    def fetch(block: list[str]) -> dict[str, pd.DataFrame]:
+        out = {}
+        for t, (fn, fields, _) in tables.items():
+            sub = [d for d in block if d in need[t]]
+            if sub:
+                out[t] = load_cross_sections(t, fn, sub, fields, ts_code=ts_code, progress=local)
+        return out
+
+    if not local:
+        logger.info("{}：本地不全，按 {} 天一块流水线回源", "/".join(tables), chunk)
+    for _, frames in tqdm(prefetch(fetch, blocks, depth, workers, name="load_blocks"),
+                          total=len(blocks), desc="/".join(tables), leave=False, disable=local):
+        with stage("load_blocks_encode"):
+            for t, df in frames.items():
+                builders[t].add(df, [f for f in tables[t][1].split(",")
+                                     if f not in ("ts_code", "trade_date")])
+    return builders
+
+
+def load_stock_panel(days: list[str], codes: list[str] | None = None) -> PricePanel:
+    """全市场股票 close + 复权因子；codes 为空则取区间内出现过的全部代码"""
+    from src.utils import pro
+    b = load_blocks({"daily": (pro.daily, "ts_code,trade_date,close", days),
+                     "adj_factor": (pro.adj_factor, "ts_code,trade_date,adj_factor", days)},
+                    ts_code=codes)
+    codes = codes or b["daily"].codes()
+    close = b["daily"].matrix("close", codes)
+    factor = b["adj_factor"].matrix("adj_factor", codes)
+    # 复权因子缺失（如当天未发布）沿用前值，再缺视为 1
+    factor = pd.DataFrame(factor).ffill().fillna(1.0).to_numpy()
+    return PricePanel(days, codes, close, factor)
+
+
+def load_fund_panel(days: list[str], codes: list[str]) -> PricePanel:
+    """ETF 收盘价（fund_daily 全市场截面里挑出 codes）"""
+    from src.utils import pro
+    px = load_cross_sections("fund_daily", pro.fund_daily, days, "ts_code,trade_date,close",
+                             ts_code=codes)
+    return PricePanel(days, codes, to_matrix(px, days, codes, "close"))
+
+
+__all__ = ["PricePanel", "MatrixBuilder", "load_cross_sections", "load_blocks", "to_matrix",
+           "load_stock_panel", "load_fund_panel"]
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+热路径埋点 + 每次运行的性能报告
+* API：按接口名统计调用次数、耗时直方图、重试、返回行数 / 字节、磁盘缓存 / 本地仓库命中
+* 阶段：stage("名字") 上下文管理器或 @timed("名字") 装饰器，累计墙钟时间与 CPU 时间（可嵌套）
+* dump(run)：写 logs/metrics/<run>_<时间>.json，并向 logs/metrics.jsonl 追加一行，
+  cron 跑多了直接按行画时序图
+"""
+from __future__ import annotations
+
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+from loguru import logger
+
+LOG_DIR = Path(__file__).resolve().parent.parent / "logs"
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)   # 直方图上界，末桶为 +inf
+
+
+class Metrics:
+    """进程内指标，线程安全（FetchExecutor 的工作线程会并发写）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.time()
+            self.apis: dict[str, dict] = {}
+            self.stages: dict[str, dict] = {}
+
+    def _api(self, api: str) -> dict:
+        if api not in self.apis:
+            self.apis[api] = dict(calls=0, errors=0, retries=0, rows=0, bytes=0, seconds=0.0,
+                                  max_ms=0.0, cache_hits=0, cache_misses=0, store_hits=0,
+                                  hist=[0] * (len(BUCKETS_MS) + 1))
+        return self.apis[api]
+
+    # ---------- API ----------
+    def record_call(self, api: str, seconds: float, df: pd.DataFrame | None = None,
+                    retries: int = 0, error: bool = False) -> None:
+        """一次真实的远端调用（含重试的总耗时）"""
+        ms = seconds * 1000
+        rows = 0 if df is None else len(df)
+        nbytes = 0 if df is None or df.empty else int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            s = self._api(api)
+            s["calls"] += 1
+            s["errors"] += int(error)
+            s["retries"] += retries
+            s["rows"] += rows
+            s["bytes"] += nbytes
+            s["seconds"] += seconds
+            s["max_ms"] = max(s["max_ms"], ms)
+            s["hist"][sum(ms > b for b in BUCKETS_MS)] += 1
+
+    def record_cache(self, api: str, hit: bool) -> None:
+        with self._lock:
+            self._api(api)["cache_hits" if hit else "cache_misses"] += 1
+
+    def record_store(self, api: str) -> None:
+        """local_query 直接由本地仓库命中"""
+        with self._lock:
+            self._api(api)["store_hits"] += 1
+
+    # ---------- 阶段 ----------
+    @contextmanager
+    def stage(self, name: str):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            with self._lock:
+                s = self.stages.setdefault(name, dict(count=0, wall=0.0, cpu=0.0))
+                s["count"] += 1
+                s["wall"] += wall
+                s["cpu"] += cpu
+
+    # ---------- 汇总 ----------
+    def summary(self, run: str = "") -> dict:
+        with self._lock:
+            apis = {k: {**v, "seconds": round(v["seconds"], 4), "max_ms": round(v["max_ms"], 1)}
+                    for k, v in self.apis.items()}
+            stages = {k: {"count": v["count"], "wall": round(v["wall"], 4), "cpu": round(v["cpu"], 4)}
+                      for k, v in self.stages.items()}
+        return {
+            "run": run,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "elapsed": round(time.time() - self.started, 3),
+            "buckets_ms": list(BUCKETS_MS),
+            "apis": apis,
+            "stages": stages,
+        }
+
+    def dump(self, run: str, log_dir: Path | str | None = None) -> Path:
+        """写本次运行的 JSON 报告，并追加到 metrics.jsonl；返回报告路径"""
+        rep = self.summary(run)
+        log_dir = Path(log_dir or LOG_DIR)
+        (log_dir / "metrics").mkdir(parents=True, exist_ok=True)
+        path = log_dir / "metrics" / f"{run}_{time.strftime('%Y%m%d-%H%M%S')}.json"
+        path.write_text(json.dumps(rep, indent=2, ensure_ascii=False))
+        with open(log_dir / "metrics.jsonl", "a", encoding="utf-8") as f:
+            f.write(json.dumps(rep, ensure_ascii=False) + "\n")
+        slow = sorted(rep["stages"].items(), key=lambda kv: -kv[1]["wall"])[:5]
+        logger.info("性能报告 → {} | {}", path.name,
+                    ", ".join(f"{k} {v['wall']:.2f}s" for k, v in slow))
+        return path
+
+
+@functools.lru_cache(maxsize=None)
+def get_metrics() -> Metrics:
+    """进程内单例"""
+    return Metrics()
+
+
+def stage(name: str):
+    """with stage("rolling"): …"""
+    return get_metrics().stage(name)
+
+
+def timed(name: str):
+    """@timed("scoring")；调用时才取单例，可用于模块级函数"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_metrics().stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+__all__ = ["Metrics", "get_metrics", "stage", "timed", "BUCKETS_MS", "LOG_DIR"]
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+多日因子面板：一次性算好 日期 × 标的 × 字段 的原始因子（float32）
+* 行情 / 估值按交易日整截面加载（src.loader），20 日动量 / 波动率用 src.rolling 的
+  cumsum 核在宽表上一次算完
+* ROA 取自时点财务表 src.fundamentals：公告日之后的第一个交易日起生效，避免未来函数
+* cross_section(day) 是 O(1) 切片，返回与 build_today_universe 打分前相同的列
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.loader import load_blocks
+from src.trade_calendar import get_calendar
+from src.rolling import WIN, rolling_mom_vol
+
+
+class FactorPanel:
+    """values[d, i, k]：第 d 天、第 i 只股票、第 k 个字段；valid[d, i] 表示当日在截面内"""
+
+    def __init__(self, days: list[str], codes: list[str], fields: list[str],
+                 values: np.ndarray, valid: np.ndarray):
+        self.days = list(days)
+        self.codes = np.asarray(codes)
+        self.fields = list(fields)
+        self.values = values
+        self.valid = valid
+        self._row = {d: i for i, d in enumerate(self.days)}
+        self._fld = {f: k for k, f in enumerate(self.fields)}
+
+    def __contains__(self, day: str) -> bool:
+        return day in self._row
+
+    def row(self, day: str) -> int:
+        return self._row[day]
+
+    def field(self, name: str) -> np.ndarray:
+        """某字段的 日期 × 标的 视图"""
+        return self.values[:, :, self._fld[name]]
+
+    def cross_section(self, day: str) -> pd.DataFrame:
+        """单日截面：ts_code + 全部字段，缺失填 0（与 build_today_universe 一致）"""
+        d = self._row[day]
+        ok = self.valid[d]
+        df = pd.DataFrame(self.values[d][ok], columns=self.fields).astype(np.float64)
+        df.insert(0, "ts_code", self.codes[ok])
+        return df.fillna(0)
+
+    def subset(self, days: list[str]) -> "FactorPanel":
+        """只取部分交易日（行切片）"""
+        r = [self._row[d] for d in days]
+        return FactorPanel(days, self.codes, self.fields, self.values[r], self.valid[r])
+
+    def save(self, path: Path | str) -> None:
+        """落盘为 src.panelfile 目录格式"""
+        from src.panelfile import PanelFile
+        PanelFile.from_factor_panel(path, self)
+
+    @classmethod
+    def load(cls, path: Path | str) -> "FactorPanel":
+        """np.memmap 打开，values 为只读零拷贝视图"""
+        from src.panelfile import PanelFile
+        return PanelFile.open(path).to_factor_panel()
+
+
+# ========== ROA as-of ==========
+def roa_asof(days: list[str], codes: list[str]) -> np.ndarray:
+    """时点财务表（src.fundamentals）按公告日 as-of 到每个交易日（公告次日生效）"""
+    from src.fundamentals import get_fundamentals
+    pit = get_fundamentals(days[-1])
+    if not len(pit):
+        logger.warning("无 fina_indicator 数据，ROA 全部缺失（先运行 fetch_history.py）")
+    return pit.asof(days, codes, ["roa"])["roa"]
+
+
+# ========== 构建 ==========
+def build_panel(days: list[str], win: int = WIN) -> FactorPanel:
+    """days 为升序交易日；自动向前多取 win 天做滚动预热"""
+    from src.utils import pro                           # 延迟导入避免循环引用
+    cal = get_calendar()
+    warm = cal.range(cal.offset(days[0], -win) or days[0], days[-1])
+    k0 = warm.index(days[0])
+
+    b = load_blocks({
+        "daily": (pro.daily, "ts_code,trade_date,close,pct_chg,amount", warm),
+        "daily_basic": (pro.daily_basic, "ts_code,trade_date,pe_ttm,pb,turnover_rate_f,total_mv", days),
+    })
+    daily, basic = b["daily"], b["daily_basic"]
+    codes = sorted(set(daily.codes()) | set(basic.codes()))
+
+    pct = daily.matrix("pct_chg", codes)
+    mom, vol = rolling_mom_vol(pct, win)
+    cols = {
+        "close": daily.matrix("close", codes)[k0:],
+        "pct_chg": pct[k0:],
+        "amount": daily.matrix("amount", codes)[k0:],
+        **{f: basic.matrix(f, codes) for f in ("pe_ttm", "pb", "turnover_rate_f", "total_mv")},
+        "roa": roa_asof(days, codes),
+        f"pct_chg_{win}d": mom[k0:],
+        f"vol_{win}d": vol[k0:],
+    }
+    fields = list(cols)
+    values = np.empty((len(days), len(codes), len(fields)), dtype=np.float32)
+    for k, f in enumerate(fields):
+        values[:, :, k] = cols[f]
+    valid = ~np.isnan(cols["close"]) & ~np.isnan(cols["total_mv"])   # 行情 ∩ 基本指标
+    logger.success(f"因子面板 {days[0]}~{days[-1]} → {len(days)} 天 × {len(codes):,} 只")
+    return FactorPanel(days, codes, fields, values, valid)
+
+
+__all__ = ["FactorPanel", "build_panel", "roa_asof"]
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+紧凑的落盘面板格式（目录），np.memmap 打开：多进程共享页缓存、零拷贝、秒开
+    header.json   版本 / 形状 / 字段 / 元信息（如构建时本地仓库的最后日期）
+    days.npy      int32 YYYYMMDD 日期轴
+    codes.json    证券字典：列号 → ts_code（列号即类别编码）
+    values.npy    float32，字段 × 日期 × 标的（每个字段是一块连续的 日期 × 标的 矩阵）
+    valid.npy     bool 日期 × 标的（可选，因子面板的截面掩码）
+与 PricePanel / FactorPanel / 长表 DataFrame 互转；cached() 按 名称 + 日期区间 复用，
+本地仓库有新数据（stamp 变化）时自动重建
+"""
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.store import DATA_DIR, get_store
+
+VERSION = 1
+PANEL_DIR = DATA_DIR / "panels"
+KEEP = 4                          # 每个名称保留的面板个数（按修改时间淘汰）
+
+
+class PanelFile:
+    """values[k] 是第 k 个字段的 日期 × 标的 只读视图（np.memmap）"""
+
+    def __init__(self, path: Path, header: dict, days: np.ndarray, codes: list[str],
+                 values: np.ndarray, valid: np.ndarray | None = None):
+        self.path = Path(path)
+        self.header = header
+        self.day_int = days
+        self.codes = codes
+        self.values = values
+        self.valid = valid
+        self.fields = list(header["fields"])
+        self._fld = {f: k for k, f in enumerate(self.fields)}
+
+    @property
+    def days(self) -> list[str]:
+        return [str(d) for d in self.day_int]
+
+    @property
+    def meta(self) -> dict:
+        return self.header.get("meta", {})
+
+    def field(self, name: str) -> np.ndarray:
+        return self.values[self._fld[name]]
+
+    # ---------- 读写 ----------
+    @classmethod
+    def write(cls, path: Path | str, days: list[str], codes: list[str],
+              fields: dict[str, np.ndarray], valid: np.ndarray | None = None,
+              meta: dict | None = None) -> "PanelFile":
+        """fields: 字段名 → 日期 × 标的 矩阵；先写临时目录再改名，读者不会看到半个文件"""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        D, N = len(days), len(codes)
+        np.save(tmp / "days.npy", np.asarray(days, dtype=np.int32))
+        (tmp / "codes.json").write_text(json.dumps(list(codes)))
+        out = np.lib.format.open_memmap(tmp / "values.npy", mode="w+", dtype=np.float32,
+                                        shape=(len(fields), D, N))
+        for k, x in enumerate(fields.values()):
+            out[k] = x                                       # 逐字段写，不整体堆叠
+        out.flush()
+        del out
+        if valid is not None:
+            np.save(tmp / "valid.npy", np.asarray(valid, dtype=bool))
+        header = dict(version=VERSION, shape=[len(fields), D, N], fields=list(fields),
+                      dtype="float32", meta=meta or {})
+        (tmp / "header.json").write_text(json.dumps(header, ensure_ascii=False, indent=2))
+        shutil.rmtree(path, ignore_errors=True)
+        tmp.rename(path)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path: Path | str) -> "PanelFile":
+        path = Path(path)
+        header = json.loads((path / "header.json").read_text())
+        if header.get("version") != VERSION:
+            raise ValueError(f"面板格式版本不匹配：{path}（{header.get('version')} ≠ {VERSION}）")
+        valid = np.load(path / "valid.npy", mmap_mode="r") if (path / "valid.npy").exists() else None
+        return cls(path, header, np.load(path / "days.npy"),
+                   json.loads((path / "codes.json").read_text()),
+                   np.load(path / "values.npy", mmap_mode="r"), valid)
+
+    # ---------- DataFrame ----------
+    def wide(self, name: str) -> pd.DataFrame:
+        """某字段的宽表：index = trade_date，columns = ts_code"""
+        return pd.DataFrame(self.field(name), index=self.days, columns=self.codes)
+
+    def to_frame(self, fields: list[str] | None = None) -> pd.DataFrame:
+        """TuShare 形状的长表（ts_code, trade_date, 字段…）；全部字段缺失的格子不输出"""
+        fields = fields or self.fields
+        block = np.stack([self.field(f) for f in fields], axis=-1)          # D × N × K
+        r, c = np.nonzero(~np.isnan(block).all(axis=-1))
+        df = pd.DataFrame(block[r, c].astype(np.float64), columns=fields)
+        df.insert(0, "trade_date", np.asarray(self.days)[r])
+        df.insert(0, "ts_code", np.asarray(self.codes)[c])
+        return df
+
+    @classmethod
+    def from_frame(cls, path: Path | str, df: pd.DataFrame, fields: list[str],
+                   days: list[str] | None = None, codes: list[str] | None = None,
+                   meta: dict | None = None) -> "PanelFile":
+        """长表 → 面板；days / codes 缺省取表内出现过的全部（升序）"""
+        from src.loader import to_matrix
+        days = days or sorted(df["trade_date"].astype(str).unique())
+        codes = codes or sorted(df["ts_code"].unique())
+        return cls.write(path, days, codes, {f: to_matrix(df, days, codes, f) for f in fields},
+                         meta=meta)
+
+    # ---------- PricePanel / FactorPanel ----------
+    @classmethod
+    def from_price_panel(cls, path: Path | str, panel, meta: dict | None = None) -> "PanelFile":
+        return cls.write(path, panel.days, panel.codes,
+                         {"close": panel.close, "adj_factor": panel.adj},
+                         meta={"kind": "price", **(meta or {})})
+
+    def to_price_panel(self):
+        from src.loader import PricePanel
+        adj = self.field("adj_factor") if "adj_factor" in self._fld else None
+        return PricePanel(self.days, self.codes, self.field("close"), adj)
+
+    @classmethod
+    def from_factor_panel(cls, path: Path | str, panel, meta: dict | None = None) -> "PanelFile":
+        return cls.write(path, panel.days, list(panel.codes),
+                         {f: panel.field(f) for f in panel.fields}, valid=panel.valid,
+                         meta={"kind": "factor", **(meta or {})})
+
+    def to_factor_panel(self):
+        from src.panel import FactorPanel
+        valid = self.valid if self.valid is not None else ~np.isnan(self.values).all(axis=0)
+        # 字段 × 日期 × 标的 → 日期 × 标的 × 字段 的转置视图，不复制
+        return FactorPanel(self.days, self.codes, self.fields, self.values.transpose(1, 2, 0), valid)
+
+
+# ========== 按区间复用 ==========
+def store_stamp(tables: tuple[str, ...], start: str | None = None, end: str | None = None) -> dict:
+    """
+    本地仓库各表 [最后日期, 区间内行数]；有新数据或区间内缺口被回补（行数变化）即需重建
+    """
+    store = get_store()
+    return {t: store.stamp(t, start, end) for t in tables}
+
+
+def cached(name: str, days: list[str], build: Callable[[], object], stamp: dict,
+           root: Path | str | None = None) -> PanelFile:
+    """
+    root/<name>_<首日>_<末日>.panel 存在且 stamp 一致则直接 memmap 打开；
+    否则调用 build() 得到 PricePanel / FactorPanel 并落盘
+    """
+    root = Path(root or PANEL_DIR)
+    path = root / f"{name}_{days[0]}_{days[-1]}.panel"
+    if (path / "header.json").exists():
+        try:
+            pf = PanelFile.open(path)
+            if pf.meta.get("stamp") == stamp and pf.days == list(days):
+                logger.debug("面板命中 {}", path.name)
+                return pf
+        except (ValueError, OSError, json.JSONDecodeError) as e:
+            logger.warning("面板文件损坏，重建 {}：{}", path.name, e)
+    obj = build()
+    root.mkdir(parents=True, exist_ok=True)
+    writer = PanelFile.from_factor_panel if hasattr(obj, "fields") else PanelFile.from_price_panel
+    pf = writer(path, obj, meta={"stamp": stamp})
+    for old in sorted(root.glob(f"{name}_*.panel"), key=lambda p: p.stat().st_mtime)[:-KEEP]:
+        shutil.rmtree(old, ignore_errors=True)
+    return pf
+
+
+def _usable(stamp: dict, days: list[str]) -> bool:
+    """本地仓库覆盖到区间末日才落盘；否则数据来自在线回源，不缓存"""
+    return all(last is not None and last >= days[-1] for last, _ in stamp.values())
+
+
+def factor_panel(days: list[str]):
+    """build_panel(days) 的落盘缓存版；戳覆盖 build_panel 向前取的 WIN 天预热"""
+    from src.panel import build_panel
+    from src.rolling import WIN
+    from src.trade_calendar import get_calendar
+    warm = get_calendar().offset(days[0], -WIN) or days[0]
+    stamp = store_stamp(("daily", "daily_basic"), warm, days[-1])
+    if not _usable(stamp, days):
+        return build_panel(days)
+    stamp.update(store_stamp(("fina_indicator",), end=days[-1]))   # 时点财务取区间前的全部公告
+    return cached("factors", days, lambda: build_panel(days), stamp).to_factor_panel()
+
+
+def stock_panel(days: list[str]):
+    """load_stock_panel(days) 的落盘缓存版"""
+    from src.loader import load_stock_panel
+    stamp = store_stamp(("daily", "adj_factor"), days[0], days[-1])
+    if not _usable(stamp, days):
+        return load_stock_panel(days)
+    return cached("stocks", days, lambda: load_stock_panel(days), stamp).to_price_panel()
+
+
+__all__ = ["PanelFile", "cached", "store_stamp", "factor_panel", "stock_panel", "PANEL_DIR"]
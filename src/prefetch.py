@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+有界预取流水线（生产者 / 消费者）
+* prefetch(fn, items)：worker 线程按顺序提前执行 fn(item)，主线程按原顺序消费结果
+* 背压：已提交但未被消费的任务最多 depth 个，消费者慢时生产者停下，内存有界
+* I/O（本地 SQL / TuShare 回源）在 worker 里等，主线程同时做编码 / 打分，
+  墙钟时间趋近 max(I/O, 计算) 而不是两者之和
+* depth / workers 默认取 config.yaml 的 prefetch_depth / prefetch_workers（workers=0 不开线程，
+  在消费者线程里逐个执行）；
+  消费者等待 worker 的时间记为 stage("<name>_wait")，可看出 I/O 是否被完全遮盖
+"""
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, TypeVar
+
+from src.metrics import stage
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_DEPTH = 4
+DEFAULT_WORKERS = 2
+_END = object()
+
+
+def settings() -> tuple[int, int]:
+    """(depth, workers)：config.yaml 的 prefetch_depth / prefetch_workers"""
+    from src.config import load_cfg                    # 延迟导入避免循环引用
+    cfg = load_cfg()
+    return (max(1, int(cfg.get("prefetch_depth", DEFAULT_DEPTH))),
+            max(0, int(cfg.get("prefetch_workers", DEFAULT_WORKERS))))     # 0 = 顺序加载
+
+
+def prefetch(fn: Callable[[T], R], items: Iterable[T], depth: int | None = None,
+             workers: int | None = None, name: str = "prefetch") -> Iterator[tuple[T, R]]:
+    """
+    按 items 顺序产出 (item, fn(item))；同时最多 depth 个任务在跑或已完成待取。
+    worker 抛出的异常在消费到该 item 时原样抛出；提前退出迭代会取消未开始的任务
+    """
+    d0, w0 = settings() if depth is None or workers is None else (depth, workers)
+    depth = max(1, d0 if depth is None else depth)
+    workers = w0 if workers is None else workers
+    if workers <= 0:
+        for item in items:
+            yield item, fn(item)
+        return
+    it = iter(items)
+    pending: deque = deque()
+    with ThreadPoolExecutor(max_workers=min(workers, depth), thread_name_prefix=name) as pool:
+        try:
+            for item in it:                             # 先填满队列
+                pending.append((item, pool.submit(fn, item)))
+                if len(pending) >= depth:
+                    break
+            while pending:
+                item, fut = pending.popleft()
+                with stage(f"{name}_wait"):
+                    res = fut.result()
+                nxt = next(it, _END)                    # 消费一个才补一个（背压）
+                if nxt is not _END:
+                    pending.append((nxt, pool.submit(fn, nxt)))
+                yield item, res
+        finally:
+            for _, fut in pending:
+                fut.cancel()
+
+
+__all__ = ["prefetch", "settings"]
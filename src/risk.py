@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+风控叠加层（config.yaml：stop_loss / take_profit / max_drawdown / trend_ma）
+* 止损：相对建仓价跌幅 ≥ stop_loss → 清仓
+* 止盈：相对建仓价涨幅 ≥ take_profit → 卖一半（每段持仓只触发一次）
+* 回撤：相对建仓以来最高价回撤 ≥ max_drawdown → 清仓（移动止损）
+* 趋势：收盘价 < trend_ma 日均线 → 调仓日不买入 / 持有期清仓
+回测：overlay() 一次算出所有持仓的逐日持有比例 h ∈ {1, 0.5, 0}，
+    建仓相对收益、段内最高价、移动回撤、均线全部用 cumsum / maximum.accumulate 完成，
+    触发后段内保持（分段累计），无逐日 / 逐股循环；src.engine.run_panel 据此盯市
+实盘：position_signals() 对账本当前持仓算同一套规则，gen_orders 据此生成卖单
+均线需要 trend_ma 天历史，面板开头不足的那几天趋势规则不生效
+"""
+from __future__ import annotations
+
+import numpy as np
+
+RISK_KEYS = ("stop_loss", "take_profit", "max_drawdown", "trend_ma")
+
+
+def rules(cfg: dict) -> dict:
+    """从配置 / 参数组取四项规则；缺省、None、0 均视为关闭"""
+    r = {k: float(cfg.get(k) or 0) for k in RISK_KEYS}
+    r["trend_ma"] = int(r["trend_ma"])
+    return r
+
+
+def active(r: dict | None) -> bool:
+    return bool(r) and any(r.get(k) for k in RISK_KEYS)
+
+
+# ========== 持有对展开 / 均线 ==========
+def _expand(start: np.ndarray, L: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """每对 [start, start + L) 连续日展开成一维：(每对首位置, 所属对, 日期行)"""
+    first = np.cumsum(L) - L
+    g = np.repeat(np.arange(L.size), L)
+    return first, g, start[g] + np.arange(g.size) - first[g]
+
+
+def _pair_ma(P: np.ndarray, n: int, j: np.ndarray, start: np.ndarray,
+             stop: np.ndarray) -> np.ndarray:
+    """
+    每对 [start, stop) 各天第 j 列的 n 日均线（一维，顺序同 _expand）；
+    每对向前补 n-1 天后展开，一维 cumsum 做差即窗口和，不碰整张 T × n 面板。
+    不足 n 天或窗口内有未上市（价格 ≤ 0）为 NaN
+    """
+    lo = np.maximum(start - n + 1, 0)
+    fx, gx, tx = _expand(lo, stop - lo)
+    v = P[tx, j[gx]]
+    cs = np.r_[0.0, np.cumsum(v)]
+    cnt = np.r_[0, np.cumsum(v > 0)]
+    _, g, t = _expand(start, stop - start)
+    end = fx[g] + t - lo[g] + 1                         # 窗口 (end - n, end]
+    ok = t + 1 >= n
+    beg = np.where(ok, end - n, end)
+    return np.where(ok & (cnt[end] - cnt[beg] == n), (cs[end] - cs[beg]) / n, np.nan)
+
+
+def moving_average(P: np.ndarray, n: int) -> np.ndarray:
+    """沿 axis=0 的 n 日均线；窗口内有非正价（未上市）或不足 n 天为 NaN"""
+    out = np.full(P.shape, np.nan)
+    if 0 < n <= P.shape[0]:
+        cs = np.cumsum(np.r_[np.zeros((1, P.shape[1])), np.where(P > 0, P, 0.0)], axis=0)
+        cnt = np.cumsum(np.r_[np.zeros((1, P.shape[1])), P > 0], axis=0)
+        out[n - 1:] = np.where(cnt[n:] - cnt[:-n] == n, (cs[n:] - cs[:-n]) / n, np.nan)
+    return out
+
+
+def _signals(ret, dd, px, ma, r: dict) -> tuple[np.ndarray, np.ndarray]:
+    """逐元素规则 → (清仓, 减半)；NaN 比较为 False 即不触发"""
+    exit_ = np.zeros(np.shape(ret), dtype=bool)
+    if r["stop_loss"]:
+        exit_ |= ret <= -r["stop_loss"]
+    if r["max_drawdown"]:
+        exit_ |= dd <= -r["max_drawdown"]
+    if r["trend_ma"] and ma is not None:
+        exit_ |= px < ma
+    halve = ret >= r["take_profit"] if r["take_profit"] else np.zeros_like(exit_)
+    return exit_, halve & ~exit_
+
+
+# ========== 回测 ==========
+def overlay(P: np.ndarray, W: np.ndarray, rb: np.ndarray, r: dict,
+            mask: np.ndarray | None = None) -> tuple[np.ndarray, dict]:
+    """
+    P    T × n 前值填充后的复权价（0 = 未上市）
+    W    调仓日 × n 目标权重；rb 调仓日行号
+    mask n 列中受风控约束的列（缺省全部；ETF 底仓可排除）
+    只展开真正持有的（调仓段, 列）对：每对是段内连续若干天，拼成一维后用
+    分组偏移的 maximum.accumulate / cumsum 一次算完，规模 O(段长 × 持股数) 而非 T × n
+    返回 (W, ev)：W 剔除调仓日已跌破均线的标的（转现金）；
+    ev = dict(t, k, j, g, h, first, last)：每个展开点的日期行 / 调仓段 / 列 / 所属对 /
+    持有比例 ∈ {1, 0.5, 0}，first / last 为每对在一维数组中的首尾位置
+    """
+    held = W > 0
+    if mask is not None:
+        held &= np.asarray(mask, dtype=bool)[None, :]
+    k, j = np.nonzero(held)
+    stop = np.r_[rb[1:], P.shape[0]]
+    n_ma = r["trend_ma"]
+    ma = None
+    if n_ma:
+        ma = _pair_ma(P, n_ma, j, rb[k], stop[k])
+        first, _, _ = _expand(rb[k], stop[k] - rb[k])
+        below = P[rb[k], j] < ma[first]                 # 调仓日已跌破均线 → 不买
+        if below.any():
+            W = W.copy()
+            W[k[below], j[below]] = 0.0
+            ma = ma[np.repeat(~below, stop[k] - rb[k])]
+            k, j = k[~below], j[~below]
+    L = stop[k] - rb[k]                                 # 每对的天数
+    first, g, t = _expand(rb[k], L)
+    jj = j[g]
+    Pf = P[t, jj]
+    X = Pf / P[rb[k], j][g]                             # 相对建仓价
+    K = float(X.max()) + 1.0 if X.size else 1.0
+    dd = X / (np.maximum.accumulate(X + g * K) - g * K) - 1.0   # 对内累计最高价
+    exit_, halve = _signals(X - 1.0, dd, Pf, ma, r)
+    exit_[first] = halve[first] = False                 # 建仓当日不触发
+    hit = np.cumsum(exit_, dtype=np.int32)              # 对内触发后保持
+    exit_ = hit - hit[first][g] > 0
+    hit = np.cumsum(halve, dtype=np.int32)
+    halve = hit - hit[first][g] > 0
+    h = np.where(exit_, 0.0, np.where(halve, 0.5, 1.0))
+    return W, dict(t=t, k=k[g], j=jj, g=g, h=h, first=first, last=first + L - 1)
+
+
+def dense(ev: dict, shape: tuple[int, int]) -> np.ndarray:
+    """overlay 事件 → T × n 持有比例矩阵（调试 / 测试用）"""
+    H = np.ones(shape)
+    H[ev["t"], ev["j"]] = ev["h"]
+    return H
+
+
+# ========== 实盘 ==========
+def position_signals(adj: np.ndarray, close: np.ndarray, cost: np.ndarray,
+                     entry: np.ndarray, trimmed: np.ndarray, r: dict) -> tuple[np.ndarray, np.ndarray]:
+    """
+    adj     窗口 × n 前值填充后的复权价，最后一行为当日
+    close   当日收盘价（未复权，与账本成本同口径）；cost 持仓成本
+    entry   每只建仓日在窗口中的行号（早于窗口记 0）；trimmed 本段已止盈过
+    返回 (清仓, 减半) 布尔数组
+    """
+    rows = np.arange(adj.shape[0])[:, None]
+    peak = np.where(rows >= np.asarray(entry)[None, :], adj, 0.0).max(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = close / cost - 1.0
+        dd = adj[-1] / peak - 1.0
+    ma = moving_average(adj, r["trend_ma"])[-1] if r["trend_ma"] else None
+    exit_, halve = _signals(ret, dd, adj[-1], ma, r)
+    return exit_, halve & ~np.asarray(trimmed, dtype=bool)
+
+
+def trend_ok(adj: np.ndarray, r: dict) -> np.ndarray:
+    """当日收盘不低于 trend_ma 日均线（历史不足视为通过）"""
+    if not r["trend_ma"]:
+        return np.ones(adj.shape[1], dtype=bool)
+    return ~(adj[-1] < moving_average(adj, r["trend_ma"])[-1])
+
+
+__all__ = ["rules", "active", "overlay", "dense", "position_signals", "trend_ok",
+           "moving_average", "RISK_KEYS"]
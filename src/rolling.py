@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+滚动窗口核函数（动量 = 窗口涨跌幅之和，波动率 = 窗口标准差 ddof=0）
+* rolling_sum_std：宽表（日期 × 标的）上一次 cumsum 同时得到 sum / std，O(T·N)
+* RollingState：每只股票保存最近 win 天的环形缓冲 + 累计和 / 平方和，
+  每天只用当日一根 bar 增量更新，O(N)；落盘后第二天 gen_orders 直接续算
+停牌口径：上市后缺行情的日子涨跌幅按 0 计；上市不足 win 天结果为 NaN
+"""
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.store import DATA_DIR
+
+WIN = 20
+STATE_PATH = DATA_DIR / "rolling_state.npz"
+
+
+def fill_suspended(pct: np.ndarray) -> np.ndarray:
+    """上市（首次出现行情）之后的 NaN → 0，之前保持 NaN"""
+    listed = np.maximum.accumulate(~np.isnan(pct), axis=0)
+    return np.where(listed, np.nan_to_num(pct), np.nan)
+
+
+def rolling_sum_std(x: np.ndarray, win: int = WIN) -> tuple[np.ndarray, np.ndarray]:
+    """沿 axis=0 的窗口和 / 标准差；窗口内有 NaN 则为 NaN"""
+    T, N = x.shape
+    s_out = np.full((T, N), np.nan)
+    v_out = np.full((T, N), np.nan)
+    if T < win:
+        return s_out, v_out
+    ok = ~np.isnan(x)
+    v = np.where(ok, x, 0.0)
+    zero = np.zeros((1, N))
+    cs = np.cumsum(np.vstack([zero, v]), axis=0)
+    cq = np.cumsum(np.vstack([zero, v * v]), axis=0)
+    cn = np.cumsum(np.vstack([zero, ok]), axis=0)
+    s = cs[win:] - cs[:-win]
+    q = cq[win:] - cq[:-win]
+    full = (cn[win:] - cn[:-win]) == win
+    mean = s / win
+    s_out[win - 1:] = np.where(full, s, np.nan)
+    v_out[win - 1:] = np.where(full, np.sqrt(np.maximum(q / win - mean * mean, 0.0)), np.nan)
+    return s_out, v_out
+
+
+def rolling_mom_vol(pct: np.ndarray, win: int = WIN) -> tuple[np.ndarray, np.ndarray]:
+    """日期 × 标的 涨跌幅 → (动量, 波动率)，停牌口径见模块说明"""
+    return rolling_sum_std(fill_suspended(pct), win)
+
+
+class RollingState:
+    """逐日增量的滚动和 / 平方和；day 为最近一次更新的交易日"""
+
+    def __init__(self, codes, buf: np.ndarray, pos: int, cnt: np.ndarray, day: str):
+        self.codes = list(codes)
+        self.buf = buf                              # win × N，pos 指向最旧的一行
+        self.pos = int(pos)
+        self.cnt = cnt                              # 上市以来在窗口内的天数（≤ win）
+        self.day = str(day)
+        self.win = buf.shape[0]
+        self.sums = buf.sum(axis=0)
+        self.sq = (buf * buf).sum(axis=0)
+        self._idx = {c: i for i, c in enumerate(self.codes)}
+
+    @classmethod
+    def from_history(cls, pct: np.ndarray, codes, day: str, win: int = WIN) -> "RollingState":
+        """用一段 日期 × 标的 历史涨跌幅初始化（取最后 win 行）"""
+        x = fill_suspended(pct)[-win:]
+        cnt = (~np.isnan(x)).sum(axis=0)
+        buf = np.zeros((win, x.shape[1]))
+        buf[win - len(x):] = np.nan_to_num(x)
+        return cls(codes, buf, 0, cnt, day)
+
+    def _grow(self, new: list[str]) -> None:
+        self.codes += new
+        self._idx.update({c: len(self._idx) + k for k, c in enumerate(new)})
+        pad = len(new)
+        self.buf = np.hstack([self.buf, np.zeros((self.win, pad))])
+        self.sums = np.r_[self.sums, np.zeros(pad)]
+        self.sq = np.r_[self.sq, np.zeros(pad)]
+        self.cnt = np.r_[self.cnt, np.zeros(pad, dtype=self.cnt.dtype)]
+
+    def update(self, day: str, codes, pct) -> None:
+        """追加一天：codes / pct 为当日有行情的股票及其涨跌幅"""
+        new = [c for c in codes if c not in self._idx]
+        if new:
+            self._grow(new)
+        idx = np.fromiter((self._idx[c] for c in codes), dtype=np.int64, count=len(codes))
+        x = np.zeros(len(self.codes))
+        x[idx] = np.nan_to_num(np.asarray(pct, dtype=np.float64))
+        seen = self.cnt > 0
+        seen[idx] = True
+        old = self.buf[self.pos]
+        self.sums += x - old
+        self.sq += x * x - old * old
+        self.buf[self.pos] = x
+        self.pos = (self.pos + 1) % self.win
+        self.cnt = np.minimum(self.cnt + seen, self.win)
+        self.day = str(day)
+
+    def frame(self) -> pd.DataFrame:
+        """ts_code + pct_chg_{win}d + vol_{win}d（与 build_today_universe 列名一致）"""
+        full = self.cnt >= self.win
+        mean = self.sums / self.win
+        vol = np.sqrt(np.maximum(self.sq / self.win - mean * mean, 0.0))
+        return pd.DataFrame({
+            "ts_code": self.codes,
+            f"pct_chg_{self.win}d": np.where(full, self.sums, np.nan),
+            f"vol_{self.win}d": np.where(full, vol, np.nan),
+        })
+
+    def save(self, path: Path | str = STATE_PATH) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, codes=np.asarray(self.codes), buf=self.buf, pos=self.pos,
+                 cnt=self.cnt, day=self.day)
+
+    @classmethod
+    def load(cls, path: Path | str = STATE_PATH) -> "RollingState | None":
+        if not Path(path).exists():
+            return None
+        z = np.load(path)
+        return cls(z["codes"].tolist(), z["buf"], int(z["pos"]), z["cnt"], str(z["day"]))
+
+
+__all__ = ["rolling_sum_std", "rolling_mom_vol", "fill_suspended", "RollingState", "STATE_PATH"]
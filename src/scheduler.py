@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+常驻调度进程（替代 cron_rebalance.sh 每次冷启动两个 Python 进程）
+* 交易日历 / 证券主表 / 时点财务表 / 滚动因子状态 / 查询缓存都留在进程内存里
+* prefetch（默认 18:30，每天）：增量同步本地仓库到当天 → 刷新日历 / 证券主表 →
+  提前算好最近一个开市日的收盘截面（build_today_universe，含打分与 RollingState 落盘，
+  截面同时写入 src.snapshot，重启后 / 其他进程直接映射读取）
+* orders（默认 09:00，仅开市日）：直接用上一交易日的预算截面调用 gen_orders.run，
+  下单时只剩取 ETF 价格 + 定手数 + 写 CSV；截面缺失才现场冷算并告警
+* 时钟可替换：SimClock 的 sleep 只是把时间往前拨，配合 src.synth.FakePro 离线测试
+* 同一数据目录只允许一个实例（文件锁），cron 定时拉起也不会重复
+    python -m src schedule                      # 按 config.yaml 的 schedule 常驻
+    python -m src schedule --orders 09:05 --prefetch 19:00
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+import pandas as pd
+from loguru import logger
+
+from src.metrics import get_metrics, stage
+from src.store import DATA_DIR
+
+DEFAULT_SCHEDULE = {"prefetch": "18:30", "orders": "09:00"}
+BUDGET_S = 1.0                            # 下单时刻计算耗时预算，超出记告警
+LOCK_PATH = DATA_DIR / "scheduler.lock"
+
+
+# ========== 时钟 ==========
+class Clock:
+    """真实时钟"""
+
+    def now(self) -> dt.datetime:
+        return dt.datetime.now()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(max(0.0, seconds))
+
+
+class SimClock(Clock):
+    """模拟时钟：sleep 立即返回并把时间拨快"""
+
+    def __init__(self, start: dt.datetime):
+        self.t = start
+
+    def now(self) -> dt.datetime:
+        return self.t
+
+    def sleep(self, seconds: float) -> None:
+        self.t += dt.timedelta(seconds=max(0.0, seconds))
+
+
+# ========== 任务 ==========
+@dataclass
+class Job:
+    name: str
+    at: dt.time
+    fn: Callable[[dt.date], None]
+    last: dt.date | None = None           # 最近一次执行的日期（每天至多一次）
+
+    def next_time(self, now: dt.datetime) -> dt.datetime:
+        """今天已跑过 → 明天的点；已过点未跑 → 立刻"""
+        t = dt.datetime.combine(now.date(), self.at)
+        if self.last == now.date():
+            t += dt.timedelta(days=1)
+        return max(t, now)
+
+
+def _hm(s: str) -> dt.time:
+    h, m = str(s).split(":")
+    return dt.time(int(h), int(m))
+
+
+@dataclass
+class Scheduler:
+    clock: Clock = field(default_factory=Clock)
+    schedule: dict = field(default_factory=lambda: dict(DEFAULT_SCHEDULE))
+    pro: object = None                    # 缺省用 src.utils.get_pro()
+    executor: object = None               # 缺省用 fetcher.get_executor()（并发 + 限速）
+    universe: dict[str, pd.DataFrame] = field(default_factory=dict)   # 交易日 → 已打分截面
+    history: list[dict] = field(default_factory=list)
+
+    def __post_init__(self):
+        self.jobs = [Job("prefetch", _hm(self.schedule["prefetch"]), self.prefetch),
+                     Job("orders", _hm(self.schedule["orders"]), self.orders)]
+
+    # ---------- 任务 ----------
+    def prefetch(self, day: dt.date) -> None:
+        """同步到 day → 刷新常驻索引 → 预算 day 当天或之前最近开市日的截面（已有则跳过）"""
+        from src.utils import get_pro                        # 延迟导入避免循环引用
+        from src.snapshot import universe
+        from src.store import get_store
+        from src.trade_calendar import get_calendar
+        from src.secmaster import get_secmaster
+
+        ymd = day.strftime("%Y%m%d")
+        with stage("prefetch_sync"):
+            written = get_store().sync(self.pro or get_pro(), end=ymd, executor=self.executor)
+        logger.info("预取同步 {} → {}", ymd, {k: v for k, v in written.items() if v})
+        get_calendar.cache_clear()                           # 日历 / 证券主表每天刷新一次
+        get_secmaster.cache_clear()
+        cal, sm = get_calendar(), get_secmaster()
+        td = cal.offset(ymd, 0)                              # day 当天或之前最近的开市日
+        if td is None or td in self.universe:
+            return
+        with stage("prefetch_universe"):
+            df = universe(td)                                # 命中快照或现场构建都会把 RollingState 推进到 td
+        if not df.empty:
+            self.universe = {td: df}                         # 只留最新一天
+        logger.success("预取完成 {} → 截面 {:,} 只，证券主表 {:,} 只", td, len(df), len(sm))
+
+    def orders(self, day: dt.date) -> None:
+        """开市日：用上一交易日截面下单"""
+        from src.trade_calendar import get_calendar
+        from src import gen_orders
+
+        cal = get_calendar()
+        ymd = day.strftime("%Y%m%d")
+        if not cal.is_open(ymd):
+            logger.info("{} 非交易日，跳过下单", ymd)
+            return
+        td = cal.prev(ymd)
+        df = self.universe.get(td)
+        if df is None:
+            logger.warning("{} 截面未预取，现场冷算", td)
+        t0 = time.perf_counter()
+        with stage("orders"):
+            path = gen_orders.run(td, df)
+        sec = time.perf_counter() - t0
+        (logger.warning if sec > BUDGET_S else logger.success)(
+            "下单 {}（截面 {}）计算 {:.3f}s → {}", ymd, td, sec, path.name)
+
+    # ---------- 主循环 ----------
+    def run_pending(self) -> list[str]:
+        """执行所有已到点的任务，返回执行的任务名"""
+        now = self.clock.now()
+        done = []
+        for job in sorted(self.jobs, key=lambda j: j.at):
+            if now.time() >= job.at and job.last != now.date():
+                job.last = now.date()
+                t0 = time.perf_counter()
+                try:
+                    job.fn(now.date())
+                    ok, err = True, None
+                except Exception as e:                       # noqa: BLE001 常驻进程不因单次失败退出
+                    ok, err = False, repr(e)
+                    logger.exception("任务 {} 失败", job.name)
+                self.history.append(dict(job=job.name, date=now.date().isoformat(), ok=ok,
+                                         error=err, seconds=round(time.perf_counter() - t0, 4)))
+                get_metrics().dump(f"schedule_{job.name}")
+                done.append(job.name)
+        return done
+
+    def next_wakeup(self) -> dt.datetime:
+        now = self.clock.now()
+        return min(j.next_time(now) for j in self.jobs)
+
+    def warm(self) -> None:
+        """
+        启动预热：今天已过点的任务不补跑（避免白天重启时重复下单），
+        按最近一个已收盘交易日做一次 prefetch，常驻索引与截面随即就绪
+        """
+        now = self.clock.now()
+        for job in self.jobs:
+            if now.time() >= job.at:
+                job.last = now.date()
+        pre = next(j for j in self.jobs if j.name == "prefetch")
+        closed = now.date() if now.time() >= pre.at else now.date() - dt.timedelta(days=1)
+        try:
+            self.prefetch(closed)
+        except Exception:                                    # noqa: BLE001
+            logger.exception("启动预热失败，等待下次 prefetch")
+
+    def run(self, until: dt.datetime | None = None) -> None:
+        """常驻：到点执行 → 睡到下一个任务；until 给出时（测试 / 模拟）到时退出"""
+        logger.info("调度启动：{}", {j.name: j.at.strftime("%H:%M") for j in self.jobs})
+        self.warm()
+        while until is None or self.clock.now() < until:
+            self.run_pending()
+            wake = self.next_wakeup()
+            if until is not None:
+                wake = min(wake, until)
+            self.clock.sleep((wake - self.clock.now()).total_seconds())
+
+
+# ========== 单实例 ==========
+def _lock(path=LOCK_PATH):
+    """非阻塞文件锁；已有实例在跑返回 None"""
+    import fcntl
+    path.parent.mkdir(parents=True, exist_ok=True)
+    f = open(path, "w")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    f.write(str(os.getpid()))
+    f.flush()
+    return f
+
+
+def main() -> None:
+    from src.config import load_cfg
+
+    cfg_sched = {**DEFAULT_SCHEDULE, **(load_cfg().get("schedule") or {})}
+    ap = argparse.ArgumentParser(description="常驻调度：夜间预取 + 开市日定时下单")
+    ap.add_argument("--prefetch", default=cfg_sched["prefetch"], help="每日预取时间 HH:MM")
+    ap.add_argument("--orders", default=cfg_sched["orders"], help="开市日下单时间 HH:MM")
+    args = ap.parse_args()
+
+    lock = _lock()
+    if lock is None:
+        logger.info("调度进程已在运行（{}），退出", LOCK_PATH)
+        return
+    Scheduler(schedule={"prefetch": args.prefetch, "orders": args.orders}).run()
+
+
+__all__ = ["Scheduler", "Job", "Clock", "SimClock", "DEFAULT_SCHEDULE"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+证券主表：stock_basic + fund_basic(market=E) 合成一张按 ts_code 索引的表
+    ts_code / symbol（6 位代码）/ exchange（SH / SZ / BJ）/ asset（stock / etf）/
+    lot（每手数量）/ list_status（L / D / P）/ name / industry
+* resolve("510300") → "510300.SH"：字典查找，不再按前缀猜交易所后缀
+* close(td)：当日全部股票 + ETF 收盘价一次取齐（daily / fund_daily 各一次整截面，
+  优先本地仓库），之后按 ts_code 数组下标取价，下单 O(订单数)
+* 进程内单例；接口结果走 safe_query 磁盘缓存。接口无权限时退化为本地仓库出现过的代码
+"""
+from __future__ import annotations
+
+import functools
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.store import get_store
+
+LOT = {"stock": 100, "etf": 10}          # 每手数量（与原 gen_orders 的 LOT_STK / LOT_FUND 一致）
+COLUMNS = ["ts_code", "symbol", "exchange", "asset", "lot", "list_status", "name", "industry"]
+
+
+class SecMaster:
+    """frame 以 ts_code 为索引；_sym: 6 位代码 → ts_code（同代码多市场时股票优先）"""
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.reindex(columns=COLUMNS)
+        df["symbol"] = df["symbol"].fillna(df["ts_code"].str[:6])
+        df["exchange"] = df["ts_code"].str.split(".").str[-1]
+        df["lot"] = df["asset"].map(LOT).astype(np.int64)
+        rank = (df["asset"] != "stock").astype(int) * 2 + (df["list_status"] != "L").astype(int)
+        df = df.iloc[np.argsort(rank.to_numpy(), kind="stable")].drop_duplicates("ts_code")
+        self.frame = df.set_index("ts_code")
+        self._sym = dict(zip(df["symbol"][::-1], df["ts_code"][::-1]))   # 排前的覆盖排后的
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def __contains__(self, code: str) -> bool:
+        return self.resolve(code) is not None
+
+    # ---------- 构造 ----------
+    @classmethod
+    def fetch(cls) -> "SecMaster":
+        from src.utils import pro, safe_query          # 延迟导入避免循环引用
+        fields = "ts_code,symbol,name,industry,list_status"
+        stocks = [safe_query(pro.stock_basic, exchange="", list_status=s, fields=fields)
+                  for s in ("L", "D", "P")]
+        funds = safe_query(pro.fund_basic, market="E", fields="ts_code,name,status")
+        frames = [f.assign(asset="stock") for f in stocks if not f.empty]
+        if not funds.empty:
+            frames.append(funds.rename(columns={"status": "list_status"}).assign(asset="etf"))
+        if not frames:
+            logger.warning("stock_basic / fund_basic 无数据，证券主表改用本地仓库代码")
+            return cls.from_store()
+        return cls(pd.concat(frames, ignore_index=True))
+
+    @classmethod
+    def from_store(cls) -> "SecMaster":
+        store = get_store()
+        frames = [pd.DataFrame({"ts_code": store.codes(t), "asset": a})
+                  for t, a in (("daily", "stock"), ("fund_daily", "etf"))]
+        return cls(pd.concat(frames, ignore_index=True).assign(list_status="L"))
+
+    # ---------- 查找 ----------
+    def resolve(self, code: str) -> str | None:
+        """6 位代码或 ts_code → ts_code；未知返回 None"""
+        if code in self.frame.index:
+            return code
+        return self._sym.get(code.split(".")[0])
+
+    def info(self, code: str) -> pd.Series | None:
+        ts = self.resolve(code)
+        return None if ts is None else self.frame.loc[ts]
+
+    def lot(self, code: str) -> int:
+        ts = self.resolve(code)
+        return int(self.frame.at[ts, "lot"]) if ts is not None else LOT["stock"]
+
+    def is_etf(self, code: str) -> bool:
+        ts = self.resolve(code)
+        return ts is not None and self.frame.at[ts, "asset"] == "etf"
+
+    # ---------- 当日价格 ----------
+    def close(self, td: str, stocks: pd.DataFrame | None = None) -> pd.Series:
+        """
+        ts_code → 当日收盘价；stocks 传入当日截面（含 ts_code / close）时股票不再查询，
+        ETF 用一次 fund_daily(trade_date=td) 全市场截面
+        """
+        from src.utils import pro, local_query          # 延迟导入避免循环引用
+        if stocks is None:
+            stocks = local_query("daily", pro.daily, trade_date=td, fields="ts_code,close")
+        funds = local_query("fund_daily", pro.fund_daily, trade_date=td, fields="ts_code,close")
+        frames = [f[["ts_code", "close"]] for f in (stocks, funds) if not f.empty and "close" in f]
+        if not frames:
+            logger.warning("{} 无行情（daily / fund_daily 均为空）", td)
+            return pd.Series(dtype=np.float64)
+        px = pd.concat(frames, ignore_index=True)
+        px = px[px["close"] > 0].drop_duplicates("ts_code")
+        return pd.Series(px["close"].to_numpy(np.float64), index=px["ts_code"].to_numpy())
+
+    def prices(self, codes: list[str], close: pd.Series) -> np.ndarray:
+        """按 codes（6 位或 ts_code）一次取价，缺失为 NaN"""
+        ts = [self.resolve(c) or c for c in codes]
+        idx = close.index.get_indexer(ts)
+        return np.where(idx >= 0, close.to_numpy()[idx], np.nan)
+
+
+@functools.lru_cache(maxsize=1)
+def get_secmaster() -> SecMaster:
+    """进程内单例"""
+    sm = SecMaster.fetch()
+    logger.debug("证券主表 → {:,} 只（ETF {:,}）", len(sm), int((sm.frame["asset"] == "etf").sum()))
+    return sm
+
+
+__all__ = ["SecMaster", "get_secmaster", "LOT"]
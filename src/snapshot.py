@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+已打分单日截面的内容寻址落盘缓存（build_today_universe 的结果）
+* key = 交易日 + sha1(因子代码源文件 + WEIGHTS + F_DEFS + 中性化开关 + 格式版本)，
+  改权重 / 改因子定义 / 改截面构建代码后 key 自然变化，旧条目不再命中，随淘汰删除
+* 列式目录（与 src.panelfile 同一思路）：
+    header.json   版本 / key / 行数 / 列名与类型 / 元信息
+    <i>.npy       第 i 列；数值列原样，字符串列（ts_code / industry）字典编码为 int32 + 取值表
+    index.npy     行索引
+  重复请求 np.load(mmap_mode="r") 直接映射，毫秒级，gen_orders / scheduler / stream 共用
+* 命中时同样把落盘的 RollingState 推进到 td（快照里有当日 pct_chg），增量状态不落后
+* 只缓存本地仓库已覆盖 td 的截面（在线回源的数据可能还会被同步修正）
+* 淘汰：超过 snapshot_max_age_days 天未访问、或总大小超过 snapshot_max_mb 时按最近访问时间删
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.store import DATA_DIR, get_store
+
+VERSION = 1
+SNAP_DIR = DATA_DIR / "snapshots"
+DEFAULT_MAX_MB = 256
+DEFAULT_MAX_AGE_DAYS = 30
+ROOT = Path(__file__).resolve().parent
+# 截面构建 / 打分涉及的源文件：任何一处改动都会换 key
+SOURCES = ("utils.py", "factor_model.py", "rolling.py", "fundamentals.py", "factors",
+           "secmaster.py", "loader.py", "store.py")
+
+
+# ========== key ==========
+@functools.lru_cache(maxsize=1)
+def code_hash() -> str:
+    """因子代码源文件的 sha1（进程内只算一次）"""
+    h = hashlib.sha1()
+    for name in SOURCES:
+        p = ROOT / name
+        for f in sorted(p.rglob("*.py")) if p.is_dir() else [p]:
+            h.update(f.relative_to(ROOT).as_posix().encode())
+            h.update(f.read_bytes())
+    return h.hexdigest()
+
+
+def snapshot_key(neutral: bool, weights: dict | None = None) -> str:
+    """代码 + 权重 + 因子定义 + 配置的 sha1；weights 缺省读当前的 factor_model.WEIGHTS"""
+    from src import factor_model as fm                   # 延迟导入避免循环引用
+    defs = {k: [col, sgn, getattr(fn, "__name__", fn)] for k, (col, sgn, fn) in fm.F_DEFS.items()}
+    raw = json.dumps(dict(version=VERSION, code=code_hash(), neutral=bool(neutral),
+                          weights=weights if weights is not None else fm.WEIGHTS, defs=defs),
+                     sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+# ========== 读写 ==========
+def write(path: Path | str, df: pd.DataFrame, meta: dict | None = None) -> Path:
+    """DataFrame → 列式目录；先写临时目录再改名，读者不会看到半个快照"""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    cols = []
+    for i, (name, s) in enumerate(df.items()):
+        if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+            np.save(tmp / f"{i}.npy", s.to_numpy())
+            cols.append(dict(name=name, kind="raw"))
+        else:
+            codes, uniq = pd.factorize(s)                # NaN → -1
+            np.save(tmp / f"{i}.npy", codes.astype(np.int32))
+            cols.append(dict(name=name, kind="dict", dtype=str(s.dtype), values=[str(v) for v in uniq]))
+    np.save(tmp / "index.npy", df.index.to_numpy())   # 打分后按 score 降序，保留原行号
+    header = dict(version=VERSION, rows=len(df), columns=cols, meta=meta or {})
+    (tmp / "header.json").write_text(json.dumps(header, ensure_ascii=False))
+    shutil.rmtree(path, ignore_errors=True)
+    tmp.rename(path)
+    return path
+
+
+def read(path: Path | str) -> pd.DataFrame:
+    """列式目录 → DataFrame（数值列 memmap 打开，字符串列按取值表还原）"""
+    path = Path(path)
+    header = json.loads((path / "header.json").read_text())
+    if header.get("version") != VERSION:
+        raise ValueError(f"快照格式版本不匹配：{path}（{header.get('version')} ≠ {VERSION}）")
+    data = {}
+    for i, c in enumerate(header["columns"]):
+        x = np.load(path / f"{i}.npy", mmap_mode="r")
+        if c["kind"] == "dict":
+            uniq = np.asarray(c["values"] + [np.nan], dtype=object)
+            x = pd.Series(uniq[x]).astype(c["dtype"]).to_numpy()   # -1 取到末尾的 NaN
+        data[c["name"]] = x
+    return pd.DataFrame(data, index=np.load(path / "index.npy"),
+                        columns=[c["name"] for c in header["columns"]])
+
+
+# ========== 缓存目录 ==========
+def _size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.iterdir())
+
+
+class SnapshotCache:
+    """root/<td>_<key 前 16 位>.snap；命中时 touch 目录记为最近访问"""
+
+    def __init__(self, root: Path | str = SNAP_DIR, max_bytes: int = DEFAULT_MAX_MB * 2**20,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.max_age = float(max_age_days) * 86400
+
+    def path(self, td: str, key: str) -> Path:
+        return self.root / f"{td}_{key[:16]}.snap"
+
+    def get(self, td: str, key: str) -> pd.DataFrame | None:
+        path = self.path(td, key)
+        if not (path / "header.json").exists():
+            return None
+        try:
+            df = read(path)
+        except (ValueError, OSError, json.JSONDecodeError) as e:
+            logger.warning("截面快照损坏，重建 {}：{}", path.name, e)
+            return None
+        os.utime(path)
+        return df
+
+    def put(self, td: str, key: str, df: pd.DataFrame) -> Path:
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = write(self.path(td, key), df, meta=dict(trade_date=td, key=key))
+        self.evict()
+        return path
+
+    def entries(self) -> list[Path]:
+        """全部快照，最近访问在后"""
+        if not self.root.exists():
+            return []
+        return sorted(self.root.glob("*.snap"), key=lambda p: p.stat().st_mtime)
+
+    def evict(self) -> int:
+        """删除超龄条目；总大小仍超预算时按最近访问时间淘汰，返回删除个数"""
+        now = time.time()
+        items = [(p, _size(p)) for p in self.entries()]
+        total = sum(n for _, n in items)
+        victims = []
+        for p, n in items:
+            if now - p.stat().st_mtime > self.max_age or total > self.max_bytes:
+                victims.append(p)
+                total -= n
+        for p in victims:
+            shutil.rmtree(p, ignore_errors=True)
+        return len(victims)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+@functools.lru_cache(maxsize=1)
+def get_snapshots() -> SnapshotCache:
+    """进程内单例；预算取 config.yaml 的 snapshot_max_mb / snapshot_max_age_days"""
+    from src.config import load_cfg
+    cfg = load_cfg()
+    return SnapshotCache(max_bytes=int(cfg.get("snapshot_max_mb") or DEFAULT_MAX_MB) * 2**20,
+                         max_age_days=cfg.get("snapshot_max_age_days") or DEFAULT_MAX_AGE_DAYS)
+
+
+# ========== build_today_universe 的缓存版 ==========
+def _usable(td: str) -> bool:
+    """本地仓库已有 td 的行情 / 指标、财务公告同步到 td 才落盘"""
+    store = get_store()
+    fina = store.last_date("fina_indicator")
+    return (store.has_date("daily", td) and store.has_date("daily_basic", td)
+            and fina is not None and fina >= td)
+
+
+def _advance_rolling(td: str, df: pd.DataFrame) -> None:
+    """命中快照时补做 build_today_universe 的副作用：RollingState 落后于 td 则续算并落盘"""
+    from src.rolling import RollingState                 # 延迟导入避免循环引用
+    from src.utils import _rolling_factors
+    saved = RollingState.load()
+    if saved is None or saved.day < td:                  # 回看历史日期不动更新的状态
+        _rolling_factors(td, df[["ts_code", "pct_chg"]])
+
+
+def universe(td: str | None = None, neutral: bool | None = None) -> pd.DataFrame:
+    """build_today_universe(td) 的落盘缓存版：同一 td + key 第二次起直接映射读取"""
+    from src.utils import build_today_universe, latest_trade_date   # 延迟导入避免循环引用
+    td = td or latest_trade_date()
+    if neutral is None:
+        from src.config import load_cfg
+        neutral = bool(load_cfg().get("neutralize", False))
+    cache, key = get_snapshots(), snapshot_key(neutral)
+    df = cache.get(td, key)
+    if df is not None:
+        logger.debug("截面快照命中 {} {}", td, key[:16])
+        _advance_rolling(td, df)
+        return df
+    df = build_today_universe(td, neutral=neutral)
+    if not df.empty and _usable(td):
+        cache.put(td, key, df)
+    return df
+
+
+__all__ = ["SnapshotCache", "get_snapshots", "universe", "snapshot_key", "code_hash",
+           "read", "write", "SNAP_DIR"]
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+本地行情仓库（SQLite，带主键 + 日期索引）
+* daily / adj_factor / daily_basic / fund_daily / trade_cal / fina_indicator 六张表
+* sync() 从每张表最后一个已存日期开始增量同步，只遍历交易日；
+  主键冲突时覆盖（INSERT OR REPLACE），重复跑不会产生重复行
+* read() 按单日 / 区间 / 代码取数；本地没有时返回空 df，由调用方回退到 TuShare
+"""
+from __future__ import annotations
+
+import datetime as dt
+import functools
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+from loguru import logger
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA_DIR = Path(os.getenv("MA_DATA_DIR") or ROOT / "data")   # 测试 / 基准可指向临时目录
+DB_PATH = DATA_DIR / "market.sqlite"
+
+FIRST_DATE = "20180101"          # 默认最早同步日
+
+# 表名 → 列定义 / 主键 / 日期列
+TABLES: dict[str, dict] = {
+    "daily": dict(
+        cols=dict(ts_code="TEXT", trade_date="TEXT", open="REAL", high="REAL",
+                  low="REAL", close="REAL", pre_close="REAL", pct_chg="REAL",
+                  vol="REAL", amount="REAL"),
+        key=("ts_code", "trade_date"), date="trade_date",
+    ),
+    "adj_factor": dict(
+        cols=dict(ts_code="TEXT", trade_date="TEXT", adj_factor="REAL"),
+        key=("ts_code", "trade_date"), date="trade_date",
+    ),
+    "daily_basic": dict(
+        cols=dict(ts_code="TEXT", trade_date="TEXT", close="REAL",
+                  turnover_rate_f="REAL", pe_ttm="REAL", pb="REAL",
+                  total_mv="REAL", circ_mv="REAL"),
+        key=("ts_code", "trade_date"), date="trade_date",
+    ),
+    "fund_daily": dict(
+        cols=dict(ts_code="TEXT", trade_date="TEXT", close="REAL",
+                  pct_chg="REAL", amount="REAL"),
+        key=("ts_code", "trade_date"), date="trade_date",
+    ),
+    "trade_cal": dict(
+        cols=dict(exchange="TEXT", cal_date="TEXT", is_open="INTEGER"),
+        key=("exchange", "cal_date"), date="cal_date",
+    ),
+    "fina_indicator": dict(
+        cols=dict(ts_code="TEXT", ann_date="TEXT", end_date="TEXT",
+                  roa="REAL", roe="REAL"),
+        key=("ts_code", "ann_date", "end_date"), date="ann_date",
+    ),
+}
+
+# 按交易日逐日同步的行情表（fina_indicator 按公告日，含非交易日）
+_DAILY_TABLES = ("daily", "adj_factor", "daily_basic", "fund_daily")
+
+
+class MarketStore:
+    """SQLite 行情仓库；同一进程内共享一个连接，读写加锁"""
+
+    def __init__(self, path: Path | str = DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._init_schema()
+
+    # ========== 建表 ==========
+    def _init_schema(self) -> None:
+        with self._lock, self._conn:
+            for name, spec in TABLES.items():
+                cols = ", ".join(f"{c} {t}" for c, t in spec["cols"].items())
+                key = ", ".join(spec["key"])
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} ({cols}, PRIMARY KEY ({key}))"
+                )
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS ix_{name}_{spec['date']} "
+                    f"ON {name} ({spec['date']})"
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # ========== 写 ==========
+    def upsert(self, table: str, df: pd.DataFrame) -> int:
+        """按主键覆盖写入；df 中多余的列忽略，缺少的列写 NULL"""
+        if df is None or df.empty:
+            return 0
+        cols = list(TABLES[table]["cols"])
+        df = df.reindex(columns=cols)
+        df = df.astype(object).where(df.notna(), None)
+        sql = (f"INSERT OR REPLACE INTO {table} ({', '.join(cols)}) "
+               f"VALUES ({', '.join('?' * len(cols))})")
+        with self._lock, self._conn:
+            self._conn.executemany(sql, df.itertuples(index=False, name=None))
+        return len(df)
+
+    # ========== 读 ==========
+    def read(
+        self,
+        table: str,
+        *,
+        date: str | None = None,
+        start: str | None = None,
+        end: str | None = None,
+        ts_code: str | Iterable[str] | None = None,
+        fields: str | Iterable[str] | None = None,
+    ) -> pd.DataFrame:
+        """按日期（单日或区间）和代码过滤；fields 可以是逗号分隔字符串"""
+        spec = TABLES[table]
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        fields = list(fields) if fields else list(spec["cols"])
+        where, args = [], []
+        dcol = spec["date"]
+        if date is not None:
+            where.append(f"{dcol} = ?")
+            args.append(date)
+        if start is not None:
+            where.append(f"{dcol} >= ?")
+            args.append(start)
+        if end is not None:
+            where.append(f"{dcol} <= ?")
+            args.append(end)
+        if ts_code is not None and "ts_code" in spec["cols"]:
+            codes = [ts_code] if isinstance(ts_code, str) else list(ts_code)
+            where.append(f"ts_code IN ({', '.join('?' * len(codes))})")
+            args.extend(codes)
+        sql = f"SELECT {', '.join(fields)} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=args)
+
+    def last_date(self, table: str) -> str | None:
+        dcol = TABLES[table]["date"]
+        with self._lock:
+            row = self._conn.execute(f"SELECT MAX({dcol}) FROM {table}").fetchone()
+        return row[0]
+
+    def stamp(self, table: str, start: str | None = None, end: str | None = None) -> list:
+        """[最后日期, [start, end] 内行数]：区间内补齐了缺口（行数变化）也能察觉"""
+        dcol = TABLES[table]["date"]
+        with self._lock:
+            n = self._conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {dcol} BETWEEN ? AND ?",
+                                   (start or "", end or "99999999")).fetchone()[0]
+        return [self.last_date(table), n]
+
+    def first_date(self, table: str) -> str | None:
+        dcol = TABLES[table]["date"]
+        with self._lock:
+            row = self._conn.execute(f"SELECT MIN({dcol}) FROM {table}").fetchone()
+        return row[0]
+
+    def codes(self, table: str) -> list[str]:
+        """表中出现过的全部 ts_code（升序）"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT ts_code FROM {table} ORDER BY ts_code").fetchall()
+        return [r[0] for r in rows]
+
+    def dates(self, table: str, start: str, end: str) -> set[str]:
+        """[start, end] 内本地已有数据的日期（走日期索引）"""
+        dcol = TABLES[table]["date"]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT {dcol} FROM {table} WHERE {dcol} BETWEEN ? AND ?", (start, end)
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def has_date(self, table: str, date: str) -> bool:
+        dcol = TABLES[table]["date"]
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT 1 FROM {table} WHERE {dcol} = ? LIMIT 1", (date,)
+            ).fetchone()
+        return row is not None
+
+    def covers(self, table: str, start: str, end: str) -> bool:
+        """
+        本地数据是否完整覆盖 [start, end]：区间内每个开市日（fina_indicator / trade_cal 按自然日）
+        都有数据才算；中间有空洞或本地日历缺这段时返回 False，由调用方回源
+        """
+        want = (self.cal_days(start, end) if table in ("fina_indicator", "trade_cal")
+                else self.open_days(start, end))
+        return bool(want) and set(want) <= self.dates(table, start, end)
+
+    def open_days(self, start: str, end: str, exchange: str = "SSE") -> list[str]:
+        """本地交易日历中 [start, end] 的开市日（升序）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT cal_date FROM trade_cal WHERE exchange = ? AND is_open = 1 "
+                "AND cal_date BETWEEN ? AND ? ORDER BY cal_date",
+                (exchange, start, end),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def cal_days(self, start: str, end: str, exchange: str = "SSE") -> list[str]:
+        """本地交易日历中 [start, end] 的全部自然日"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT cal_date FROM trade_cal WHERE exchange = ? "
+                "AND cal_date BETWEEN ? AND ? ORDER BY cal_date",
+                (exchange, start, end),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    # ========== 增量同步 ==========
+    def sync(
+        self,
+        pro,
+        start: str = FIRST_DATE,
+        end: str | None = None,
+        tables: Iterable[str] = tuple(TABLES),
+        executor=None,
+    ) -> dict[str, int]:
+        """
+        从每张表的最后已存日期之后开始拉取，直到 end（默认今天）。
+        executor 默认为 fetcher.get_executor()（并发 + 限速）；返回 {表名: 写入行数}
+        """
+        if executor is None:
+            from src.fetcher import get_executor             # 延迟导入避免循环引用
+            executor = get_executor()
+        end = end or dt.date.today().strftime("%Y%m%d")
+        tables = list(tables)
+        written: dict[str, int] = {}
+
+        # ---- 1. 交易日历：每次整年刷新，保证后续表只遍历开市日 ----
+        year_end = end[:4] + "1231"
+        cal = executor.call(pro.trade_cal, exchange="SSE", start_date=start,
+                            end_date=year_end, fields="exchange,cal_date,is_open")
+        written["trade_cal"] = self.upsert("trade_cal", cal)
+        if self.last_date("trade_cal") is None:
+            logger.error("交易日历为空，无法同步")
+            return written
+
+        # ---- 2. 行情类：逐交易日全市场截面；财务指标按公告日（含周末公告） ----
+        plan = [(t, "trade_date", self.open_days(start, end)) for t in _DAILY_TABLES]
+        plan.append(("fina_indicator", "ann_date", self.cal_days(start, end)))
+        for table, key, days in plan:
+            if table not in tables:
+                continue
+            days = self._pending(table, days)
+            fields = ",".join(TABLES[table]["cols"])
+            api_fn = getattr(pro, table)
+            jobs = [(api_fn, {key: d, "fields": fields}) for d in days]
+            written[table] = self._write_in_order(table, key, days, executor.run(jobs, strict=True))
+            logger.info("同步 {} → {} 天 / {:,} 行", table, len(days), written[table])
+        return written
+
+    def _write_in_order(self, table: str, key: str, days: list[str], results) -> int:
+        """
+        并发结果乱序到达，只按日期顺序写入连续前缀：中途中断也不会留下日期空洞；
+        某天取数失败（None）即停在它之前，last_date 不越过它，下次同步从这天重拉
+        """
+        done: dict[str, pd.DataFrame | None] = {}
+        n, nxt = 0, 0
+        for (_, kw), df in results:
+            done[kw[key]] = df
+            while nxt < len(days) and days[nxt] in done and done[days[nxt]] is not None:
+                n += self.upsert(table, done.pop(days[nxt]))
+                nxt += 1
+        if nxt < len(days):
+            logger.warning("{} {} 取数失败，本次只写到它之前，下次同步重试", table, days[nxt])
+        return n
+
+    def _pending(self, table: str, days: list[str]) -> list[str]:
+        """剔除已同步的日期：只保留 > 最后已存日期 的部分"""
+        last = self.last_date(table)
+        return [d for d in days if last is None or d > last]
+
+
+@functools.lru_cache(maxsize=None)
+def get_store() -> MarketStore:
+    """进程内单例"""
+    return MarketStore()
+
+
+__all__ = ["MarketStore", "get_store", "TABLES", "DB_PATH"]
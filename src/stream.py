@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+盘中流式调仓：消费行情推送，只重算受影响股票的价格相关因子与得分，增量维护 top-k，输出订单差异
+* 基础截面：上一交易日收盘的 build_today_universe(td)；盘中价格 px 相对 close 的比例 r
+    pe_ttm / pb / total_mv 随 r 等比例变化；有 RollingState 时 20 日动量 / 波动率
+    用“窗口去掉最旧一天 + 今日涨跌幅”现算；roa / 换手率不随盘中价格变化
+* 打分口径同 factor_model.score：中位数（基础截面）填缺失 → 截面 Z-Score → 加权
+  Z-Score 的均值 / 标准差用逐因子累计和 / 平方和 O(批大小) 维护；排序只依赖 w / σ，
+  σ 相对锚点漂移超过 tol 或一批覆盖大半截面时重新锚定并整截面重算（N × F 矩阵乘）
+* top-k：两个带版本号的惰性堆（入选的最小堆 / 未入选的最大堆），每个 tick 只推入变化的股票
+* 行情源可插拔：任何产出 (时间, 代码列表, 价格数组) 的可迭代对象；
+  ReplayFeed 回放本地 CSV（time,ts_code,price），PollingFeed 轮询任意取数函数
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.factor_model import F_DEFS, F_LIST, WEIGHTS, weight_matrix
+from src.metrics import get_metrics
+
+LIVE = ("pe_ttm", "pb", "total_mv")      # 与价格等比例变化的字段
+SLIP = 0.01                              # 限价：买 × (1 + SLIP)，卖 × (1 − SLIP)（同 gen_orders）
+
+Batch = tuple[str, list[str], np.ndarray]  # (时间, ts_code 列表, 最新价)
+
+
+# ========== 行情源 ==========
+class ReplayFeed:
+    """回放 CSV：time,ts_code,price；同一 time 的行为一批"""
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+
+    def __iter__(self) -> Iterator[Batch]:
+        df = pd.read_csv(self.path, dtype={"time": str, "ts_code": str})
+        for t, g in df.groupby("time", sort=False):
+            yield str(t), g["ts_code"].tolist(), g["price"].to_numpy(np.float64)
+
+    @staticmethod
+    def write(path: Path | str, batches: Iterable[Batch]) -> Path:
+        rows = [pd.DataFrame({"time": t, "ts_code": codes, "price": px}) for t, codes, px in batches]
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        pd.concat(rows, ignore_index=True).to_csv(path, index=False)
+        return Path(path)
+
+
+class PollingFeed:
+    """每 interval 秒调用 fetch() 取一次快照（DataFrame 含 ts_code / price），只推送有变化的"""
+
+    def __init__(self, fetch: Callable[[], pd.DataFrame], interval: float = 3.0,
+                 until: str = "150000"):
+        self.fetch, self.interval, self.until = fetch, interval, until
+
+    def __iter__(self) -> Iterator[Batch]:
+        last: dict[str, float] = {}
+        while (now := time.strftime("%H%M%S")) <= self.until:
+            df = self.fetch()
+            if not df.empty:
+                chg = df[[last.get(c) != p for c, p in zip(df["ts_code"], df["price"])]]
+                last.update(zip(chg["ts_code"], chg["price"]))
+                if not chg.empty:
+                    yield now, chg["ts_code"].tolist(), chg["price"].to_numpy(np.float64)
+            time.sleep(self.interval)
+
+
+# ========== 增量打分 ==========
+class StreamScorer:
+    """df：带 close 与因子原始列的基础截面；state：截至同一天的 src.rolling.RollingState（可选）"""
+
+    def __init__(self, df: pd.DataFrame, k: int, w: dict | None = None, state=None,
+                 f_list: list[str] | None = None, tol: float = 0.02,
+                 cash: float = 3e5, lot: int = 100):
+        self.f_list = list(f_list or F_LIST)
+        self.codes = df["ts_code"].to_numpy()
+        self._idx = {c: i for i, c in enumerate(self.codes)}
+        self.N, self.k = len(df), min(k, len(df))
+        self.tol, self.cash_each, self.lot = tol, cash / max(k, 1), lot
+        self.W = weight_matrix(WEIGHTS if w is None else w, self.f_list).astype(np.float64)
+        self.base = df["close"].to_numpy(np.float64)
+        self.px = self.base.copy()
+        cols = {F_DEFS[f][0] for f in self.f_list}
+        self.raw = {c: (df[c].to_numpy(np.float64) if c in df else np.full(self.N, np.nan))
+                    for c in cols}
+        self._window(state)
+
+        self.med = np.zeros(len(self.f_list))
+        X = self._transform(np.arange(self.N), fill=False)
+        with np.errstate(all="ignore"):
+            med = np.nanmedian(X, axis=0) if self.N else self.med
+        self.med = np.nan_to_num(med)
+        self.X = np.where(np.isnan(X), self.med, X)
+        self.S1, self.S2 = self.X.sum(axis=0), (self.X * self.X).sum(axis=0)
+
+        self.target: dict[str, int] = {}
+        self.latency: list[float] = []
+        self._anchor()
+        self.book0 = self._diff()                      # 收盘截面的目标持仓（gen_orders 已下），之后只出差异
+
+    # ---------- 因子 ----------
+    def _window(self, state) -> None:
+        """把 RollingState 对齐到本截面：去掉最旧一天后的和 / 平方和，今天补上即为完整窗口"""
+        self.win = None
+        if state is None or f"pct_chg_{state.win}d" not in self.raw:
+            return
+        j = pd.Index(state.codes).get_indexer(self.codes)
+        ok = j >= 0
+        j = np.where(ok, j, 0)
+        oldest = state.buf[state.pos][j]
+        self.win = state.win
+        self.w_sum = np.where(ok, state.sums[j] - oldest, np.nan)
+        self.w_sq = np.where(ok, state.sq[j] - oldest * oldest, np.nan)
+        self.w_full = ok & (state.cnt[j] >= state.win - 1)
+
+    def _col(self, col: str, rows: np.ndarray) -> np.ndarray:
+        if col in LIVE:
+            return self.raw[col][rows] * (self.px[rows] / self.base[rows])
+        if self.win is not None and col in (f"pct_chg_{self.win}d", f"vol_{self.win}d"):
+            p = (self.px[rows] / self.base[rows] - 1) * 100                # 今日涨跌幅（%）
+            s, q = self.w_sum[rows] + p, self.w_sq[rows] + p * p
+            if col.startswith("pct_chg"):
+                live = s
+            else:
+                m = s / self.win
+                live = np.sqrt(np.maximum(q / self.win - m * m, 0.0))
+            return np.where(self.w_full[rows], live, self.raw[col][rows])
+        return self.raw[col][rows]
+
+    def _transform(self, rows: np.ndarray, fill: bool = True) -> np.ndarray:
+        """rows 的 行 × 因子 原始值（已乘方向 / 变换，缺失填基础截面中位数）"""
+        out = np.empty((len(rows), len(self.f_list)))
+        with np.errstate(all="ignore"):
+            for k, f in enumerate(self.f_list):
+                col, sign, fn = F_DEFS[f]
+                x = self._col(col, rows)
+                out[:, k] = sign * (fn(x) if fn is not None else x)
+        return np.where(np.isnan(out), self.med, out) if fill else out
+
+    # ---------- 锚定 / 整截面重算 ----------
+    def _sigma(self) -> np.ndarray:
+        m = self.S1 / self.N
+        return np.sqrt(np.maximum(self.S2 / self.N - m * m, 0.0))
+
+    def _anchor(self) -> None:
+        sd = self._sigma()
+        self.sd0 = sd
+        self.a = np.divide(self.W, sd, out=np.zeros_like(self.W), where=sd >= 1e-9)
+        self.s = self.X @ self.a                       # 与 score() 只差一个全体共同的常数
+        self.ver = np.zeros(self.N, dtype=np.int64)
+        self.member = np.zeros(self.N, dtype=bool)
+        top = np.argpartition(-self.s, self.k - 1)[:self.k] if self.k else np.array([], int)
+        self.member[top] = True
+        self._top = [(self.s[i], i, 0) for i in top]
+        self._rest = [(-self.s[i], i, 0) for i in np.flatnonzero(~self.member)]
+        heapq.heapify(self._top)
+        heapq.heapify(self._rest)
+
+    # ---------- 堆 ----------
+    def _push(self, i: int) -> None:
+        self.ver[i] += 1
+        if self.member[i]:
+            heapq.heappush(self._top, (self.s[i], i, self.ver[i]))
+        else:
+            heapq.heappush(self._rest, (-self.s[i], i, self.ver[i]))
+
+    def _clean(self, heap: list, member: bool) -> None:
+        while heap and (heap[0][2] != self.ver[heap[0][1]] or self.member[heap[0][1]] != member):
+            heapq.heappop(heap)
+
+    def _rebalance(self) -> None:
+        """未入选的最高分 > 入选的最低分 时互换，直到两堆有序"""
+        while True:
+            self._clean(self._top, True)
+            self._clean(self._rest, False)
+            if not self._top or not self._rest or -self._rest[0][0] <= self._top[0][0]:
+                return
+            i, j = self._top[0][1], self._rest[0][1]
+            self.member[i], self.member[j] = False, True
+            self._push(i)
+            self._push(j)
+
+    # ---------- 推送 ----------
+    def update(self, codes: list[str], prices) -> list[list]:
+        """一批行情；返回订单差异 [ts_code, B/S, 限价, 数量]"""
+        t0 = time.perf_counter()
+        rows = np.fromiter((self._idx.get(c, -1) for c in codes), dtype=np.int64, count=len(codes))
+        ok = rows >= 0
+        px = np.asarray(prices, dtype=np.float64)
+        ok &= px > 0
+        rows, px = rows[ok], px[ok]
+        if len(rows):
+            self.px[rows] = px
+            new = self._transform(rows)
+            old = self.X[rows]
+            self.S1 += (new - old).sum(axis=0)
+            self.S2 += (new * new - old * old).sum(axis=0)
+            self.X[rows] = new
+            sd = self._sigma()
+            drift = np.abs(sd / np.where(self.sd0 > 0, self.sd0, 1) - 1).max()
+            if drift > self.tol or len(rows) * 4 > self.N or len(self._rest) > 4 * self.N:
+                self._anchor()
+            else:
+                self.s[rows] = new @ self.a
+                for i in rows.tolist():
+                    self._push(i)
+                self._rebalance()
+        diffs = self._diff()
+        self.latency.append(time.perf_counter() - t0)
+        return diffs
+
+    def top(self) -> list[str]:
+        """当前入选（按得分降序）"""
+        idx = np.flatnonzero(self.member)
+        return self.codes[idx[np.argsort(-self.s[idx], kind="stable")]].tolist()
+
+    def _diff(self) -> list[list]:
+        """目标持仓（等额、整手）与上次的差异；只看入选 + 上次持有的 O(k) 只"""
+        idx = np.flatnonzero(self.member)
+        qty = (self.cash_each // self.px[idx] // self.lot * self.lot).astype(np.int64)
+        new = {c: int(q) for c, q in zip(self.codes[idx], qty) if q > 0}
+        out = []
+        for c in sorted(new.keys() | self.target.keys()):
+            d = new.get(c, 0) - self.target.get(c, 0)
+            if d:
+                p = self.px[self._idx[c]]
+                out.append([c, "B" if d > 0 else "S", round(p * (1 + SLIP if d > 0 else 1 - SLIP), 2), abs(d)])
+        self.target = new
+        return out
+
+    def stats(self) -> dict:
+        lat = np.asarray(self.latency) * 1000
+        if not len(lat):
+            return {"batches": 0}
+        return {"batches": len(lat), "p50_ms": round(float(np.percentile(lat, 50)), 3),
+                "p99_ms": round(float(np.percentile(lat, 99)), 3), "max_ms": round(float(lat.max()), 3)}
+
+
+# ========== 主流程 ==========
+def run(scorer: StreamScorer, feed: Iterable[Batch], out: Path | None = None) -> pd.DataFrame:
+    """消费行情源，返回全部订单差异（time + 订单列）；out 给出时同时写 CSV"""
+    rows = []
+    metrics = get_metrics()
+    for t, codes, px in feed:
+        with metrics.stage("stream_tick"):
+            diffs = scorer.update(codes, px)
+        if diffs:
+            logger.info("{} → {} 笔调整 {}", t, len(diffs), [d[0] for d in diffs])
+        rows += [[t, *d] for d in diffs]
+    df = pd.DataFrame(rows, columns=["time", "ts_code", "side", "price", "qty"])
+    if out is not None:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(out, index=False, encoding="utf-8-sig")
+        logger.success(f"订单差异 → {out}")
+    logger.info("流式打分 {}", scorer.stats())
+    return df
+
+
+def main() -> None:
+    from src.utils import latest_trade_date               # 延迟导入避免循环引用
+    from src.snapshot import universe
+    from src.rolling import RollingState
+    from src.gen_orders import CFG, CSV_DIR
+
+    ap = argparse.ArgumentParser(description="盘中流式调仓：回放 / 推送行情 → 增量打分 → 订单差异")
+    ap.add_argument("--replay", required=True, help="行情回放 CSV（time,ts_code,price）")
+    ap.add_argument("--date", default=None, help="基础截面交易日（上一收盘），默认最近交易日")
+    ap.add_argument("--top", type=int, default=CFG["num_alpha"], help="持仓只数")
+    ap.add_argument("--tol", type=float, default=0.02, help="σ 漂移超过该比例时整截面重算")
+    args = ap.parse_args()
+
+    td = args.date or latest_trade_date()
+    df = universe(td)
+    state = RollingState.load()
+    state = state if state is not None and state.day == td else None
+    scorer = StreamScorer(df, args.top, state=state, tol=args.tol,
+                          cash=CFG["cash"] * CFG["alpha_ratio"])
+    run(scorer, ReplayFeed(args.replay), CSV_DIR / f"stream_{td}.csv")
+    get_metrics().dump("stream")
+
+
+__all__ = ["StreamScorer", "ReplayFeed", "PollingFeed", "run", "LIVE"]
+
+
+if __name__ == "__main__":
+    main()
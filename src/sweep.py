@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+策略参数并行扫描：行情 / 因子只加载一次，几百组参数在进程池里各跑一遍面板回测
+* 主进程：构建因子面板 → 对所有可能的调仓日选出前 max(num_alpha) 只 → 加载复权价
+* 复权价矩阵、选股列号矩阵写成 .npy，子进程 np.load(mmap_mode="r") 只读共享，不复制
+* 每组参数只拼调仓日那几行目标权重交给 src.engine.run_panel，结果汇总成一张表
+可扫描：num_alpha / core_ratio / bond_ratio / alpha_ratio / rebalance / fee / slippage /
+       stop_loss / take_profit / max_drawdown / trend_ma（风控，0 = 关闭）
+python -m src.sweep -p num_alpha=5,8,12 -p rebalance=W,M [--grid sweep.yaml] [--workers N]
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+from loguru import logger
+
+from src.engine import rebalance_mask, run_panel, summary
+from src.risk import RISK_KEYS, rules
+
+SWEEP_KEYS = ("num_alpha", "core_ratio", "bond_ratio", "alpha_ratio", "rebalance", "fee",
+              "slippage") + RISK_KEYS
+
+REPORT_DIR = Path(__file__).resolve().parent.parent / "reports"
+
+_DATA: "SweepData | None" = None     # 子进程里挂载的共享数据
+
+
+class SweepData:
+    """
+    days: 回测交易日；close: 日期 × 标的 复权价（ETF 在前）
+    picks: 选股日 × K 列号矩阵（按得分降序，-1 = 不在价格面板内 / 空位）
+    pick_row: 每个交易日在 picks 中的行号，-1 = 该日不是任何频率的调仓日
+    """
+
+    def __init__(self, days: list[str], close: np.ndarray, picks: np.ndarray,
+                 pick_row: np.ndarray, core: int, bond: int):
+        self.days = list(days)
+        self.close = close
+        self.picks = picks
+        self.pick_row = pick_row
+        self.core, self.bond = int(core), int(bond)
+
+    # ---------- 落盘 / mmap ----------
+    def dump(self, path: Path | str) -> None:
+        path = Path(path)
+        np.save(path / "close.npy", np.ascontiguousarray(self.close, dtype=np.float64))
+        np.save(path / "picks.npy", self.picks)
+        np.save(path / "pick_row.npy", self.pick_row)
+        (path / "meta.json").write_text(json.dumps(
+            {"days": self.days, "core": self.core, "bond": self.bond}))
+
+    @classmethod
+    def open(cls, path: Path | str) -> "SweepData":
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text())
+        return cls(meta["days"], np.load(path / "close.npy", mmap_mode="r"),
+                   np.load(path / "picks.npy"), np.load(path / "pick_row.npy"),
+                   meta["core"], meta["bond"])
+
+    # ---------- 单组参数 ----------
+    def weights(self, rb: np.ndarray, p: dict) -> np.ndarray:
+        """调仓日 × 标的 目标权重，口径同 backtest.target_weights"""
+        W = np.zeros((rb.size, self.close.shape[1]))
+        W[:, self.core] = p["core_ratio"]
+        W[:, self.bond] = p["bond_ratio"]
+        rows = self.pick_row[rb]
+        idx = np.where(rows[:, None] >= 0, self.picks[rows, :int(p["num_alpha"])], -1)
+        n = (idx >= 0).sum(axis=1)
+        r, k = np.nonzero(idx >= 0)
+        W[r, idx[r, k]] = p["alpha_ratio"] / n[r]
+        return W
+
+    def evaluate(self, p: dict) -> dict[str, float]:
+        mask = rebalance_mask(self.days, p["rebalance"])
+        rb = np.flatnonzero(mask)
+        alpha = np.ones(self.close.shape[1], dtype=bool)
+        alpha[[self.core, self.bond]] = False
+        res = run_panel(self.close, self.weights(rb, p), mask,
+                        fee=p["fee"], slippage=p["slippage"], risk=rules(p), risk_cols=alpha)
+        return summary(res)
+
+
+def _attach(path: str) -> None:
+    global _DATA
+    _DATA = SweepData.open(path)
+
+
+def _row(p: dict, m: dict) -> dict:
+    """参数 + 绩效一行；与绩效同名的参数（风控 max_drawdown）列名加 _limit"""
+    return {**{(f"{k}_limit" if k in m else k): v for k, v in p.items()}, **m}
+
+
+def _worker(p: dict) -> dict:
+    return _row(p, _DATA.evaluate(p))
+
+
+# ========== 参数网格 ==========
+def expand(grid: dict[str, list], base: dict) -> list[dict]:
+    """笛卡尔积展开；未扫描的键取 base（config.yaml）；三项仓位和 > 1 的组合跳过"""
+    bad = set(grid) - set(SWEEP_KEYS)
+    if bad:
+        raise ValueError(f"不支持扫描的参数：{sorted(bad)}，可选 {SWEEP_KEYS}")
+    fixed = {k: base.get(k, d) for k, d in (("rebalance", "M"), ("fee", 0.0003),
+                                            ("slippage", 0.001))}
+    fixed.update({k: base[k] for k in ("num_alpha", "core_ratio", "bond_ratio", "alpha_ratio")})
+    fixed.update({k: base.get(k) or 0 for k in RISK_KEYS})
+    keys = list(grid)
+    out = []
+    for vals in itertools.product(*(grid[k] for k in keys)):
+        p = {**fixed, **dict(zip(keys, vals))}
+        if p["core_ratio"] + p["bond_ratio"] + p["alpha_ratio"] > 1 + 1e-9:
+            logger.warning("仓位之和 > 1，跳过 {}", p)
+            continue
+        out.append(p)
+    return out
+
+
+# ========== 主流程 ==========
+def load(cfg: dict, params: list[dict], start: str, end: str) -> SweepData:
+    """所有参数组共用的数据：因子面板、选股、复权价只算一次"""
+    from src.trade_calendar import get_calendar
+    from src.loader import PricePanel, load_fund_panel
+    from src.panelfile import factor_panel, stock_panel
+    from src.backtest import select_alpha
+
+    cal = get_calendar()
+    days = cal.range(start, end)
+    union = np.zeros(len(days), dtype=bool)
+    for f in {p["rebalance"] for p in params}:
+        union |= rebalance_mask(days, f)
+    rebal_days = [d for d, m in zip(days, union) if m]
+    k = max(int(p["num_alpha"]) for p in params)
+
+    logger.info("构建因子面板 …")
+    factors = factor_panel(cal.range(cal.prev(start) or start, end))
+    chosen = select_alpha(factors, rebal_days, k, cfg.get("neutralize", False))
+
+    logger.info("加载价格 …")
+    panel = PricePanel.hstack([load_fund_panel(days, [cfg["core_etf"], cfg["bond_etf"]]),
+                               stock_panel(days)])
+    picks = np.full((len(rebal_days), k), -1, dtype=np.int32)
+    for r, d in enumerate(rebal_days):
+        codes = [c for c in chosen[d] if c in panel]
+        if codes:
+            picks[r, :len(codes)] = panel.col(codes)
+    pick_row = np.full(len(days), -1, dtype=np.int32)
+    pick_row[union] = np.arange(len(rebal_days))
+    return SweepData(days, panel.adj_close, picks, pick_row,
+                     panel.col(cfg["core_etf"]), panel.col(cfg["bond_etf"]))
+
+
+def sweep(data: SweepData, params: list[dict], workers: int | None = None) -> pd.DataFrame:
+    """每组参数一行：参数 + cagr / max_drawdown / sharpe / turnover，按 sharpe 降序"""
+    workers = min(workers or os.cpu_count() or 1, len(params))
+    if workers <= 1:
+        rows = [_row(p, data.evaluate(p)) for p in params]
+    else:
+        with tempfile.TemporaryDirectory(prefix="sweep_") as tmp:
+            data.dump(tmp)
+            with ProcessPoolExecutor(workers, initializer=_attach, initargs=(tmp,)) as pool:
+                rows = list(pool.map(_worker, params, chunksize=max(1, len(params) // (workers * 4))))
+    return pd.DataFrame(rows).sort_values("sharpe", ascending=False, ignore_index=True)
+
+
+def _parse_grid(items: list[str], path: str | None) -> dict[str, list]:
+    grid: dict[str, list] = {}
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            grid.update({k: v if isinstance(v, list) else [v] for k, v in yaml.safe_load(f).items()})
+    for item in items:
+        k, _, v = item.partition("=")
+        grid[k.strip()] = [yaml.safe_load(x) for x in v.split(",")]
+    return grid
+
+
+def main() -> None:
+    from src.config import load_cfg
+    from src.utils import latest_trade_date
+    from src.backtest import START
+
+    ap = argparse.ArgumentParser(description="策略参数并行扫描")
+    ap.add_argument("-p", "--param", action="append", default=[],
+                    help="key=v1,v2,…，可重复；key ∈ " + " / ".join(SWEEP_KEYS))
+    ap.add_argument("--grid", default=None, help="YAML 文件：key: [v1, v2, …]")
+    ap.add_argument("--start", default=START)
+    ap.add_argument("--end", default=None)
+    ap.add_argument("--workers", type=int, default=None)
+    args = ap.parse_args()
+
+    cfg = load_cfg()
+    params = expand(_parse_grid(args.param, args.grid), cfg)
+    logger.info(f"共 {len(params)} 组参数")
+    data = load(cfg, params, args.start, args.end or latest_trade_date())
+    res = sweep(data, params, args.workers)
+
+    REPORT_DIR.mkdir(exist_ok=True)
+    res.to_csv(REPORT_DIR / "sweep.csv", index=False, float_format="%.6f")
+    logger.success("参数扫描完成 → reports/sweep.csv")
+    print(res.head(20).to_string())
+
+
+__all__ = ["SweepData", "expand", "load", "sweep", "SWEEP_KEYS"]
+
+
+if __name__ == "__main__":
+    main()
+
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+合成市场 + 假 TuShare 客户端（离线测试 / 基准用，结果只由参数和 seed 决定）
+* SynthMarket：N 只股票 × 若干年，含 ETF、节假日、停牌、新股上市、退市、除权、
+  亏损股（pe_ttm 缺失）以及缺失 / 迟到的财报
+* FakePro：与 ts.pro_api() 同样的调用方式（pro.daily 是 partial(query, "daily")），
+  支持 daily / adj_factor / daily_basic / fund_daily / trade_cal / fina_indicator / stock_basic / fund_basic，
+  按 trade_date / start_date / end_date / ts_code / ann_date / fields 过滤
+用法：
+    from src.synth import FakePro
+    from src.utils import set_pro
+    set_pro(FakePro(n_stocks=500, years=2))
+"""
+from __future__ import annotations
+
+import datetime as dt
+import functools
+
+import numpy as np
+import pandas as pd
+
+CORE_ETFS = ("510300.SH", "511010.SH")          # 与 config.yaml 的 core_etf / bond_etf 对应
+
+_COLS = {
+    "daily": ["ts_code", "trade_date", "open", "high", "low", "close", "pre_close",
+              "change", "pct_chg", "vol", "amount"],
+    "adj_factor": ["ts_code", "trade_date", "adj_factor"],
+    "daily_basic": ["ts_code", "trade_date", "close", "turnover_rate", "turnover_rate_f",
+                    "pe", "pe_ttm", "pb", "total_share", "float_share", "total_mv", "circ_mv"],
+    "fina_indicator": ["ts_code", "ann_date", "end_date", "roa", "roe"],
+    "trade_cal": ["exchange", "cal_date", "is_open", "pretrade_date"],
+}
+_COLS["fund_daily"] = _COLS["daily"]
+_COLS["fund_basic"] = ["ts_code", "name", "market", "fund_type", "list_date", "status"]
+_COLS["stock_basic"] = ["ts_code", "symbol", "name", "industry", "market", "list_status",
+                        "list_date", "delist_date"]
+
+INDUSTRIES = ("银行", "非银金融", "房地产", "医药生物", "电子", "计算机", "通信", "传媒",
+              "食品饮料", "家用电器", "汽车", "机械设备", "电力设备", "化工", "有色金属",
+              "钢铁", "煤炭", "建筑装饰", "交通运输", "公用事业")
+
+
+def _ymd(d: dt.date) -> str:
+    return d.strftime("%Y%m%d")
+
+
+class SynthMarket:
+    """一次生成收益路径（日期 × 标的 float32），其余字段按日用确定性随机数现算"""
+
+    def __init__(
+        self,
+        n_stocks: int = 5000,
+        years: int = 8,
+        end: str = "20251231",
+        n_etfs: int = 6,
+        seed: int = 0,
+        suspend_rate: float = 0.01,
+        delist_rate: float = 0.03,
+        ipo_rate: float = 0.3,
+        fina_missing: float = 0.05,
+    ):
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+
+        # ---- 日历：工作日 - 节假日（元旦 / 春节一周 / 五一 / 国庆） ----
+        last = dt.date(int(end[:4]), int(end[4:6]), int(end[6:]))
+        first = dt.date(last.year - years, last.month, last.day) + dt.timedelta(days=1)
+        cal = pd.date_range(first, last, freq="D")
+        spring = {y: dt.date(y, 1, 21) + dt.timedelta(days=int(rng.integers(0, 25)))
+                  for y in range(first.year, last.year + 1)}
+        hol = np.array([(d.month, d.day) == (1, 1) or (d.month == 5 and d.day <= 3)
+                        or (d.month == 10 and d.day <= 7)
+                        or 0 <= (d.date() - spring[d.year]).days < 7 for d in cal])
+        self.cal_days = [_ymd(d) for d in cal]
+        self.is_open = (cal.weekday < 5) & ~hol
+        self.days = [d for d, o in zip(self.cal_days, self.is_open) if o]
+        self._day = {d: i for i, d in enumerate(self.days)}
+        D = len(self.days)
+
+        # ---- 标的 ----
+        self.codes = [f"{i // 2 + 1:06d}.SZ" if i % 2 == 0 else f"{600000 + i // 2:06d}.SH"
+                      for i in range(n_stocks)]
+        extra = [f"{512000 + k * 10:06d}.SH" for k in range(max(0, n_etfs - len(CORE_ETFS)))]
+        self.etfs = list(CORE_ETFS[:n_etfs]) + extra
+        N, E = n_stocks, len(self.etfs)
+
+        self.listed = np.where(rng.random(N) < ipo_rate, rng.integers(0, int(D * 0.8) + 1, N), 0)
+        self.delisted = np.where(rng.random(N) < delist_rate,
+                                 rng.integers(np.minimum(self.listed + 60, D - 1), D), D)
+        self.suspended = rng.random((D, N), dtype=np.float32) < suspend_rate
+
+        # ---- 收益：市场 × beta + 个股噪声，涨跌停 ±10% ----
+        mkt = rng.normal(0.0003, 0.012, D).astype(np.float32)
+        beta = rng.uniform(0.6, 1.4, N).astype(np.float32)
+        vol = rng.uniform(0.01, 0.035, N).astype(np.float32)
+        ret = rng.standard_normal((D, N), dtype=np.float32)
+        ret *= vol
+        ret += mkt[:, None] * beta
+        np.clip(ret, -0.1, 0.1, out=ret)
+        ret[self.suspended] = 0.0
+        ret[0] = 0.0
+        self.ret = ret
+        self.close_adj = rng.uniform(3, 80, N).astype(np.float32) * np.cumprod(1 + ret, axis=0)
+
+        # ---- 除权：每年约一次，复权因子阶梯上升，原始价相应下跳 ----
+        div = (rng.random((D, N), dtype=np.float32) < 1 / 250) * rng.uniform(0.005, 0.04, N)
+        self.adj = np.cumprod(1 + div.astype(np.float32), axis=0, dtype=np.float32)
+
+        # ---- 基本面（个股常量）----
+        self.shares = rng.uniform(1e8, 5e9, N)                      # 总股本（股）
+        self.float_pct = rng.uniform(0.3, 1.0, N)
+        self.eps = rng.normal(0.4, 0.6, N)                          # ≤ 0 → 亏损，pe_ttm 缺失
+        self.bps = rng.uniform(1, 15, N)
+        self.turn = rng.lognormal(0.3, 0.8, N)                      # 自由流通换手率基准（%）
+
+        # ---- ETF ----
+        e_ret = mkt[:, None] + rng.normal(0, 0.002, (D, E)).astype(np.float32)
+        if "511010.SH" in self.etfs:                                # 国债 ETF：低波动
+            e_ret[:, self.etfs.index("511010.SH")] = rng.normal(0.0001, 0.0008, D)
+        e_ret[0] = 0.0
+        self.etf_ret = e_ret
+        self.etf_close = rng.uniform(1, 5, E).astype(np.float32) * np.cumprod(1 + e_ret, axis=0)
+
+        self.fina = self._make_fina(rng, first, last, fina_missing)
+
+        # ---- 行业（独立随机流，不改变上面已有字段的取值）----
+        self.industry = np.random.default_rng((seed, 1)).integers(0, len(INDUSTRIES), N)
+
+    # ---------- 财报：每季度公告一次，部分公司缺失 ----------
+    def _make_fina(self, rng, first: dt.date, last: dt.date, missing: float) -> pd.DataFrame:
+        N = len(self.codes)
+        codes = np.asarray(self.codes)
+        base = rng.normal(4, 3, N)
+        never = rng.random(N) < missing                             # 从不披露
+        lo, hi = np.datetime64(first), np.datetime64(last)
+        frames = []
+        # 报告期 → 公告窗口（月, 起始日, 窗口天数）
+        windows = {"0331": (4, 10, 20), "0630": (8, 5, 25), "0930": (10, 10, 20), "1231": (3, 15, 45)}
+        for y in range(first.year - 1, last.year + 1):
+            for md, (m, d0, span) in windows.items():
+                start = np.datetime64(dt.date(y + (md == "1231"), m, d0))
+                ann = start + rng.integers(0, span, N).astype("timedelta64[D]")
+                ok = ~never & (rng.random(N) > missing) & (ann >= lo) & (ann <= hi)   # 个别季度漏报
+                roa = np.round(base + rng.normal(0, 1.5, N), 4)
+                frames.append(pd.DataFrame({
+                    "ts_code": codes[ok],
+                    "ann_date": pd.to_datetime(ann[ok]).strftime("%Y%m%d"),
+                    "end_date": f"{y}{md}", "roa": roa[ok], "roe": np.round(roa[ok] * 2.2, 4),
+                }))
+        return pd.concat(frames, ignore_index=True).sort_values(
+            ["ann_date", "ts_code"], ignore_index=True)
+
+    # ---------- 单日截面 ----------
+    def _alive(self, d: int) -> np.ndarray:
+        return (self.listed <= d) & (d < self.delisted) & ~self.suspended[d]
+
+    def _noise(self, d: int, n: int) -> np.ndarray:
+        return np.random.default_rng((self.seed, d)).standard_normal((4, n))
+
+    def bars(self, d: int, etf: bool = False) -> pd.DataFrame:
+        if etf:
+            close, ret = self.etf_close[d].astype(np.float64), self.etf_ret[d].astype(np.float64)
+            codes, idx = np.asarray(self.etfs), np.arange(len(self.etfs))
+        else:
+            idx = np.flatnonzero(self._alive(d))
+            codes = np.asarray(self.codes)[idx]
+            adj = self.adj[d, idx].astype(np.float64)
+            close = self.close_adj[d, idx].astype(np.float64) / adj
+            ret = self.ret[d, idx].astype(np.float64)
+        z = self._noise(d, len(self.etfs) if etf else len(self.codes))[:, idx]
+        close = np.round(close, 3 if etf else 2)
+        pre = np.round(close / (1 + ret), 3 if etf else 2)
+        opn = np.round(pre * (1 + 0.005 * z[0]), 2)
+        vol = np.round(np.abs(z[1]) * 5e4 + 1e4, 0)                # 手
+        return pd.DataFrame({
+            "ts_code": codes, "trade_date": self.days[d], "open": opn,
+            "high": np.round(np.maximum(opn, close) * (1 + 0.003 * np.abs(z[2])), 2),
+            "low": np.round(np.minimum(opn, close) * (1 - 0.003 * np.abs(z[3])), 2),
+            "close": close, "pre_close": pre, "change": np.round(close - pre, 3),
+            "pct_chg": np.round(ret * 100, 4), "vol": vol,
+            "amount": np.round(close * vol * 0.1, 3),               # 千元
+        })
+
+    def adj_factor(self, d: int) -> pd.DataFrame:
+        idx = np.flatnonzero((self.listed <= d) & (d < self.delisted))
+        return pd.DataFrame({"ts_code": np.asarray(self.codes)[idx], "trade_date": self.days[d],
+                             "adj_factor": np.round(self.adj[d, idx].astype(np.float64), 6)})
+
+    def basic(self, d: int) -> pd.DataFrame:
+        idx = np.flatnonzero(self._alive(d))
+        close = np.round(self.close_adj[d, idx] / self.adj[d, idx], 2).astype(np.float64)
+        z = self._noise(d, len(self.codes))[:, idx]
+        shares, fl = self.shares[idx], self.float_pct[idx]
+        eps = self.eps[idx] * (1 + 0.05 * z[0])
+        tr_f = self.turn[idx] * np.exp(0.4 * z[1])
+        return pd.DataFrame({
+            "ts_code": np.asarray(self.codes)[idx], "trade_date": self.days[d], "close": close,
+            "turnover_rate": np.round(tr_f * fl, 4), "turnover_rate_f": np.round(tr_f, 4),
+            "pe": np.where(eps > 0, np.round(close / np.abs(eps), 4), np.nan),
+            "pe_ttm": np.where(eps > 0, np.round(close / np.abs(eps) * 0.95, 4), np.nan),
+            "pb": np.round(close / self.bps[idx], 4),
+            "total_share": shares / 1e4, "float_share": shares * fl / 1e4,   # 万股
+            "total_mv": np.round(close * shares / 1e4, 2),                   # 万元
+            "circ_mv": np.round(close * shares * fl / 1e4, 2),
+        })
+
+
+class FakePro:
+    """ts.pro_api() 的离线替身；未实现的接口返回空 DataFrame（与 TuShare 无权限时一致）"""
+
+    def __init__(self, market: SynthMarket | None = None, **kwargs):
+        self.market = market or SynthMarket(**kwargs)
+        self.calls: list[tuple[str, dict]] = []
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return functools.partial(self.query, name)
+
+    def query(self, api_name: str, fields: str = "", **kwargs) -> pd.DataFrame:
+        self.calls.append((api_name, kwargs))
+        fn = getattr(self, f"_{api_name}", None)
+        df = fn(**kwargs) if fn is not None else pd.DataFrame()
+        if fields and not df.empty:
+            df = df[[c for c in fields.split(",") if c in df.columns]]
+        return df.reset_index(drop=True)
+
+    # ---------- 过滤 ----------
+    def _day_idx(self, trade_date=None, start_date=None, end_date=None) -> range | list[int]:
+        m = self.market
+        if trade_date is not None:
+            return [m._day[trade_date]] if trade_date in m._day else []
+        lo = np.searchsorted(m.days, start_date or m.days[0], "left")
+        hi = np.searchsorted(m.days, end_date or m.days[-1], "right")
+        return range(lo, hi)
+
+    @staticmethod
+    def _codes(df: pd.DataFrame, ts_code) -> pd.DataFrame:
+        return df[df["ts_code"].isin(ts_code.split(","))] if ts_code else df
+
+    def _panel(self, build, ts_code=None, trade_date=None, start_date=None, end_date=None,
+               **_) -> pd.DataFrame:
+        if trade_date is None and start_date is None and ts_code is None:
+            return pd.DataFrame()                   # 真实接口同样要求至少给日期或代码
+        frames = [self._codes(build(d), ts_code)
+                  for d in reversed(self._day_idx(trade_date, start_date, end_date))]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    # ---------- 接口 ----------
+    def _daily(self, **kw) -> pd.DataFrame:
+        return self._panel(self.market.bars, **kw)
+
+    def _fund_daily(self, **kw) -> pd.DataFrame:
+        return self._panel(functools.partial(self.market.bars, etf=True), **kw)
+
+    def _adj_factor(self, **kw) -> pd.DataFrame:
+        return self._panel(self.market.adj_factor, **kw)
+
+    def _daily_basic(self, **kw) -> pd.DataFrame:
+        return self._panel(self.market.basic, **kw)
+
+    def _trade_cal(self, exchange="SSE", start_date=None, end_date=None, is_open=None,
+                   **_) -> pd.DataFrame:
+        m = self.market
+        days = np.asarray(m.cal_days)
+        opn = m.is_open.astype(int)
+        last_open = np.maximum.accumulate(np.where(m.is_open, np.arange(len(days)), -1))
+        p = np.r_[-1, last_open[:-1]]                 # 严格早于当天的最近开市日
+        pre = np.where(p >= 0, days[np.maximum(p, 0)], None)
+        df = pd.DataFrame({"exchange": exchange or "SSE", "cal_date": days, "is_open": opn,
+                           "pretrade_date": pre})
+        ok = (days >= (start_date or days[0])) & (days <= (end_date or days[-1]))
+        if is_open is not None:
+            ok &= opn == int(is_open)
+        return df[ok].iloc[::-1]                    # 与 TuShare 一致：日期降序
+
+    def _fina_indicator(self, ts_code=None, ann_date=None, start_date=None, end_date=None,
+                        period=None, **_) -> pd.DataFrame:
+        f = self.market.fina
+        if ann_date is not None:
+            f = f[f["ann_date"] == ann_date]
+        if start_date is not None:
+            f = f[f["ann_date"] >= start_date]
+        if end_date is not None:
+            f = f[f["ann_date"] <= end_date]
+        if period is not None:
+            f = f[f["end_date"] == period]
+        return self._codes(f, ts_code)
+
+    def _stock_basic(self, ts_code=None, list_status="L", **_) -> pd.DataFrame:
+        m = self.market
+        days = np.asarray(m.days)
+        gone = m.delisted < len(days)
+        df = pd.DataFrame({
+            "ts_code": m.codes, "symbol": [c[:6] for c in m.codes],
+            "name": [f"合成{c[:6]}" for c in m.codes],
+            "industry": np.asarray(INDUSTRIES)[m.industry], "market": "主板",
+            "list_status": np.where(gone, "D", "L"), "list_date": days[m.listed],
+            "delist_date": np.where(gone, days[np.minimum(m.delisted, len(days) - 1)], None),
+        })
+        if list_status:
+            df = df[df["list_status"] == list_status]
+        return self._codes(df, ts_code)
+
+    def _fund_basic(self, market="E", ts_code=None, status=None, **_) -> pd.DataFrame:
+        m = self.market
+        df = pd.DataFrame({"ts_code": m.etfs, "name": [f"合成ETF{c[:6]}" for c in m.etfs],
+                           "market": "E", "fund_type": "股票型", "list_date": m.days[0],
+                           "status": "L"})
+        if market != "E":
+            return df.iloc[:0]
+        return self._codes(df, ts_code)
+
+
+__all__ = ["SynthMarket", "FakePro", "CORE_ETFS", "INDUSTRIES"]
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+进程内交易日历索引
+* 开市日存成升序 int64 数组（YYYYMMDD），所有查询都是 np.searchsorted，O(log n)
+* 进程内只加载一次（get_calendar 单例）；数据来自本地仓库 trade_cal 表，
+  本地过期（没覆盖到今天）才回源 TuShare 拉一次并写回仓库
+"""
+from __future__ import annotations
+
+import datetime as dt
+import functools
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from src.store import get_store
+
+CAL_START = "20160101"
+
+
+def _int(d) -> int:
+    """'20250102' / 20250102 / Timestamp → 20250102"""
+    if isinstance(d, (dt.date, pd.Timestamp)):
+        return int(d.strftime("%Y%m%d"))
+    return int(d)
+
+
+class TradeCalendar:
+    """升序开市日数组上的二分查询；单日返回 'YYYYMMDD'，区间返回 list[str]"""
+
+    def __init__(self, days):
+        self.days = np.unique(np.asarray(days, dtype=np.int64))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "TradeCalendar":
+        """trade_cal 原始表（cal_date, is_open）→ 日历"""
+        if df.empty:
+            return cls([])
+        return cls(df.loc[df["is_open"].astype(int) == 1, "cal_date"].astype(np.int64))
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def _at(self, i: int) -> str | None:
+        return str(self.days[i]) if 0 <= i < len(self.days) else None
+
+    # ========== 单日查询 ==========
+    def is_open(self, d) -> bool:
+        d = _int(d)
+        i = np.searchsorted(self.days, d)
+        return i < len(self.days) and self.days[i] == d
+
+    def prev(self, d, n: int = 1) -> str | None:
+        """严格早于 d 的第 n 个开市日"""
+        return self._at(int(np.searchsorted(self.days, _int(d), "left")) - n)
+
+    def next(self, d, n: int = 1) -> str | None:
+        """严格晚于 d 的第 n 个开市日"""
+        return self._at(int(np.searchsorted(self.days, _int(d), "right")) + n - 1)
+
+    def offset(self, d, n: int) -> str | None:
+        """以 d 当日（非开市日则取之前最近的开市日）为锚点，偏移 n 个开市日"""
+        return self._at(int(np.searchsorted(self.days, _int(d), "right")) - 1 + n)
+
+    def latest(self, n: int = 0, today=None) -> str | None:
+        """距 today（默认今天）n 个开市日的日期；今天开市则 n=0 即今天"""
+        today = today or dt.date.today()
+        return self.offset(today, -n)
+
+    # ========== 区间查询 ==========
+    def range_int(self, start, end) -> np.ndarray:
+        lo = np.searchsorted(self.days, _int(start), "left")
+        hi = np.searchsorted(self.days, _int(end), "right")
+        return self.days[lo:hi]
+
+    def range(self, start, end) -> list[str]:
+        """[start, end] 内的开市日"""
+        return [str(d) for d in self.range_int(start, end)]
+
+    def month_firsts(self, start, end) -> list[str]:
+        """[start, end] 内每个月的首个开市日（区间第一天视为当月首日）"""
+        days = self.range_int(start, end)
+        if days.size == 0:
+            return []
+        mask = np.r_[True, days[1:] // 100 != days[:-1] // 100]
+        return [str(d) for d in days[mask]]
+
+
+def _load() -> TradeCalendar:
+    store = get_store()
+    today = dt.date.today().strftime("%Y%m%d")
+    last = store.last_date("trade_cal")
+    if last is None or last < today:
+        from src.utils import safe_query, pro          # 延迟导入避免循环引用
+        df = safe_query(pro.trade_cal, exchange="SSE", start_date=CAL_START,
+                        end_date=today[:4] + "1231", fields="exchange,cal_date,is_open")
+        if not df.empty:
+            store.upsert("trade_cal", df)
+        else:
+            logger.warning("交易日历回源失败，使用本地已有日历")
+    cal = TradeCalendar.from_frame(store.read("trade_cal", fields="cal_date,is_open"))
+    logger.debug("交易日历加载 → {} 个开市日", len(cal))
+    return cal
+
+
+@functools.lru_cache(maxsize=None)
+def get_calendar() -> TradeCalendar:
+    """进程内单例；长驻进程跨日时调用 get_calendar.cache_clear() 刷新"""
+    return _load()
+
+
+__all__ = ["TradeCalendar", "get_calendar"]
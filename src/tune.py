@@ -1,30 +1,40 @@
 # -*- coding: utf-8 -*-
-import itertools, json, numpy as np, pandas as pd
-from src.utils import get_today_universe
-from src.factor_model import score, F_LIST
+import itertools, json, numpy as np
+from src.utils import latest_trade_date
+from src.panel import build_panel
+from src.factor_model import ScoreModel, F_LIST
 
 GRID = [0, 0.05, 0.10, 0.15, 0.20, 0.25]
 TOP_N = 50
 
-df_base = get_today_universe()
 
-def sharp(series: pd.Series) -> float:
-    m, s = series.mean(skipna=True), series.std(ddof=0, skipna=True)
+def sharp(top: np.ndarray) -> float:
+    m, s = top.mean(), top.std()
     return -9 if s == 0 or np.isnan(s) else m / s
 
-best_w, best_s = None, -9
 
-for raw in itertools.product(GRID, repeat=len(F_LIST)):
-    if not any(raw):          # 全 0 跳过
-        continue
-    w = dict(zip(F_LIST, raw))
-    total = sum(w.values())
-    w = {k: v/total for k, v in w.items()}   # 归一
+def main() -> None:
+    td = latest_trade_date()
+    df_base = build_panel([td]).cross_section(td)
+    model = ScoreModel.from_frame(df_base)       # 标准化因子只算一次，换权重只做矩阵乘
 
-    top = score(df_base.copy(), w).head(TOP_N)["score"]
-    s   = sharp(top)
-    if s > best_s:
-        best_s, best_w = s, w
+    best_w, best_s = None, -9
 
-print("=== BEST WEIGHT (sum=1) ===")
-print(json.dumps(best_w, indent=2, ensure_ascii=False))
+    for raw in itertools.product(GRID, repeat=len(F_LIST)):
+        if not any(raw):          # 全 0 跳过
+            continue
+        w = dict(zip(F_LIST, raw))
+        total = sum(w.values())
+        w = {k: v/total for k, v in w.items()}   # 归一
+
+        top = model.top(w, TOP_N)[1][0]
+        s   = sharp(top)
+        if s > best_s:
+            best_s, best_w = s, w
+
+    print("=== BEST WEIGHT (sum=1) ===")
+    print(json.dumps(best_w, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,45 @@
 # -*- coding: utf-8 -*-
 """
-超快网格搜索 6 因子权重（46k 组合≈5 秒）
+超快网格搜索 7 因子权重（6^7 ≈ 28 万组合，流式分块 + 多进程，内存与组合数无关）
+python -m src.tune_fast [--workers N] [--max-mem-mb 256] [--top 10]
 """
-import itertools, json, numpy as np
-from src.utils import get_today_universe
-from src.factor_model import F_LIST, z
+from __future__ import annotations
+
+import argparse
+import json
+
+import numpy as np
+
+from src.utils import latest_trade_date
+from src.panel import build_panel
+from src.factor_model import F_LIST, factor_tensor
+from src.grid import grid_search
 
 GRID = [0, 0.05, 0.10, 0.15, 0.20, 0.25]
 TOP_N = 50
 
-# ① 预计算 6 因子矩阵 F
-df = get_today_universe()
-F = np.column_stack([
-    -z(df["pe_ttm"]),
-    -z(df["pb"]),
-     z(df["pct_chg_20d"]),
-     z(df["roa"]),
-    -z(df["turnover_rate_f"]),
-    -z(df["vol_20d"]),
-]).astype(np.float32)        # shape=(5405,6)
-
-# ② 构造权重网格矩阵 W  (归一化)
-W_raw = np.array([w for w in itertools.product(GRID, repeat=6) if any(w)], dtype=np.float32)
-W = W_raw / W_raw.sum(axis=1, keepdims=True)
-
-# ③ 全组合得分矩阵  S = F @ W.T
-S = F @ W.T                # shape=(5405, 46656)
-
-# ④ 取每列 Top-50 的得分并算夏普
-idx_top = np.argpartition(S, -TOP_N, axis=0)[-TOP_N:]   # indices of Top-50
-top_scores = np.take_along_axis(S, idx_top, axis=0)     # shape=(50,46656)
-mean = top_scores.mean(axis=0)
-std  = top_scores.std(axis=0)
-sharp = np.where(std>0, mean/std, -9)
-
-best_idx = sharp.argmax()
-best_w   = dict(zip(F_LIST, W[best_idx].round(4).tolist()))
-
-print("=== BEST WEIGHT (sum=1) ===")
-print(json.dumps(best_w, indent=2, ensure_ascii=False))
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="因子权重网格搜索")
+    ap.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    ap.add_argument("--max-mem-mb", type=float, default=256, help="打分矩阵内存上限")
+    ap.add_argument("--top", type=int, default=10, help="输出前几组权重")
+    args = ap.parse_args()
+
+    # ① 当日标准化因子矩阵 F（标的 × 因子，方向已乘入）
+    td = latest_trade_date()
+    panel = build_panel([td])
+    F = factor_tensor(panel)[0][panel.valid[0]]
+
+    # ② 流式网格搜索：每组权重取 Top-N 得分的 均值/标准差
+    best = grid_search(F, GRID, top_n=TOP_N, keep=args.top,
+                       workers=args.workers, max_mem_mb=args.max_mem_mb)
+
+    print("=== BEST WEIGHT (sum=1) ===")
+    print(json.dumps(dict(zip(F_LIST, best[0][1].round(4).tolist())), indent=2, ensure_ascii=False))
+    for sharp, w in best[1:]:
+        print(f"{sharp:.4f}", dict(zip(F_LIST, w.round(4).tolist())))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,110 +5,156 @@
 # ──────────────────────────────────────────────────────────────
 from __future__ import annotations
 
-import os, functools, datetime as dt
+import os, functools, time, datetime as dt
 from pathlib import Path
 from typing import Callable
 
 import numpy as np
 import pandas as pd
-from tenacity import retry, stop_after_attempt, wait_fixed
+from tenacity import retry, stop_after_attempt, wait_random_exponential
 from loguru import logger
 from dotenv import load_dotenv
-import tushare as ts
 
-# ========== 环境变量 & Tushare 客户端 ==========
+from src.store import get_store
+from src.cache import get_cache, api_name
+from src.metrics import get_metrics, stage, timed
+from src.trade_calendar import get_calendar
+from src.loader import load_cross_sections, to_matrix
+from src.rolling import WIN, RollingState
+from src.fundamentals import get_fundamentals
+
+# ========== 环境变量 & Tushare 客户端（首次使用时才创建） ==========
 ROOT = Path(__file__).resolve().parents[1]
-load_dotenv(ROOT / ".env")                       # 读取 .env
-TS_TOKEN = os.getenv("TUSHARE_TOKEN") or os.getenv("TS_TOKEN")
-if not TS_TOKEN:
-    raise RuntimeError("请在 .env 中设置 TS_TOKEN 或 TUSHARE_TOKEN")
 
-pro = ts.pro_api(TS_TOKEN)                       # Tushare Pro 客户端
+
+_client = None
+
+
+def get_pro():
+    """Tushare Pro 客户端；import 本模块不需要 token / 网络，第一次调 API 时才读 .env"""
+    global _client
+    if _client is None:
+        import tushare as ts
+        load_dotenv(ROOT / ".env")               # 读取 .env
+        token = os.getenv("TUSHARE_TOKEN") or os.getenv("TS_TOKEN")
+        if not token:
+            raise RuntimeError("请在 .env 中设置 TS_TOKEN 或 TUSHARE_TOKEN")
+        _client = ts.pro_api(token)
+    return _client
+
+
+def set_pro(client) -> None:
+    """替换客户端（离线测试 / 基准注入 src.synth.FakePro）"""
+    global _client
+    _client = client
+
+
+class _LazyPro:
+    """pro.daily 等属性访问时才创建客户端，兼容原来的 `from src.utils import pro`"""
+
+    def __getattr__(self, name: str):
+        return getattr(get_pro(), name)
+
+
+pro = _LazyPro()                                 # Tushare Pro 客户端
 
 # ========== 通用重试包装 ==========
 def safe_query(api_fn: Callable, **kwargs) -> pd.DataFrame:
-    """对 Tushare 查询加 3 次重试；出错时返回空 df"""
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(1))
+    """对 Tushare 查询加 3 次重试（指数退避 + 抖动）；出错时返回空 df；结果读穿磁盘缓存（src.cache）"""
+    cache, metrics, api = get_cache(), get_metrics(), api_name(api_fn)
+    hit = cache.lookup(api_fn, kwargs)
+    metrics.record_cache(api, hit is not None)
+    if hit is not None:
+        return hit
+
+    attempts = 0
+
+    @retry(stop=stop_after_attempt(3), wait=wait_random_exponential(multiplier=0.5, max=8))
     def _q():
-        logger.debug("tushare → {} {}", api_fn.__name__ if hasattr(api_fn, '__name__') else api_fn, kwargs)
+        nonlocal attempts
+        attempts += 1
+        logger.debug("tushare → {} {}", api, kwargs)
         return api_fn(**kwargs)
+    t0 = time.perf_counter()
     try:
-        return _q()
+        df = _q()
     except Exception as e:                       # noqa: BLE001
+        metrics.record_call(api, time.perf_counter() - t0, retries=attempts - 1, error=True)
         logger.error("tushare 查询失败：{}", e)
         return pd.DataFrame()
+    metrics.record_call(api, time.perf_counter() - t0, df, retries=attempts - 1)
+    cache.save(api_fn, kwargs, df)
+    return df
 
-# ========== 交易日 & 最新交易日 ==========
-def _trade_cal(start: str, end: str) -> pd.Series:
-    df = safe_query(pro.trade_cal,
-                    exchange="SSE", start_date=start, end_date=end)
-    return pd.to_datetime(df[df.is_open == 1]["cal_date"])
+# ========== 本地仓库优先 ==========
+def local_query(table: str, api_fn: Callable, **kwargs) -> pd.DataFrame:
+    """
+    与 safe_query 参数相同，但先查本地仓库（src.store）：
+    单日查询（trade_date / ann_date）本地有该日即命中；
+    区间查询（start_date / end_date）本地完整覆盖即命中；否则走 TuShare
+    """
+    store = get_store()
+    fields = kwargs.get("fields")
+    codes = kwargs["ts_code"].split(",") if kwargs.get("ts_code") else None
+    day = kwargs.get("trade_date") or kwargs.get("ann_date")
+    if day is not None:
+        if store.has_date(table, day):
+            get_metrics().record_store(table)
+            return store.read(table, date=day, ts_code=codes, fields=fields)
+    elif store.covers(table, kwargs["start_date"], kwargs["end_date"]):
+        get_metrics().record_store(table)
+        return store.read(table, start=kwargs["start_date"], end=kwargs["end_date"],
+                          ts_code=codes, fields=fields)
+    return safe_query(api_fn, **kwargs)
 
+# ========== 交易日 & 最新交易日 ==========
 def latest_trade_date(n: int = 0) -> str:
     """返回距今天 n 个交易日的日期字符串  YYYYMMDD"""
-    today = dt.datetime.today().strftime("%Y%m%d")
-    cal   = _trade_cal("20160101", today).sort_values()
-    return cal.iloc[-(n+1)].strftime("%Y%m%d")
+    return get_calendar().latest(n)
 
-def prev_trade_date(current_date_str: str) -> str:
+def prev_trade_date(current_date_str: str) -> str | None:
     """返回给定日期字符串(YYYYMMDD)的上一个交易日"""
-    # 获取到给定日期的所有历史交易日
-    cal = _trade_cal("20160101", current_date_str)
-    if cal.empty:
-        return None
-    
-    # 将输入日期转为 datetime 对象，以便比较
-    current_dt = pd.to_datetime(current_date_str)
-    
-    # 筛选出严格早于给定日期的交易日并取最后一个
-    prev_cal = cal[cal < current_dt]
-    if not prev_cal.empty:
-        return prev_cal.iloc[-1].strftime("%Y%m%d")
-    
-    return None
-
-# ========== ROA ==========
-def _fetch_roa(ann_date: str) -> pd.DataFrame:
-    df = safe_query(pro.fina_indicator, ann_date=ann_date,
-                    fields="ts_code,roa")
-    if df.empty:                                # 尝试区间拉取
-        df = safe_query(pro.fina_indicator,
-                        start_date=ann_date, end_date=ann_date,
-                        fields="ts_code,roa")
-    if df.empty:
-        logger.warning("ROA 拉取失败，整列填 0")
-        return pd.DataFrame(columns=["ts_code", "roa"])
-    df["roa"].fillna(0, inplace=True)
-    return df
+    return get_calendar().prev(current_date_str)
 
 # ========== 辅助：滚动动量 / 波动率 ==========
-def _rolling(df: pd.DataFrame, win: int, how: str) -> pd.DataFrame:
-    g = (df.set_index("trade_date")
-           .groupby("ts_code")["pct_chg"]
-           .rolling(win))
-    if how == "sum":
-        res = g.sum()
-    elif how == "std":
-        res = g.std(ddof=0)
+@timed("rolling")
+def _rolling_factors(td: str, daily: pd.DataFrame, win: int = WIN) -> pd.DataFrame:
+    """
+    优先用落盘的 RollingState（上一交易日）+ 今日 bar 增量更新，O(股票数)；
+    状态缺失 / 不连续时按最近 win 个交易日整截面重建（src.rolling 核函数）
+    """
+    saved = RollingState.load()
+    state = saved if saved is not None and saved.win == win else None
+    if state is not None and state.day == td:
+        return state.frame()
+    if state is not None and state.day == prev_trade_date(td):
+        state.update(td, daily["ts_code"].tolist(), daily["pct_chg"].to_numpy())
     else:
-        raise ValueError("how 必须是 'sum' 或 'std'")
-    res = res.reset_index()
-    last_day = df.trade_date.max()
-    res = res[res.trade_date == last_day][["ts_code", "pct_chg"]]
-    return res.rename(columns={"pct_chg": f"pct_chg_{win}d" if how=="sum" else f"vol_{win}d"})
+        cal = get_calendar()
+        days = cal.range(cal.offset(td, -(win - 1)), td)
+        hist = load_cross_sections("daily", pro.daily, days, "ts_code,trade_date,pct_chg")
+        if hist.empty:
+            return pd.DataFrame(columns=["ts_code", f"pct_chg_{win}d", f"vol_{win}d"])
+        codes = sorted(hist["ts_code"].unique())
+        state = RollingState.from_history(to_matrix(hist, days, codes, "pct_chg"), codes, td, win)
+    if saved is None or td >= saved.day:                 # 回看历史日期时不覆盖更新的状态
+        state.save()
+    return state.frame()
 
 # ========== 今天的市场截面 ==========
-def build_today_universe(td: str | None = None) -> pd.DataFrame:
+@timed("universe")
+def build_today_universe(td: str | None = None, neutral: bool | None = None) -> pd.DataFrame:
     """
     组装单日截面并自动打分：
-    返回字段 >>>  原始行情字段 + 各类因子列 + [score]
+    返回字段 >>>  原始行情字段 + 各类因子列 + industry + [score]
+    neutral 缺省取 config.yaml 的 neutralize（行业 + 市值中性化）
     """
     td = td or latest_trade_date()
     # ---- 1. 基础行情 ----
-    daily   = safe_query(pro.daily,        trade_date=td,
-                         fields="ts_code,close,pct_chg,amount")
-    basic   = safe_query(pro.daily_basic, trade_date=td,
-                         fields="ts_code,pe_ttm,pb,turnover_rate_f,total_mv")
+    daily   = local_query("daily", pro.daily, trade_date=td,
+                          fields="ts_code,close,pct_chg,amount")
+    basic   = local_query("daily_basic", pro.daily_basic, trade_date=td,
+                          fields="ts_code,pe_ttm,pb,turnover_rate_f,total_mv")
 
     # ========= ★ 修改点：新增检查逻辑 ★ =========
     if daily.empty or 'ts_code' not in daily.columns:
@@ -118,31 +164,33 @@ def build_today_universe(td: str | None = None) -> pd.DataFrame:
         logger.warning(f"无法获取 {td} 的日线基本指标数据，跳过当期截面构建")
         return pd.DataFrame()
 
-    # ---- 2. ROA ----
-    quarter = td[:4] + f"{(int(td[4:6])-1)//3*3+1:02}01"     # 取上季度公告日
-    roa = _fetch_roa(quarter)
+    # ---- 2. ROA（时点财务表：td 之前已公告的最新值）----
+    with stage("roa"):
+        roa = get_fundamentals(td).frame(td, ["roa"])
 
     # ---- 3. 动量 & 波动率（20 日）----
-    start = (dt.datetime.strptime(td, "%Y%m%d") - dt.timedelta(days=40)).strftime("%Y%m%d")
-    hist  = safe_query(pro.daily, start_date=start, end_date=td,
-                       fields="ts_code,trade_date,pct_chg")
-    mom = _rolling(hist, 20, "sum") if not hist.empty else pd.DataFrame()
-    vol = _rolling(hist, 20, "std") if not hist.empty else pd.DataFrame()
+    mv = _rolling_factors(td, daily)
 
     # ---- 4. 合并 ----
     df = (daily.merge(basic, on="ts_code")
                .merge(roa,  on="ts_code", how="left")
-               .merge(mom,  on="ts_code", how="left")
-               .merge(vol,  on="ts_code", how="left")
+               .merge(mv,   on="ts_code", how="left")
                .fillna(0))
+    from src.factors.industry import industry_map        # 延迟导入避免循环引用
+    df["industry"] = df["ts_code"].map(industry_map())   # 无标签为 NaN，中性化时单独成组
 
     # ---- 5. 因子打分（关键新增）----
-    from src.factor_model import score as factor_score    # 延迟导入避免循环引用
-    df = factor_score(df)                                # ← 生成 df['score']
+    from src.factor_model import score as factor_score
+    if neutral is None:
+        from src.config import load_cfg
+        neutral = bool(load_cfg().get("neutralize", False))
+    with stage("scoring"):
+        df = factor_score(df, neutral=neutral)           # ← 生成 df['score']
 
     logger.success(f"行情截面 {td} → {len(df):,} 条")
     return df
 
 # -----------------------------------------------------------------------------
 # ★ 修改点：导出 prev_trade_date
-__all__ = ["build_today_universe", "latest_trade_date", "prev_trade_date", "safe_query", "pro"]
\ No newline at end of file
+__all__ = ["build_today_universe", "latest_trade_date", "prev_trade_date", "safe_query",
+           "local_query", "pro", "get_pro", "set_pro"]
\ No newline at end of file
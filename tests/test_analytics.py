@@ -0,0 +1,35 @@
+import numpy as np
+
+from src.analytics import corr_rows, quantile_returns, rank_pct, rank_rows
+
+
+def test_corr_and_rank_rows():
+    rng = np.random.default_rng(0)
+    a, b = rng.normal(size=(3, 50)), rng.normal(size=(3, 50))
+    a[0, :5] = np.nan
+    ic = corr_rows(a, b)
+    assert np.isclose(ic[0], np.corrcoef(a[0, 5:], b[0, 5:])[0, 1])
+    assert rank_rows(np.array([[3.0, np.nan, 1.0, 2.0]])).tolist()[0][::2] == [2.0, 0.0]
+
+
+def test_quantile_returns_bincount():
+    z = np.array([[1.0, 2.0, 3.0, 4.0]])
+    r = np.array([[0.1, 0.2, 0.3, np.nan]])
+    qr = quantile_returns(rank_pct(rank_rows(z)), r, q=2)
+    assert np.allclose(qr, [[0.15, 0.3]])
+
+
+def test_rank_rows_averages_ties():
+    import pandas as pd
+
+    x = np.array([[1, 1, 1, 1, 2], [3, np.nan, 1, 3, 2], [5, 5, 5, 5, 5.0]])
+    r = rank_rows(x)
+    assert np.allclose(r[0], [1.5, 1.5, 1.5, 1.5, 4])
+    assert np.allclose(r[1], [2.5, np.nan, 0, 2.5, 1], equal_nan=True)
+    rng = np.random.default_rng(0)
+    y = rng.integers(0, 4, (6, 30)).astype(float)
+    y[rng.random(y.shape) < 0.2] = np.nan
+    ref = pd.DataFrame(y).rank(axis=1, method="average").to_numpy() - 1
+    assert np.allclose(rank_rows(y), ref, equal_nan=True)
+    ic = corr_rows(r, np.tile(np.arange(5.0), (3, 1)))
+    assert np.isnan(ic[2]) and not np.isnan(ic[0])           # 常数行 Rank-IC 为 NaN
@@ -0,0 +1,24 @@
+import functools
+
+import pandas as pd
+
+from src.cache import QueryCache, api_name, ttl_for
+
+
+def test_ttl_policy():
+    assert ttl_for("daily", {"trade_date": "20240102"}, today="20250101") is None
+    assert ttl_for("daily", {"trade_date": "20250101"}, today="20250101") is not None
+    assert ttl_for("trade_cal", {"end_date": "20200101"}, today="20250101") is not None
+    assert api_name(functools.partial(print, "daily")) == "daily"
+
+
+def test_lru_eviction(tmp_path):
+    df = pd.DataFrame({"x": range(1000)})
+    cache = QueryCache(tmp_path / "c.sqlite", max_bytes=10**9)
+    cache.put("a", "daily", df, None)
+    cache.put("b", "daily", df, None)
+    cache.get("a")                                  # a 变成最近访问
+    cache.max_bytes = cache.total_bytes() - 1
+    cache.evict()
+    assert cache.get("b") is None
+    assert cache.get("a").equals(df)
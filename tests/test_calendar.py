@@ -0,0 +1,17 @@
+from src.trade_calendar import TradeCalendar
+
+CAL = TradeCalendar([20240102, 20240103, 20240131, 20240201, 20240205, 20240301])
+
+
+def test_point_queries():
+    assert CAL.prev("20240201") == "20240131"
+    assert CAL.next("20240203") == "20240205"
+    assert CAL.offset("20240204", 0) == "20240201"      # 周末锚定到之前的开市日
+    assert CAL.offset("20240103", 2) == "20240201"
+    assert CAL.latest(1, today="20240204") == "20240131"
+    assert CAL.prev("20240102") is None
+
+
+def test_range_queries():
+    assert CAL.range("20240103", "20240201") == ["20240103", "20240131", "20240201"]
+    assert CAL.month_firsts("20240103", "20240310") == ["20240103", "20240201", "20240301"]
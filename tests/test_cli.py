@@ -0,0 +1,28 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _run(*args):
+    env = {k: v for k, v in os.environ.items() if k not in ("TUSHARE_TOKEN", "TS_TOKEN")}
+    env["PYTHONPATH"] = str(ROOT)
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env,
+                          capture_output=True, text=True)
+
+
+def test_help_is_light_and_needs_no_token():
+    r = _run("-c", "import sys; from src.cli import main\n"
+                   "try:\n    main(['--help'])\nexcept SystemExit:\n    pass\n"
+                   "print(sorted(m for m in ('pandas', 'numpy', 'tushare', 'matplotlib') if m in sys.modules))")
+    assert r.returncode == 0, r.stderr
+    assert "backtest" in r.stdout and r.stdout.strip().endswith("[]")
+
+
+def test_import_without_token():
+    r = _run("-c", "import src.utils, src.gen_orders, src.backtest, src.tune, src.tune_fast; "
+                   "import sys; print('matplotlib' in sys.modules)")
+    assert r.returncode == 0, r.stderr
+    assert r.stdout.strip() == "False"
@@ -0,0 +1,22 @@
+import numpy as np
+
+from src.engine import rebalance_mask, run_panel
+
+
+def test_rebalance_mask():
+    d = [20240102, 20240105, 20240108, 20240131, 20240201]
+    assert rebalance_mask(d, "W").tolist() == [True, False, True, True, False]
+    assert rebalance_mask(d, "M").tolist() == [True, False, False, False, True]
+
+
+def test_drift_turnover_and_fees():
+    close = np.array([[10.0, np.nan], [11.0, 20.0], [12.0, 22.0], [12.0, np.nan]])
+    w = np.array([[0.5, 0.5], [0, 0], [0.5, 0.5], [0, 0]])
+    res = run_panel(close, w, np.array([1, 0, 1, 0], bool), fee=0.001, slippage=0)
+    # 第一天 B 未上市 → 只买 A（50%），其余现金
+    assert np.isclose(res["turnover"][0], 0.5)
+    assert np.isclose(res["equity"][1], (1 - 0.0005) * (0.5 * 1.1 + 0.5))
+    pre = (1 - 0.0005) * (0.5 * 1.2 + 0.5)
+    drift_a = 0.5 * 1.2 / (0.5 * 1.2 + 0.5)
+    assert np.isclose(res["turnover"][2], abs(0.5 - drift_a) + 0.5)
+    assert np.isclose(res["equity"][3], pre * (1 - 0.001 * res["turnover"][2]))  # B 停牌按前值
@@ -10,3 +10,53 @@ def test_score_rank():
     })
     ranked = score(df)
     assert ranked.iloc[0]["ts_code"] == "a"
+
+
+def test_batched_scoring_matches_score():
+    import numpy as np
+    from src.factor_model import ScoreModel, top_k, F_LIST
+
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({c: rng.normal(size=40) for c in
+                       ["pe_ttm", "pb", "pct_chg_20d", "roa", "turnover_rate_f", "vol_20d"]})
+    df["total_mv"] = rng.random(40) * 1e5
+    df.loc[::7, "pb"] = np.nan
+    df.insert(0, "ts_code", [f"s{i}" for i in range(40)])
+
+    model = ScoreModel.from_frame(df)
+    idx, s = model.top(k=5)
+    assert model.codes[idx[0]].tolist() == score(df).head(5)["ts_code"].tolist()
+
+    W = np.eye(len(F_LIST), dtype=np.float32)              # 多组权重一次打分
+    S = model.scores(W)
+    assert S.shape == (len(F_LIST), 1, 40)
+    np.testing.assert_allclose(S[1, 0], model.Z[0, :, 1])
+
+    i, v = top_k(np.array([[1.0, np.nan, 3.0, 2.0]]), 3)
+    assert i[0].tolist() == [2, 3, 0] and np.isfinite(v).all()
+
+
+def test_neutralize_matches_per_date_lstsq():
+    import numpy as np
+    from src.factor_model import neutralize, standardize
+
+    rng = np.random.default_rng(0)
+    D, N, F = 4, 60, 3
+    Z, size = rng.normal(size=(D, N, F)), rng.normal(size=(D, N))
+    valid, g = rng.random((D, N)) > 0.1, rng.integers(-1, 5, N)   # -1：无行业
+    size[rng.random((D, N)) < 0.15] = np.nan                       # 市值缺失
+    free = np.array([False, False, True])                          # 第 3 个因子只对行业回归
+    out = neutralize(Z, g, size, valid, free)
+
+    ref = np.full(Z.shape, np.nan)
+    for d in range(D):
+        v = valid[d]
+        dums = (np.where(g < 0, 5, g)[v][:, None] == np.arange(6)).astype(float)
+        # 缺失市值按 当日 × 行业 的有效市值均值填：不影响组均值，也不贡献 β
+        s, ok = size[d, v], ~np.isnan(size[d, v])
+        m = (dums * np.where(ok, s, 0)[:, None]).sum(0) / np.maximum((dums * ok[:, None]).sum(0), 1)
+        s = np.where(ok, s, dums @ m)
+        for k in range(F):
+            X = dums if free[k] else np.column_stack([dums, s])
+            ref[d, v, k] = Z[d, v, k] - X @ np.linalg.lstsq(X, Z[d, v, k], rcond=None)[0]
+    assert np.allclose(out, standardize(ref, valid), atol=1e-5, equal_nan=True)
@@ -0,0 +1,45 @@
+import threading
+import time
+
+import pandas as pd
+
+from src.fetcher import FetchExecutor, TokenBucket
+
+
+class _SlowPro:
+    """每次调用 sleep 50ms；前两次 daily 调用抛错"""
+    def __init__(self):
+        self.n = 0
+        self._lock = threading.Lock()
+
+    def daily(self, trade_date, **kw):
+        with self._lock:
+            self.n += 1
+            fail = self.n <= 2
+        time.sleep(0.05)
+        if fail:
+            raise IOError("抖动")
+        return pd.DataFrame({"trade_date": [trade_date]})
+
+
+def test_concurrent_stream_with_retry():
+    pro = _SlowPro()
+    ex = FetchExecutor(workers=10, limits={"default": 60_000}, base_delay=0.01)
+    days = [f"202401{i:02d}" for i in range(1, 21)]
+    t0 = time.perf_counter()
+    got = {kw["trade_date"]: df for (_, kw), df in ex.run((pro.daily, {"trade_date": d}) for d in days)}
+    assert time.perf_counter() - t0 < 0.5                     # 串行需要 ≥ 1s
+    assert sorted(got) == days and all(len(df) == 1 for df in got.values())
+
+
+def test_token_bucket_rate():
+    bucket = TokenBucket(rate=1200, burst=1)                   # 20 次/秒
+    t0 = time.perf_counter()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.perf_counter() - t0 >= 0.24
+
+
+def test_zero_retries_still_calls_once():
+    ex = FetchExecutor(retries=0, limits={"default": 60_000})
+    assert len(ex.call(lambda **kw: pd.DataFrame({"x": [1]}))) == 1
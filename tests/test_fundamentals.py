@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from src.fundamentals import Fundamentals
+
+
+def _pit():
+    return Fundamentals(pd.DataFrame({
+        "ts_code":  ["a", "a", "a", "b", "b"],
+        "ann_date": ["20240105", "20240110", "20240112", "20240103", "20240110"],
+        "end_date": ["20231231", "20240331", "20231231", "20230930", "20231231"],
+        "roa":      [1.0, 2.0, 9.0, 5.0, np.nan],
+        "roe":      [1.5, 2.5, 9.5, 5.5, 6.5],
+    }))
+
+
+def test_asof_no_lookahead_and_stale_period():
+    days = ["20240104", "20240105", "20240108", "20240110", "20240111", "20240115"]
+    out = _pit().asof(days, ["a", "b", "c"])
+    roa = out["roa"]
+    assert np.isnan(roa[:2, 0]).all() and roa[2, 0] == 1.0       # 公告日当天不可见
+    assert roa[4, 0] == 2.0 and roa[5, 0] == 2.0                # 晚公告的旧报告期不覆盖
+    assert (roa[:, 1] == 5.0).all()                             # 空值公告沿用上次
+    assert out["roe"][4, 1] == 6.5 and np.isnan(roa[:, 2]).all()
+
+
+def test_frame_matches_asof():
+    pit = _pit()
+    df = pit.frame("20240111")
+    asof = pit.asof(["20240111"], df["ts_code"].tolist())
+    assert df["roa"].tolist() == asof["roa"][0].tolist() == [2.0, 5.0]
+    assert df["roe"].tolist() == asof["roe"][0].tolist()
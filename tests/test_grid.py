@@ -0,0 +1,40 @@
+import itertools
+
+import numpy as np
+
+from src.grid import grid_search, top_sharpe, weight_chunk
+
+
+def _brute(F, grid, top_n):
+    W = np.array([w for w in itertools.product(grid, repeat=F.shape[1]) if any(w)], dtype=np.float32)
+    W /= W.sum(axis=1, keepdims=True)
+    return W, top_sharpe(F, W, top_n)
+
+
+def test_weight_chunk_enumerates_product():
+    grid = np.array([0, 0.5, 1.0], dtype=np.float32)
+    W = weight_chunk(0, 27, grid, 3)
+    assert np.isnan(W[0]).all()                           # 全 0 组合
+    np.testing.assert_allclose(W[1:].sum(axis=1), 1.0, rtol=1e-6)
+    np.testing.assert_allclose(W[5], np.array([0, 1, 2]) / 3, rtol=1e-6)   # 5 = (0,1,2)
+
+
+def test_grid_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    F = rng.normal(size=(300, 4)).astype(np.float32)
+    grid = [0, 0.1, 0.2, 0.3]
+    W, s = _brute(F, grid, 20)
+    best = grid_search(F, grid, top_n=20, keep=5, workers=1, max_mem_mb=0.05)   # 强制多个 chunk
+    np.testing.assert_allclose([b[0] for b in best], np.sort(s)[::-1][:5], rtol=1e-5)
+    np.testing.assert_allclose(best[0][1], W[s.argmax()], rtol=1e-5)
+
+    multi = grid_search(F, grid, top_n=20, keep=5, workers=2, max_mem_mb=0.05)
+    np.testing.assert_allclose([b[0] for b in multi], [b[0] for b in best], rtol=1e-6)
+
+
+def test_top_sharpe_small_cross_section():
+    F = np.array([[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]])
+    W = np.array([[1.0, 0.0], [0.5, 0.5]])
+    S = F @ W.T
+    assert np.allclose(top_sharpe(F, W, 10), S.mean(axis=0) / S.std(axis=0))   # 3 只 < top_n 取全部
+    assert (top_sharpe(F[:0], W, 10) == -9.0).all()
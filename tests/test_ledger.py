@@ -0,0 +1,47 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.ledger import Ledger
+
+
+def test_record_positions_and_history(tmp_path):
+    led = Ledger(tmp_path / "ledger.sqlite")
+    led.init(10_000.0)
+    close = pd.Series({"A": 10.0, "B": 20.0})
+    assert led.record("20250602", [["A", "B", 10.0, 300], ["B", "B", 0, 100]], close) == 2
+    led.mark("20250602", close)
+    led.record("20250603", [["A", "B", 12.0, 100], ["A", "S", 13.0, 200], ["C", "S", 5.0, 100]])
+    led.mark("20250603", pd.Series({"A": 14.0}))                      # B 缺价按成本
+    pos = led.positions().set_index("ts_code")
+    assert pos.loc["A", "qty"] == 200 and pos.loc["A", "cost"] == pytest.approx(10.5)
+    assert led.cash == pytest.approx(10_000 - 3000 - 2000 - 1200 + 2600)
+
+    h = led.history()
+    assert h["equity"].tolist() == pytest.approx([10_000, 6400 + 200 * 14 + 2000])
+    assert h["pnl"].iat[1] == pytest.approx(h["equity"].iat[1] - 10_000)
+    assert h["realized"].iat[1] == pytest.approx(200 * (13 - 10.5))
+    assert h["turnover"].iat[1] == pytest.approx(3800 / h["equity"].iat[1])
+    assert led.history("20250603")["pnl"].iat[0] == pytest.approx(h["pnl"].iat[1])   # 区间前一天参与盈亏
+    assert len(led.read("orders", "20250603", "20250603")) == 3 and len(led.read("fills", "20250603", "20250603")) == 2
+
+
+def test_migrates_legacy_json(tmp_path):
+    fp = tmp_path / "state_portfolio.json"
+    fp.write_text(json.dumps({"equity": 1e6, "max_equity": 1e6,
+                              "position": {"600000.SH": {"cost": 10.0, "qty": 1000}}}))
+    led = Ledger(tmp_path / "ledger.sqlite")
+    led.init(5e5, legacy=fp)
+    assert led.cash == pytest.approx(1e6 - 1e4) and fp.exists()         # 原文件不动
+    assert led.positions()["qty"].tolist() == [1000]
+    led.init(5e5, legacy=fp)                                    # 已初始化不再动
+    assert led.cash == pytest.approx(1e6 - 1e4)
+
+
+def test_inconsistent_legacy_falls_back_to_cash(tmp_path):
+    fp = tmp_path / "state_portfolio.json"
+    fp.write_text(json.dumps({"equity": 5e3, "position": {"600000.SH": {"cost": 10.0, "qty": 1000}}}))
+    led = Ledger(tmp_path / "ledger.sqlite")
+    led.init(5e5, legacy=fp)
+    assert led.cash == pytest.approx(5e5) and led.positions()["qty"].tolist() == [1000]
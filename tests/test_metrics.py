@@ -0,0 +1,31 @@
+import json
+
+import pandas as pd
+
+from src.metrics import BUCKETS_MS, Metrics
+
+
+def test_api_stats_stages_and_dump(tmp_path):
+    m = Metrics()
+    m.record_cache("daily", hit=True)
+    m.record_cache("daily", hit=False)
+    m.record_call("daily", 0.03, pd.DataFrame({"a": [1, 2, 3]}), retries=1)
+    m.record_call("daily", 20.0, error=True)
+    with m.stage("rolling"):
+        with m.stage("scoring"):
+            sum(range(1000))
+    with m.stage("rolling"):
+        pass
+
+    rep = m.summary("test")
+    d = rep["apis"]["daily"]
+    assert (d["calls"], d["errors"], d["retries"], d["rows"]) == (2, 1, 1, 3)
+    assert (d["cache_hits"], d["cache_misses"]) == (1, 1) and d["bytes"] > 0
+    assert d["hist"][BUCKETS_MS.index(50)] == 1 and d["hist"][-1] == 1
+    assert rep["stages"]["rolling"]["count"] == 2
+    assert rep["stages"]["rolling"]["wall"] >= rep["stages"]["scoring"]["wall"]
+
+    path = m.dump("test", tmp_path)
+    assert json.loads(path.read_text())["apis"]["daily"]["calls"] == 2
+    m.dump("test", tmp_path)
+    assert len((tmp_path / "metrics.jsonl").read_text().splitlines()) == 2
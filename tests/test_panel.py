@@ -0,0 +1,35 @@
+import numpy as np
+
+from src.panel import FactorPanel
+from src.rolling import RollingState, rolling_mom_vol
+
+
+def test_rolling_mom_vol_listing_and_suspension():
+    pct = np.array([[1.0, np.nan], [2.0, np.nan], [np.nan, 3.0], [4.0, 1.0]])
+    mom, vol = rolling_mom_vol(pct, win=3)
+    assert np.isnan(mom[1, 0]) and mom[2, 0] == 3.0        # 停牌日按 0 计
+    assert mom[3, 0] == 6.0 and np.isclose(vol[3, 0], np.std([2.0, 0.0, 4.0]))
+    assert np.isnan(mom[3, 1])                              # 上市不足 3 天
+
+
+def test_cross_section_slice():
+    values = np.arange(12, dtype=np.float32).reshape(2, 3, 2)
+    valid = np.array([[True, False, True], [True, True, True]])
+    fp = FactorPanel(["d0", "d1"], ["a", "b", "c"], ["close", "roa"], values, valid)
+    df = fp.cross_section("d0")
+    assert df["ts_code"].tolist() == ["a", "c"] and df["roa"].tolist() == [1.0, 5.0]
+
+
+def test_incremental_state_matches_batch():
+    rng = np.random.default_rng(0)
+    pct = rng.normal(size=(40, 5))
+    pct[:25, 4] = np.nan                                   # 第 25 天才上市
+    pct[30, 1] = np.nan                                    # 停牌
+    mom, vol = rolling_mom_vol(pct, win=20)
+    state = RollingState.from_history(pct[:21], list("abcde"), "d20", win=20)
+    for t in range(21, 40):
+        ok = ~np.isnan(pct[t])
+        state.update(f"d{t}", [c for c, k in zip("abcde", ok) if k], pct[t][ok])
+    out = state.frame()
+    assert np.allclose(out["pct_chg_20d"], mom[-1], equal_nan=True)
+    assert np.allclose(out["vol_20d"], vol[-1], equal_nan=True)
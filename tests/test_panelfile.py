@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from src.loader import PricePanel
+from src.panel import FactorPanel
+from src.panelfile import PanelFile, cached
+
+DAYS = ["20240102", "20240103", "20240104"]
+
+
+def test_factor_and_price_roundtrip(tmp_path):
+    rng = np.random.default_rng(0)
+    values = rng.random((3, 4, 2)).astype(np.float32)
+    values[1, 2] = np.nan
+    valid = ~np.isnan(values[:, :, 0])
+    fp = FactorPanel(DAYS, ["a", "b", "c", "d"], ["pb", "roa"], values, valid)
+    fp.save(tmp_path / "f.panel")
+    back = FactorPanel.load(tmp_path / "f.panel")
+    assert isinstance(back.values.base, np.memmap) or isinstance(back.values, np.memmap)
+    np.testing.assert_array_equal(back.values, values)
+    np.testing.assert_array_equal(back.valid, valid)
+    pd.testing.assert_frame_equal(back.cross_section("20240103"), fp.cross_section("20240103"))
+
+    pp = PricePanel(DAYS, ["x", "y"], np.array([[1.0, np.nan], [2, 3], [4, 5]]),
+                    np.array([[1.0, 1], [1, 1], [1.1, 1]]))
+    pp.save(tmp_path / "p.panel")
+    pb = PricePanel.load(tmp_path / "p.panel")
+    np.testing.assert_allclose(pb.adj_close, pp.adj_close, rtol=1e-6)
+    pf = PanelFile.open(tmp_path / "p.panel")
+    assert pf.day_int.dtype == np.int32 and pf.values.dtype == np.float32
+
+
+def test_frame_conversion_and_cache(tmp_path):
+    df = pd.DataFrame({"ts_code": ["a", "b", "a"], "trade_date": ["20240102", "20240102", "20240103"],
+                       "close": [1.0, 2.0, 1.5], "amount": [10.0, np.nan, 12.0]})
+    pf = PanelFile.from_frame(tmp_path / "d.panel", df, ["close", "amount"])
+    out = pf.to_frame()
+    pd.testing.assert_frame_equal(out, df.astype({"close": float, "amount": float}))
+    assert pf.wide("close").loc["20240103", "b"] != pf.wide("close").loc["20240103", "b"]   # NaN
+
+    calls = []
+
+    def build():
+        calls.append(1)
+        return PricePanel(DAYS, ["x"], np.ones((3, 1)))
+
+    cached("px", DAYS, build, {"daily": "20240104"}, root=tmp_path)
+    cached("px", DAYS, build, {"daily": "20240104"}, root=tmp_path)
+    assert len(calls) == 1                                   # 命中
+    cached("px", DAYS, build, {"daily": "20240105"}, root=tmp_path)
+    assert len(calls) == 2                                   # 本地仓库有新数据 → 重建
+
+
+def test_factor_panel_rebuilds_on_warmup_backfill(tmp_path, monkeypatch):
+    from src import panel, panelfile, trade_calendar
+    from src.rolling import WIN
+    from src.store import MarketStore
+
+    cal = trade_calendar.TradeCalendar([f"2024{m:02d}{d:02d}" for m in (1, 2) for d in range(1, 29)])
+    days = cal.range("20240201", "20240205")
+    warm = cal.range(cal.offset(days[0], -WIN), days[-1])
+    st = MarketStore(tmp_path / "m.sqlite")
+    row = lambda d: pd.DataFrame({"ts_code": ["a"], "trade_date": [d], "close": [1.0]})   # noqa: E731
+    for d in warm[1:]:                                       # 缺预热首日
+        st.upsert("daily", row(d))
+        st.upsert("daily_basic", row(d))
+    st.upsert("fina_indicator", pd.DataFrame({"ts_code": ["a"], "ann_date": [days[-1]], "end_date": ["20231231"]}))
+    calls = []
+
+    def build(ds):
+        calls.append(1)
+        return FactorPanel(ds, ["a"], ["pb"], np.ones((len(ds), 1, 1), np.float32), np.ones((len(ds), 1), bool))
+
+    monkeypatch.setattr(panelfile, "get_store", lambda: st)
+    monkeypatch.setattr(panelfile, "PANEL_DIR", tmp_path / "panels")
+    monkeypatch.setattr(trade_calendar, "get_calendar", lambda: cal)
+    monkeypatch.setattr(panel, "build_panel", build)
+    panelfile.factor_panel(days)
+    panelfile.factor_panel(days)
+    assert len(calls) == 1
+    st.upsert("daily", row(warm[0]))                         # 回补预热区间的缺口
+    panelfile.factor_panel(days)
+    assert len(calls) == 2
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.loader import MatrixBuilder, to_matrix
+from src.prefetch import prefetch
+
+
+def test_order_and_backpressure():
+    lock, live, peak = threading.Lock(), [0], [0]
+
+    def fn(i):
+        with lock:
+            live[0] += 1
+            peak[0] = max(peak[0], live[0])
+        time.sleep(0.01 * (i % 3))
+        return i * i
+
+    out = []
+    for i, r in prefetch(fn, range(12), depth=3, workers=2):
+        with lock:
+            live[0] -= 1                                       # 被消费才算出队
+        out.append((i, r))
+    assert out == [(i, i * i) for i in range(12)] and peak[0] <= 3
+
+
+def test_errors_surface_in_order_and_inline_mode():
+    def fn(i):
+        if i == 2:
+            raise ValueError(i)
+        return i
+
+    seen = []
+    with pytest.raises(ValueError):
+        for i, _ in prefetch(fn, range(5), depth=2, workers=2):
+            seen.append(i)
+    assert seen == [0, 1]
+    assert list(prefetch(lambda i: -i, range(3), workers=0)) == [(0, 0), (1, -1), (2, -2)]
+
+
+def test_matrix_builder_matches_to_matrix():
+    rng = np.random.default_rng(0)
+    days = [f"2024{m:02d}01" for m in range(1, 9)]
+    rows = [(c, d, rng.normal()) for d in days for c in rng.choice(list("abcdef"), 4, replace=False)]
+    df = pd.DataFrame(rows, columns=["ts_code", "trade_date", "close"])
+    b = MatrixBuilder(days[2:])                                # 块外日期丢弃
+    for d in days:
+        b.add(df[df["trade_date"] == d], ["close"])
+    codes = ["f", "a", "c", "z"]                               # 任意顺序 / 含未出现代码
+    assert np.array_equal(b.matrix("close", codes), to_matrix(df, days[2:], codes, "close"),
+                          equal_nan=True)
+    assert b.codes() == sorted(df.loc[df["trade_date"] >= days[2], "ts_code"].unique())
+
+
+def test_config_zero_workers_runs_inline(monkeypatch):
+    from src import config, prefetch as pf
+
+    monkeypatch.setattr(config, "load_cfg", lambda: {"prefetch_depth": 3, "prefetch_workers": 0})
+    assert pf.settings() == (3, 0)
+    names = [r for _, r in prefetch(lambda i: threading.current_thread().name, range(3))]
+    assert names == [threading.current_thread().name] * 3
@@ -0,0 +1,119 @@
+import numpy as np
+
+from src.engine import run_panel
+from src.risk import dense, moving_average, overlay, position_signals, rules
+
+R = rules(dict(stop_loss=0.05, take_profit=0.08, max_drawdown=0.06, trend_ma=10))
+
+
+def _loop(P, W, rb, r):
+    """逐日逐股参考实现"""
+    T, n = P.shape
+    ma = moving_average(P, r["trend_ma"])
+    H, W = np.ones((T, n)), W.copy()
+    for k, s in enumerate(rb):
+        e = rb[k + 1] if k + 1 < len(rb) else T
+        for j in range(n):
+            if W[k, j] <= 0:
+                continue
+            if P[s, j] < ma[s, j]:
+                W[k, j] = 0
+                continue
+            h, peak = 1.0, P[s, j]
+            for t in range(s + 1, e):
+                peak = max(peak, P[t, j])
+                ret, dd = P[t, j] / P[s, j] - 1, P[t, j] / peak - 1
+                if h > 0 and (ret <= -r["stop_loss"] or dd <= -r["max_drawdown"] or P[t, j] < ma[t, j]):
+                    h = 0.0
+                elif h == 1 and ret >= r["take_profit"]:
+                    h = 0.5
+                H[t, j] = h
+    return W, H
+
+
+def test_overlay_matches_loop():
+    rng = np.random.default_rng(3)
+    P = 10 * np.cumprod(1 + rng.normal(0, 0.03, size=(120, 8)), axis=0)
+    rb = np.arange(0, 120, 20)
+    W = np.where(rng.random((rb.size, 8)) < 0.6, 0.1, 0.0)
+    W2, ev = overlay(P, W, rb, R)
+    H = dense(ev, P.shape)
+    W_ref, H_ref = _loop(P, W, rb, R)
+    assert np.array_equal(W2, W_ref) and np.array_equal(H, H_ref)
+    assert 0 < (H == 0).sum() and 0 < (H == 0.5).sum()
+
+
+def test_engine_matches_loop_with_costs():
+    rng = np.random.default_rng(4)
+    P = 10 * np.cumprod(1 + rng.normal(0, 0.03, size=(120, 8)), axis=0)
+    mask = np.zeros(120, bool)
+    mask[::20] = True
+    rb = np.flatnonzero(mask)
+    W = np.where(rng.random((rb.size, 8)) < 0.6, 0.1, 0.0)
+    fee, slip = 0.001, 0.002
+    res = run_panel(P, W, mask, fee=fee, slippage=slip, risk=R)
+    W_ref, H = _loop(P, W, rb, R)
+    eq, cash, sh, k = [], 1.0, np.zeros(8), -1
+    for t in range(120):
+        if mask[t]:
+            k += 1
+            pre = cash + (sh * H[t - 1] * P[t]).sum() if t else 1.0
+            drift = sh * H[t - 1] * P[t] / pre if t else 0
+            v = pre * (1 - np.abs(W_ref[k] - drift).sum() * (fee + slip))
+            sh, cash = W_ref[k] * v / P[t], v * (1 - W_ref[k].sum())
+        else:
+            cash += (sh * np.clip(H[t - 1] - H[t], 0, None) * P[t]).sum() * (1 - fee - slip)
+        eq.append(cash + (sh * H[t] * P[t]).sum())
+    assert np.allclose(res["equity"], eq)
+
+
+def test_engine_exit_to_cash():
+    close = np.array([[10.0, 10.0], [9.0, 11.0], [8.0, 12.0], [12.0, 12.0]])
+    w = np.array([[0.5, 0.5], [0, 0], [0, 0], [0, 0]])
+    r = rules(dict(stop_loss=0.05))
+    res = run_panel(close, w, np.array([1, 0, 0, 0], bool), fee=0, slippage=0,
+                    risk=r, risk_cols=np.array([True, False]))
+    # A 第 1 天跌 10% 止损变现 0.45，之后只剩 B 随价格漂移；B 不受风控
+    assert np.allclose(res["equity"], [1.0, 0.45 + 0.55, 0.45 + 0.6, 0.45 + 0.6])
+    assert np.isclose(res["turnover"][1], 0.45)
+    base = run_panel(close, w, np.array([1, 0, 0, 0], bool), risk=rules({}))
+    assert np.array_equal(base["equity"], run_panel(close, w, np.array([1, 0, 0, 0], bool))["equity"])
+
+
+def test_position_signals():
+    adj = np.array([[10.0, 10.0, 10.0], [12.0, 11.0, 10.0], [11.0, 11.5, 9.0]])
+    exit_, halve = position_signals(adj, close=adj[-1], cost=np.array([10.0, 10.0, 10.0]),
+                                    entry=np.zeros(3, int), trimmed=np.array([False, True, False]),
+                                    r=rules(dict(stop_loss=0.05, take_profit=0.08, max_drawdown=0.06)))
+    assert exit_.tolist() == [True, False, True]             # 回撤 8.3% / 亏损 10%
+    assert halve.tolist() == [False, False, False]           # 第 2 只已止盈过
+
+
+def test_order_time_risk_reads_store_only(tmp_path, monkeypatch):
+    import pandas as pd
+
+    from src import config, gen_orders, store as store_mod, trade_calendar
+    from src.store import MarketStore
+
+    days = [f"202406{d:02d}" for d in range(3, 13)]
+    st = MarketStore(tmp_path / "m.sqlite")
+    for d in days[-3:]:                                      # 本地只有最近 3 天
+        st.upsert("daily", pd.DataFrame({"ts_code": ["A", "B"], "trade_date": d, "close": [8.0, 20.0]}))
+        st.upsert("adj_factor", pd.DataFrame({"ts_code": ["A", "B"], "trade_date": d, "adj_factor": 1.0}))
+
+    class Led:
+        def positions(self):
+            return pd.DataFrame({"ts_code": ["A"], "qty": [1000], "cost": [10.0], "opened": [days[0]],
+                                 "trimmed": [False]})
+
+    class SM:
+        is_etf = staticmethod(lambda c: False)
+        lot = staticmethod(lambda c: 100)
+
+    monkeypatch.setattr(store_mod, "get_store", lambda: st)
+    monkeypatch.setattr(trade_calendar, "get_calendar", lambda: trade_calendar.TradeCalendar(days))
+    monkeypatch.setattr(config, "load_cfg", lambda: dict(stop_loss=0.1, max_drawdown=0.05, trend_ma=5))
+    monkeypatch.setattr(gen_orders, "_ledger", lambda: Led())
+    monkeypatch.setattr("src.loader.load_blocks", None)                 # 回源即报错
+    sells, blocked = gen_orders._risk_orders(days[-1], SM(), pd.Series({"A": 8.0, "B": 20.0}), ["B"])
+    assert sells == [["A", "S", 7.92, 1000]] and blocked == {"A"}       # 止损照常；均线 / 回撤跳过
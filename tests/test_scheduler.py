@@ -0,0 +1,57 @@
+import datetime as dt
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from src.scheduler import Job, Scheduler, SimClock
+
+ROOT = Path(__file__).resolve().parents[1]
+
+SIM = """
+import datetime as dt, sys
+from pathlib import Path
+from src import utils, gen_orders, metrics
+from src.fetcher import FetchExecutor
+from src.synth import FakePro
+from src.scheduler import Scheduler, SimClock
+tmp = Path(sys.argv[1])
+metrics.LOG_DIR, gen_orders.CSV_DIR, gen_orders.STATE_FP = tmp / "logs", tmp / "orders", tmp / "state.json"
+utils.set_pro(FakePro(n_stocks=60, years=1, end="20250630"))
+s = Scheduler(clock=SimClock(dt.datetime(2025, 6, 5, 12, 0)),
+              executor=FetchExecutor(workers=2, limits={"default": 1e12}))
+s.run(until=dt.datetime(2025, 6, 8))
+print(sorted(p.name for p in (tmp / "orders").iterdir()))
+print([(h["job"], h["date"], h["ok"]) for h in s.history])
+"""
+
+
+def test_job_next_time():
+    job = Job("orders", dt.time(9, 0), lambda d: None)
+    now = dt.datetime(2025, 6, 5, 8, 0)
+    assert job.next_time(now) == dt.datetime(2025, 6, 5, 9, 0)
+    assert job.next_time(now.replace(hour=10)) == now.replace(hour=10)      # 过点未跑 → 立刻
+    job.last = now.date()
+    assert job.next_time(now.replace(hour=10)) == dt.datetime(2025, 6, 6, 9, 0)
+
+
+def test_warm_does_not_replay_past_jobs():
+    s = Scheduler(clock=SimClock(dt.datetime(2025, 6, 5, 12, 0)))
+    s.prefetch = lambda day: None                                           # 不取数
+    s.warm()
+    assert [j.last for j in s.jobs] == [None, dt.date(2025, 6, 5)]          # prefetch 18:30 未到
+    assert s.next_wakeup() == dt.datetime(2025, 6, 5, 18, 30)
+
+
+def test_simulated_days_use_prefetched_universe(tmp_path):
+    env = {k: v for k, v in os.environ.items() if k not in ("TUSHARE_TOKEN", "TS_TOKEN")}
+    env.update(PYTHONPATH=str(ROOT), MA_DATA_DIR=str(tmp_path))
+    r = subprocess.run([sys.executable, "-c", SIM, str(tmp_path)], cwd=ROOT, env=env,
+                       capture_output=True, text=True)
+    assert r.returncode == 0, r.stderr[-2000:]
+    files, history = r.stdout.strip().splitlines()[-2:]
+    # 6/5 中午启动：当天 09:00 不补单；6/6（周五）用 6/5 预取截面下单；周末只预取
+    assert files == "['orders_20250605.csv']"
+    assert eval(history) == [("prefetch", "2025-06-05", True), ("orders", "2025-06-06", True),
+                             ("prefetch", "2025-06-06", True), ("orders", "2025-06-07", True),
+                             ("prefetch", "2025-06-07", True)]
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from src.secmaster import SecMaster
+
+
+def _sm():
+    return SecMaster(pd.DataFrame({
+        "ts_code": ["000001.SZ", "600000.SH", "159915.SZ", "510300.SH", "000001.SH"],
+        "asset": ["stock", "stock", "etf", "etf", "etf"],
+        "list_status": ["L", "L", "L", "L", "D"],
+    }))
+
+
+def test_resolve_and_lot():
+    sm = _sm()
+    assert sm.resolve("159915") == "159915.SZ"                 # 不靠前缀猜后缀
+    assert sm.resolve("000001") == "000001.SZ"                 # 同代码时股票优先
+    assert sm.resolve("000001.SH") == "000001.SH" and sm.resolve("999999") is None
+    assert sm.lot("510300") == 10 and sm.lot("600000.SH") == 100 and sm.is_etf("159915")
+
+
+def test_prices_bulk_lookup():
+    close = pd.Series([10.0, 4.2], index=["600000.SH", "159915.SZ"])
+    px = _sm().prices(["600000", "159915", "510300"], close)
+    assert px[:2].tolist() == [10.0, 4.2] and np.isnan(px[2])
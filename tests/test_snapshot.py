@@ -0,0 +1,63 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import factor_model, snapshot, utils
+from src.rolling import RollingState
+from src.snapshot import SnapshotCache, read, snapshot_key, write
+
+
+def _scored(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"ts_code": [f"{i:06d}.SZ" for i in range(n)], "close": rng.uniform(3, 80, n),
+                       "amount": rng.integers(0, 10**6, n), "pct_chg": rng.normal(size=n),
+                       "score": rng.normal(size=n),
+                       "industry": rng.choice(["银行", "医药", None], n)})
+    return df.iloc[np.argsort(-df["score"].to_numpy())]
+
+
+def test_roundtrip_is_exact_and_memory_mapped(tmp_path):
+    df = _scored()
+    write(tmp_path / "x.snap", df)
+    back = read(tmp_path / "x.snap")
+    pd.testing.assert_frame_equal(back, df)                  # 索引 / 列序 / 类型 / NaN 都还原
+    assert isinstance(np.load(tmp_path / "x.snap" / "1.npy", mmap_mode="r"), np.memmap)
+
+
+def test_key_follows_weights_and_config(monkeypatch):
+    k = snapshot_key(False)
+    assert k == snapshot_key(False) and k != snapshot_key(True)
+    monkeypatch.setitem(factor_model.WEIGHTS, "F_pe", 0.31)
+    assert snapshot_key(False) != k
+
+
+def test_universe_hits_cache_and_eviction(tmp_path, monkeypatch):
+    cache = SnapshotCache(tmp_path, max_bytes=10**9, max_age_days=1)
+    calls = []
+
+    def build(td, neutral=False):
+        calls.append(td)
+        return _scored(seed=int(td[-2:]))
+
+    monkeypatch.setattr(utils, "build_today_universe", build)
+    monkeypatch.setattr(snapshot, "get_snapshots", lambda: cache)
+    monkeypatch.setattr(snapshot, "_usable", lambda td: True)
+    rolled = []
+    monkeypatch.setattr(utils, "_rolling_factors", lambda td, daily: rolled.append((td, len(daily))))
+    monkeypatch.setattr(RollingState, "load", classmethod(lambda cls, path=None: None))
+    first = snapshot.universe("20250102", neutral=False)
+    pd.testing.assert_frame_equal(snapshot.universe("20250102", neutral=False), first)
+    assert calls == ["20250102"]                             # 第二次命中快照
+    assert rolled == [("20250102", 50)]                      # 命中时仍推进 RollingState
+    monkeypatch.setitem(factor_model.WEIGHTS, "F_pb", 0.2)   # 权重变化 → 新 key，重建
+    snapshot.universe("20250102", neutral=False)
+    assert calls == ["20250102"] * 2 and len(cache.entries()) == 2
+
+    old = cache.entries()[0]
+    os.utime(old, (time.time() - 2 * 86400,) * 2)            # 超龄
+    assert cache.evict() == 1 and old not in cache.entries()
+    cache.max_bytes = 1                                      # 超预算：按最近访问全部淘汰
+    snapshot.universe("20250103", neutral=False)
+    assert cache.entries() == []
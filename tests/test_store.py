@@ -0,0 +1,75 @@
+import pandas as pd
+
+from src.fetcher import FetchExecutor
+from src.store import MarketStore
+
+
+class _Pro:
+    """最小假 pro：两天行情 + 一周日历"""
+    def __init__(self):
+        self.calls = []
+
+    def trade_cal(self, **kw):
+        days = [f"2024010{i}" for i in range(1, 8)]
+        return pd.DataFrame({"exchange": "SSE", "cal_date": days,
+                             "is_open": [1, 1, 1, 0, 0, 1, 1]})
+
+    def daily(self, trade_date, **kw):
+        self.calls.append(trade_date)
+        return pd.DataFrame({"ts_code": ["a", "b"], "trade_date": trade_date,
+                             "close": [1.0, 2.0], "pct_chg": [0.1, 0.2]})
+
+    def __getattr__(self, name):
+        return lambda **kw: pd.DataFrame()
+
+
+def test_sync_incremental_dedup(tmp_path):
+    store, pro, ex = MarketStore(tmp_path / "m.sqlite"), _Pro(), FetchExecutor(workers=1)
+    store.sync(pro, start="20240101", end="20240103", tables=["daily"], executor=ex)
+    assert pro.calls == ["20240101", "20240102", "20240103"]
+
+    store.sync(pro, start="20240101", end="20240107", tables=["daily"], executor=ex)
+    assert pro.calls[3:] == ["20240106", "20240107"]          # 只拉新交易日
+
+    store.upsert("daily", pro.daily(trade_date="20240107"))   # 重复写不加行
+    assert len(store.read("daily")) == 10
+    day = store.read("daily", date="20240102", ts_code=["b"], fields="ts_code,close")
+    assert day.to_dict("records") == [{"ts_code": "b", "close": 2.0}]
+
+
+def test_stamp_sees_backfilled_gap(tmp_path):
+    store, pro = MarketStore(tmp_path / "m.sqlite"), _Pro()
+    for d in ("20240101", "20240103"):
+        store.upsert("daily", pro.daily(trade_date=d))
+    before = store.stamp("daily", "20240101", "20240103")
+    store.upsert("daily", pro.daily(trade_date="20240102"))  # 回补区间内缺口，最后日期不变
+    after = store.stamp("daily", "20240101", "20240103")
+    assert before == ["20240103", 4] and after == ["20240103", 6]
+
+
+def test_failed_day_is_refetched_next_sync(tmp_path):
+    class Flaky(_Pro):
+        def daily(self, trade_date, **kw):
+            if trade_date == "20240103" and trade_date not in self.calls:
+                self.calls.append(trade_date)
+                raise IOError("超时")
+            return super().daily(trade_date, **kw)
+
+    store, pro = MarketStore(tmp_path / "m.sqlite"), Flaky()
+    ex = FetchExecutor(workers=4, retries=1, limits={"default": 60_000})
+    store.sync(pro, start="20240101", end="20240106", tables=["daily"], executor=ex)
+    assert store.last_date("daily") == "20240102"             # 停在失败日之前
+    assert store.sync(pro, start="20240101", end="20240106", tables=["daily"], executor=ex)["daily"] == 4   # 03 + 06
+    assert sorted(store.dates("daily", "20240101", "20240106")) == ["20240101", "20240102", "20240103",
+                                                                    "20240106"]
+
+
+def test_covers_detects_holes(tmp_path):
+    store, pro = MarketStore(tmp_path / "m.sqlite"), _Pro()
+    store.upsert("trade_cal", pro.trade_cal())
+    for d in ("20240101", "20240103", "20240106"):
+        store.upsert("daily", pro.daily(trade_date=d))
+    assert store.covers("daily", "20240103", "20240106")      # 04 / 05 休市
+    assert not store.covers("daily", "20240101", "20240106")  # 缺 02
+    store.upsert("daily", pro.daily(trade_date="20240102"))
+    assert store.covers("daily", "20240101", "20240106")
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from src.factor_model import score
+from src.rolling import RollingState
+from src.stream import ReplayFeed, StreamScorer, run
+
+
+def _universe(n=300, seed=1):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "ts_code": [f"{i:06d}.SZ" for i in range(n)], "close": rng.uniform(3, 80, n),
+        "pe_ttm": rng.uniform(-5, 80, n), "pb": rng.uniform(0.5, 8, n),
+        "pct_chg_20d": rng.normal(0, 10, n), "roa": rng.normal(4, 3, n),
+        "turnover_rate_f": rng.uniform(0, 10, n), "vol_20d": rng.uniform(1, 4, n),
+        "total_mv": rng.uniform(1e5, 1e7, n),
+    })
+
+
+def _ticks(df, n_batches, size, seed=2):
+    rng = np.random.default_rng(seed)
+    for b in range(n_batches):
+        r = rng.choice(len(df), size, replace=False)
+        yield f"0930{b:02d}", df["ts_code"].to_numpy()[r].tolist(), \
+            df["close"].to_numpy()[r] * rng.uniform(0.95, 1.05, size)
+
+
+def test_incremental_top_matches_full_rescore():
+    df = _universe()
+    exact, fast = StreamScorer(df, 10, tol=0.0), StreamScorer(df, 10)
+    live = df.copy()
+    for _, codes, px in _ticks(df, 30, 20):
+        exact.update(codes, px)
+        fast.update(codes, px)
+        r = live.index[live["ts_code"].isin(codes)]
+        ratio = pd.Series(px, index=codes)[live.loc[r, "ts_code"]].to_numpy() / df.loc[r, "close"]
+        live.loc[r, ["pe_ttm", "pb", "total_mv"]] = df.loc[r, ["pe_ttm", "pb", "total_mv"]].mul(ratio, axis=0)
+        # 堆维护的入选集合 == 当前得分的前 k
+        assert set(fast.top()) == set(fast.codes[np.argsort(-fast.s)[:10]])
+    assert exact.top() == score(live).head(10)["ts_code"].tolist()
+
+
+def test_live_window_matches_rolling_update():
+    rng = np.random.default_rng(0)
+    df = _universe(8)
+    pct = rng.normal(size=(25, 8))
+    state = RollingState.from_history(pct, df["ts_code"].tolist(), "d24")
+    sc = StreamScorer(df, 3, state=state)
+    px = df["close"].to_numpy() * 1.02
+    sc.update(df["ts_code"].tolist(), px)
+    state.update("d25", df["ts_code"].tolist(), np.full(8, 2.0))
+    rows = np.arange(8)
+    assert np.allclose(sc._col("pct_chg_20d", rows), state.frame()["pct_chg_20d"])
+    assert np.allclose(sc._col("vol_20d", rows), state.frame()["vol_20d"])
+
+
+def test_replay_emits_order_diffs(tmp_path):
+    df = _universe()
+    path = ReplayFeed.write(tmp_path / "ticks.csv", _ticks(df, 20, 50))
+    sc = StreamScorer(df, 5, cash=1e6)
+    held = dict(sc.target)
+    out = run(sc, ReplayFeed(path))
+    for r in out.itertuples():                               # 逐笔回放差异得到最终目标持仓
+        held[r.ts_code] = held.get(r.ts_code, 0) + (r.qty if r.side == "B" else -r.qty)
+    assert {c: q for c, q in held.items() if q} == sc.target
+    assert set(sc.target) == set(sc.top()) and sc.stats()["batches"] == 20
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from src.engine import rebalance_mask, run_panel, summary
+from src.sweep import SweepData, expand, sweep
+
+DAYS = ["20240102", "20240103", "20240110", "20240201", "20240202", "20240301"]
+
+
+def _data():
+    rng = np.random.default_rng(1)
+    close = np.cumprod(1 + rng.normal(0, 0.02, size=(len(DAYS), 6)), axis=0) * 10
+    close[:2, 5] = np.nan                                    # 后上市
+    picks = np.array([[2, 3, 4], [5, 2, -1], [4, 5, 3], [3, 4, 2], [2, 5, 4], [4, 3, 2]], np.int32)
+    return SweepData(DAYS, close, picks, np.arange(len(DAYS), dtype=np.int32), 0, 1)
+
+
+def test_evaluate_matches_full_weight_matrix():
+    data = _data()
+    p = dict(num_alpha=2, core_ratio=0.5, bond_ratio=0.2, alpha_ratio=0.3,
+             rebalance="M", fee=0.0003, slippage=0.001)
+    mask = rebalance_mask(DAYS, "M")
+    W = np.zeros(data.close.shape)
+    for i in np.flatnonzero(mask):
+        W[i, [0, 1]] = [0.5, 0.2]
+        codes = [c for c in data.picks[i, :2] if c >= 0]
+        W[i, codes] = 0.3 / len(codes)
+    assert data.evaluate(p) == summary(run_panel(data.close, W, mask))
+
+
+def test_sweep_pool_and_expand():
+    base = dict(num_alpha=2, core_ratio=0.6, bond_ratio=0.1, alpha_ratio=0.3)
+    params = expand({"num_alpha": [1, 3], "rebalance": ["D", "W", "M"],
+                     "alpha_ratio": [0.3, 0.5]}, base)
+    assert len(params) == 6                                  # 0.6 + 0.1 + 0.5 > 1 被跳过
+    one = sweep(_data(), params, workers=1)
+    many = sweep(_data(), params, workers=2)
+    assert list(one.columns[-4:]) == ["cagr", "max_drawdown", "sharpe", "turnover"]
+    assert np.allclose(one[["cagr", "sharpe"]], many[["cagr", "sharpe"]])
+    with pytest.raises(ValueError):
+        expand({"lot": [100]}, base)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from src.fetcher import FetchExecutor
+from src.store import MarketStore
+from src.synth import FakePro
+
+
+def test_fake_pro_is_deterministic_and_realistic():
+    pro = FakePro(n_stocks=200, years=1, seed=7, suspend_rate=0.05, delist_rate=0.2)
+    again = FakePro(n_stocks=200, years=1, seed=7, suspend_rate=0.05, delist_rate=0.2)
+    m, td = pro.market, pro.market.days[-1]
+    day = pro.daily(trade_date=td)
+    assert day.equals(again.daily(trade_date=td))
+    assert len(day) < 200                                        # 停牌 / 退市 / 未上市没有行
+    assert set(day["ts_code"]) <= set(m.codes)
+    gone = np.flatnonzero(m.delisted < len(m.days))
+    assert not set(np.asarray(m.codes)[gone]) & set(day["ts_code"])
+
+    basic = pro.daily_basic(trade_date=td, fields="ts_code,pe_ttm,total_mv")
+    assert list(basic.columns) == ["ts_code", "pe_ttm", "total_mv"]
+    assert basic["pe_ttm"].isna().any() and basic["total_mv"].notna().all()
+
+    cal = pro.trade_cal(exchange="SSE", start_date=m.days[0], end_date=td)
+    assert cal.loc[cal["is_open"] == 1, "cal_date"].sort_values().tolist() == m.days
+
+    etf = pro.fund_daily(ts_code="510300.SH", start_date=m.days[0], end_date=m.days[4])
+    assert etf["ts_code"].unique().tolist() == ["510300.SH"] and len(etf) == 5
+    assert pro.adj_factor.func.__self__ is pro and pro.adj_factor.args == ("adj_factor",)
+
+
+def test_fake_pro_syncs_into_store(tmp_path):
+    pro = FakePro(n_stocks=50, years=1)
+    store = MarketStore(tmp_path / "m.sqlite")
+    days = pro.market.days
+    ex = FetchExecutor(workers=2, limits={"default": 1e9})
+    written = store.sync(pro, start=days[-10], end=days[-1], executor=ex)
+    assert store.last_date("daily") == days[-1] and written["daily"] > 0
+    assert written["fina_indicator"] >= 0
+    assert store.open_days(days[-10], days[-1]) == days[-10:]